@@ -1,14 +1,25 @@
 import asyncio
 import uuid
+from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header
+from starlette.responses import JSONResponse, Response, StreamingResponse
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
-from core.dependencies import chat_room_manager
-from dto.chat_room_response import ChatRoomResponse, ListChatRoomsResponse
+from config.config import (
+    EMOTION_ANALYSIS_MODE,
+    ROOM_LIST_DEFAULT_PAGE_SIZE,
+    ROOM_LIST_KEEPALIVE_SECONDS,
+    ROOM_LIST_MAX_PAGE_SIZE,
+)
+from core.dependencies import chat_room_manager, inactive_room_sweeper, room_directory, room_emotion_tracker
+from core.metrics import errors_total
+from dto.chat_room_response import ChatRoomResponse
 from service.chat.chat_room_manager import NotFoundChatRoomException
-from service.chat.message import MessageType
-from service.chat.user_connection import UserConnection
+from service.chat.inbound_limiter import InboundRateLimiter
+from service.chat.message import Message, MessageType
+from service.chat.user_connection import MessageTooLargeException, UserConnection
+from service.chat.wire_protocol import negotiate_protocol
 
 router = APIRouter(prefix="/v1/chat")
 
@@ -19,18 +30,7 @@ async def create_chat_room():
     chat_room = chat_room_manager.create_chat_room(room_id=new_room_id)
 
     # 채팅방 클렌징을 위해 일정 시간동안 입장한 사람이 없다면 채팅방 제거
-    async def check_and_clear_inactive_room(room_id):
-        await asyncio.sleep(10)
-        try:
-            if chat_room_manager.count_user_in_room(room_id=room_id) == 0:
-                chat_room_manager.delete_chat_room(room_id=room_id)
-        except NotFoundChatRoomException:
-            pass
-        except Exception as e:
-            print(e)
-
-
-    asyncio.create_task(check_and_clear_inactive_room(new_room_id))
+    inactive_room_sweeper.watch(new_room_id)
 
     return ChatRoomResponse(
         room_id=new_room_id,
@@ -39,17 +39,48 @@ async def create_chat_room():
     )
 
 
+# 채팅방 목록은 생성 순서로 페이지를 나누고, 다음 페이지는 응답의 next_cursor로 요청합니다.
+# 목록이 바뀌지 않았다면 If-None-Match로 304를 받을 수 있습니다.
 @router.get("/rooms")
-async def list_rooms():
-    return ListChatRoomsResponse(
-        chat_rooms=[
-            ChatRoomResponse(
-                room_id=room.room_id,
-                room_name=room.room_name,
-                user_count=room.count_connections(),
-            ) for room in chat_room_manager.list_chat_rooms()
-        ]
-    )
+async def list_rooms(
+        cursor: Optional[str] = None,
+        limit: int = ROOM_LIST_DEFAULT_PAGE_SIZE,
+        if_none_match: Optional[str] = Header(None),
+):
+    if cursor is not None and not cursor.isdigit():
+        return JSONResponse(content={"message": f"Invalid cursor {cursor}"}, status_code=400)
+
+    limit = max(1, min(limit, ROOM_LIST_MAX_PAGE_SIZE))
+    content, etag = room_directory.get_page(cursor=int(cursor or 0), limit=limit)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+# 채팅방 생성/삭제와 인원수 변경만 Server-Sent Events로 전달합니다.
+# 클라이언트는 ready 이후 목록을 받고, 그 동안 받은 변경 중 id(목록 version)가 목록의 version보다 큰 것만 반영합니다.
+# 연결이 끊어지면 클라이언트는 목록을 다시 받은 뒤 재구독합니다.
+@router.get("/rooms/stream")
+async def stream_rooms():
+    queue = room_directory.subscribe()
+
+    async def events():
+        try:
+            yield "event: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=ROOM_LIST_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            room_directory.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 @router.get("/rooms/{room_id}")
@@ -66,25 +97,98 @@ async def get_room(room_id: str):
     )
 
 
+@router.get("/rooms/{room_id}/fanout-stats")
+async def get_room_fanout_stats(room_id: str):
+    room = chat_room_manager.get_chat_room(room_id=room_id)
+
+    if room is None:
+        return {"message": f"Chat room {room_id} not found"}, 404
+
+    return room.get_fanout_stats()
+
+
+@router.get("/rooms/{room_id}/history-stats")
+async def get_room_history_stats(room_id: str):
+    room = chat_room_manager.get_chat_room(room_id=room_id)
+
+    if room is None:
+        return {"message": f"Chat room {room_id} not found"}, 404
+
+    return room.get_history_stats()
+
+
+@router.get("/rooms/{room_id}/inbound-stats")
+async def get_room_inbound_stats(room_id: str):
+    room = chat_room_manager.get_chat_room(room_id=room_id)
+
+    if room is None:
+        return {"message": f"Chat room {room_id} not found"}, 404
+
+    return room.get_inbound_stats()
+
+
+@router.get("/message-log/stats")
+async def get_message_log_stats():
+    if chat_room_manager.message_log is None:
+        return JSONResponse(content={"message": "Message log is disabled"}, status_code=404)
+
+    return chat_room_manager.message_log.get_stats()
 
 
 @router.websocket("/{room_id}/connect/{username}")
-async def connect_chat_room(websocket: WebSocket, room_id: str, username: str):
+async def connect_chat_room(websocket: WebSocket, room_id: str, username: str, protocol: Optional[str] = None):
     user_id = str(uuid.uuid4())
+
+    # Sec-WebSocket-Protocol을 설정할 수 없는 클라이언트는 ?protocol= 로 요청할 수 있음
+    requested_subprotocols = websocket.scope.get("subprotocols", [])
+    negotiated_protocol = negotiate_protocol(requested_subprotocols + ([protocol] if protocol else []))
     connection = UserConnection(
         user_id=user_id,
         websocket=websocket,
         username=username,
+        protocol=negotiated_protocol,
+        subprotocol=negotiated_protocol if negotiated_protocol in requested_subprotocols else None,
     )
 
+    async def publish(message: Message):
+        await chat_room_manager.broadcast(room_id=room_id, message=message)
+
+        if EMOTION_ANALYSIS_MODE == "incremental":
+            room_emotion_tracker.track_message(room_id=room_id, message=message)
+
+    # 한 유저가 메시지를 쏟아내도 채팅방 전체에 보내는 횟수는 제한됨
+    inbound_limiter = InboundRateLimiter(publish=publish)
+    connection.inbound_limiter = inbound_limiter
+
+    connected = False
     try:
         await chat_room_manager.connect(room_id=room_id, connection=connection)
+        connected = True
 
         while True:
-            message = await connection.receive_message()
+            try:
+                message = await connection.receive_message()
+            except MessageTooLargeException:
+                inbound_limiter.record_oversized()
+                continue
             message.message_type = MessageType.USER_MESSAGE
             message.user_id = user_id
-            await chat_room_manager.broadcast(room_id=room_id, message=message)
+            await inbound_limiter.submit(message)
 
     except WebSocketDisconnect:
-        await chat_room_manager.disconnect(room_id=room_id, connection=connection)
+        pass
+    except NotFoundChatRoomException as e:
+        print(e.message)
+    except Exception as e:
+        # evict()로 서버가 먼저 닫은 연결은 receive_text()에서 RuntimeError가 발생함
+        if not connection.evicted:
+            print(e)
+            errors_total.inc("chat_websocket")
+    finally:
+        # 어떤 이유로 receive loop가 끝나도 채팅방에서 정리해야 broadcast 대상과 인원수에 남지 않음
+        inbound_limiter.close()
+        if connected:
+            try:
+                await chat_room_manager.disconnect(room_id=room_id, connection=connection)
+            except NotFoundChatRoomException:
+                pass
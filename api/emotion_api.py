@@ -0,0 +1,76 @@
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from core.dependencies import (
+    chat_room_manager,
+    emotion_batcher,
+    emotion_classifier,
+    emotion_context_batcher,
+    room_analysis_scheduler,
+)
+
+router = APIRouter(prefix="/v1/emotion")
+
+
+@router.get("/batcher/stats")
+async def get_batcher_stats():
+    return emotion_batcher.get_stats()
+
+
+@router.get("/context-batcher/stats")
+async def get_context_batcher_stats():
+    return emotion_context_batcher.get_stats()
+
+
+@router.get("/load/stats")
+async def get_load_stats():
+    return emotion_classifier.load_controller.get_stats()
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return emotion_classifier.get_cache_stats()
+
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    return room_analysis_scheduler.get_stats()
+
+
+# 채팅방별 감정 분석 주기 변경. seconds를 비우면 기본 주기를 사용
+@router.put("/rooms/{room_id}/analysis-interval")
+async def update_room_analysis_interval(room_id: str, seconds: Optional[float] = None):
+    room = chat_room_manager.get_chat_room(room_id=room_id)
+
+    if room is None:
+        return JSONResponse(content={"message": f"Chat room {room_id} not found"}, status_code=404)
+
+    if seconds is not None and not seconds > 0:
+        return JSONResponse(content={"message": "seconds must be greater than 0"}, status_code=400)
+
+    room.analysis_interval_seconds = seconds
+    return {"room_id": room_id, "analysis_interval_seconds": seconds}
+
+
+@router.get("/rooms/{room_id}")
+async def get_room_emotion(room_id: str):
+    room = chat_room_manager.get_chat_room(room_id=room_id)
+
+    if room is None:
+        return {"message": f"Chat room {room_id} not found"}, 404
+
+    def to_label(emotion_state):
+        return None if emotion_state.is_empty() else emotion_classifier.label_from_logits(emotion_state.logits)
+
+    return {
+        "room_id": room_id,
+        "room_emotion": to_label(room.room_emotion_state),
+        "message_count": room.room_emotion_state.message_count,
+        "user_emotions": {
+            connection.username: to_label(room.get_user_emotion_state(connection.user_id))
+            for connection in room.list_connections()
+            if room.get_user_emotion_state(connection.user_id) is not None
+        },
+    }
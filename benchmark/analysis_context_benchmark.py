@@ -0,0 +1,71 @@
+# sweep 모드의 채팅방 분석 한 번에 드는 토큰화 비용을 기존 방식(최근 메시지를 "\n"으로 합쳐 전부 토큰화한 뒤 64토큰으로 자름)과
+# 토큰 예산 방식(BatchSentenceEncoder.encode_context)으로 비교합니다. 유저의 메시지가 길고 많을수록 차이가 커집니다.
+# 실행: python -m benchmark.analysis_context_benchmark
+import argparse
+import json
+import random
+import time
+
+from benchmark.inference_engine_benchmark import SAMPLE_SENTENCES
+
+
+def generate_context(message_count, sentences_per_message, seed):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(sentences_per_message))
+        for _ in range(message_count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contexts", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--sentences-per-message", type=int, default=4)
+    parser.add_argument("--max-chunks", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from service.emotion_analysis.inference import sentence_encoder, tokenizer
+
+    contexts = [
+        generate_context(args.messages, args.sentences_per_message, args.seed + index)
+        for index in range(args.contexts)
+    ]
+
+    def encode_before():
+        return sentence_encoder.encode_ids(["\n".join(messages) for messages in contexts])
+
+    def encode_after():
+        return [sentence_encoder.encode_context(messages, args.max_chunks) for messages in contexts]
+
+    def best_of(encode):
+        timings = []
+        for _ in range(args.repeat):
+            started_at = time.perf_counter()
+            encode()
+            timings.append(time.perf_counter() - started_at)
+        return min(timings)
+
+    before_seconds = best_of(encode_before)
+    after_seconds = best_of(encode_after)
+
+    # 기존 방식에서 토큰화한 뒤 버려진 토큰 수
+    joined_tokens = sum(len(tokenizer.tokenize("\n".join(messages))) for messages in contexts)
+    used_tokens = sum(len(chunk) - 2 for chunks in encode_after() for chunk in chunks)
+
+    print(json.dumps({
+        "contexts": args.contexts,
+        "messages_per_context": args.messages,
+        "max_chunks": args.max_chunks,
+        "joined_tokens_per_context": joined_tokens / args.contexts,
+        "used_tokens_per_context": used_tokens / args.contexts,
+        "before_ms_per_context": before_seconds / args.contexts * 1000,
+        "after_ms_per_context": after_seconds / args.contexts * 1000,
+        "speedup": before_seconds / after_seconds if after_seconds else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
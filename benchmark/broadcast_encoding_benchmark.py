@@ -0,0 +1,54 @@
+# 방 인원수별로 수신자마다 직렬화하는 방식과 한 번만 직렬화해서 공유하는 방식을 비교합니다.
+# 실행: python -m benchmark.broadcast_encoding_benchmark
+import argparse
+import json
+import timeit
+
+from service.chat.message import Message, MessageType, encode_message
+
+
+def encode_per_recipient(message: Message, room_size: int):
+    return [message.json() for _ in range(room_size)]
+
+
+def encode_shared(message: Message, room_size: int):
+    frame = encode_message(message)
+    return [frame for _ in range(room_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--room-sizes", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    message = Message(
+        user_id="5f0c6a4e-3f43-4b69-9f0f-8a3c5a8b6f11",
+        username="익명1234",
+        message="오늘 날씨가 너무 좋아서 기분이 좋아요 ㅋㅋㅋ",
+        message_type=MessageType.USER_MESSAGE,
+    )
+
+    # 직렬화 결과가 기존 wire format과 같은지 먼저 확인
+    assert encode_message(message) == message.json()
+
+    results = []
+    for room_size in args.room_sizes:
+        per_recipient_seconds = min(timeit.repeat(
+            lambda: encode_per_recipient(message, room_size), number=1, repeat=args.repeat,
+        ))
+        shared_seconds = min(timeit.repeat(
+            lambda: encode_shared(message, room_size), number=1, repeat=args.repeat,
+        ))
+        results.append({
+            "room_size": room_size,
+            "per_recipient_ms": per_recipient_seconds * 1000,
+            "shared_ms": shared_seconds * 1000,
+            "speedup": per_recipient_seconds / shared_seconds if shared_seconds else None,
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
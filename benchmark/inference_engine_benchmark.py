@@ -0,0 +1,94 @@
+# 추론 엔진(eager / quantized / torchscript)별 지연시간, 처리량과 fp32 eager 대비 라벨 일치율을 측정합니다.
+# 실행: python -m benchmark.inference_engine_benchmark --input sentences.txt
+import argparse
+import json
+import sys
+import time
+
+SAMPLE_SENTENCES = [
+    "ㅋㅋㅋ",
+    "오늘 진짜 너무 행복하다",
+    "왜 자꾸 나한테만 이러는 거야 정말 화난다",
+    "내일 발표인데 준비가 하나도 안 돼서 불안해",
+    "헐 갑자기 그렇게 말하면 어떡해",
+    "그 영화 너무 슬퍼서 계속 울었어",
+    "그냥 평범한 하루였어",
+    "저런 행동은 정말 역겹다",
+    "다들 점심 뭐 먹었어?",
+    "시험 끝나서 너무 신난다 ㅎㅎ",
+]
+
+
+def load_sentences(path):
+    if path is None:
+        return SAMPLE_SENTENCES
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def measure(predict, sentences, batch_size, repeat):
+    batches = [sentences[i:i + batch_size] for i in range(0, len(sentences), batch_size)]
+    # warm up
+    predict(batches[0])
+
+    latencies = []
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        for batch in batches:
+            batch_started_at = time.perf_counter()
+            predict(batch)
+            latencies.append(time.perf_counter() - batch_started_at)
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "batch_size": batch_size,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "sentences_per_second": len(sentences) * repeat / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", help="한 줄에 한 문장씩 들어있는 텍스트 파일")
+    parser.add_argument("--engines", nargs="+", default=["eager", "quantized", "torchscript"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="fp32 eager 라벨과의 일치율이 이 값보다 낮으면 실패로 처리")
+    args = parser.parse_args()
+
+    from service.emotion_analysis.inference import build_inference_model, predict_emotions, uses_dynamic_padding
+
+    sentences = load_sentences(args.input)
+    reference_model = build_inference_model("eager")
+    reference_labels = predict_emotions(sentences, model=reference_model, dynamic_padding=False)
+
+    results = []
+    failed = False
+    for engine in args.engines:
+        model = reference_model if engine == "eager" else build_inference_model(engine)
+        dynamic_padding = uses_dynamic_padding(engine)
+
+        def predict(batch):
+            return predict_emotions(batch, model=model, dynamic_padding=dynamic_padding)
+
+        labels = predict(sentences)
+        agreement = sum(a == b for a, b in zip(labels, reference_labels)) / len(sentences)
+        failed = failed or agreement < args.min_agreement
+
+        results.append({
+            "engine": engine,
+            "label_agreement": agreement,
+            "parity_ok": agreement >= args.min_agreement,
+            "latency": [measure(predict, sentences, batch_size, args.repeat) for batch_size in args.batch_sizes],
+        })
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
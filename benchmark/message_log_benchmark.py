@@ -0,0 +1,110 @@
+# 메시지 로그의 추가 처리량과 입장 시 재생 지연 시간을 측정합니다.
+# 실행: python -m benchmark.message_log_benchmark --messages 200000 --rooms 1000
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import tempfile
+import time
+import uuid
+
+from service.chat.message_log import MessageLog
+
+
+def percentile(sorted_values, ratio):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+async def run(args) -> dict:
+    directory = tempfile.mkdtemp(prefix="message-log-benchmark-")
+    try:
+        message_log = MessageLog(
+            directory,
+            segment_max_bytes=args.segment_mb * 1024 * 1024,
+            replay_size=args.replay_size,
+            fsync_interval_seconds=args.fsync_interval,
+        )
+        await message_log.start()
+
+        rng = random.Random(args.seed)
+        room_ids = [str(uuid.uuid4()) for _ in range(args.rooms)]
+        frame = json.dumps({
+            "user_id": str(uuid.uuid4()),
+            "username": "익명1234",
+            "message": "가" * args.message_length,
+            "message_type": "USER_MESSAGE",
+            "event_type": None,
+            "sent_at": "2024-05-20T12:00:00.000000",
+        }, ensure_ascii=False)
+
+        # 이벤트 루프를 양보하면서 추가해야 주기적인 fsync가 실제로 실행됨
+        started_at = time.perf_counter()
+        for index in range(args.messages):
+            message_log.append(rng.choice(room_ids), frame)
+            if index % args.yield_every == 0:
+                await asyncio.sleep(0)
+        append_seconds = time.perf_counter() - started_at
+        await message_log.sync()
+        synced_seconds = time.perf_counter() - started_at
+
+        replay_ms = []
+        for _ in range(args.replays):
+            room_id = rng.choice(room_ids)
+            replay_started_at = time.perf_counter()
+            message_log.read_last(room_id, args.replay_size)
+            replay_ms.append((time.perf_counter() - replay_started_at) * 1000)
+        replay_ms.sort()
+
+        compact_started_at = time.perf_counter()
+        await message_log.compact()
+        compact_seconds = time.perf_counter() - compact_started_at
+
+        stats = message_log.get_stats()
+        await message_log.stop()
+
+        # 재시작할 때 segment를 읽어 위치를 다시 만드는 시간
+        reopen_started_at = time.perf_counter()
+        reopened = MessageLog(directory, replay_size=args.replay_size)
+        reopened.open()
+        reopen_seconds = time.perf_counter() - reopen_started_at
+        reopened.close()
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        "messages": args.messages,
+        "rooms": args.rooms,
+        "frame_bytes": len(frame.encode()),
+        "append_per_second": args.messages / append_seconds,
+        "append_with_final_sync_per_second": args.messages / synced_seconds,
+        "fsync_count": stats["fsync_count"],
+        "replay_size": args.replay_size,
+        "replay_p50_ms": percentile(replay_ms, 0.5),
+        "replay_p99_ms": percentile(replay_ms, 0.99),
+        "compact_seconds": compact_seconds,
+        "segments_after_compaction": message_log.get_stats()["segment_count"],
+        "bytes_before_compaction": stats["total_bytes"],
+        "bytes_after_compaction": message_log.get_stats()["total_bytes"],
+        "reopen_seconds": reopen_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--message-length", type=int, default=40)
+    parser.add_argument("--segment-mb", type=int, default=16)
+    parser.add_argument("--replay-size", type=int, default=50)
+    parser.add_argument("--replays", type=int, default=2000)
+    parser.add_argument("--fsync-interval", type=float, default=0.5)
+    parser.add_argument("--yield-every", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
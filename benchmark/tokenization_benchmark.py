@@ -0,0 +1,81 @@
+# 메시지 1000개당 토큰화 비용을 기존 BERTSentenceTransform 방식과 BatchSentenceEncoder 방식으로 비교합니다.
+# 두 방식이 같은 token id를 만드는지도 함께 확인합니다.
+# 실행: python -m benchmark.tokenization_benchmark
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmark.inference_engine_benchmark import SAMPLE_SENTENCES
+
+
+def generate_messages(count, seed):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(1, 3)))
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from service.emotion_analysis.inference import (
+        BERTSentenceTransform,
+        max_len,
+        sentence_encoder,
+        tokenizer,
+        vocab,
+    )
+
+    messages = generate_messages(args.messages, args.seed)
+
+    # 기존 predict_emotion 방식: 호출마다 transform을 만들고 문장 단위로 배열 생성
+    def encode_before():
+        rows = []
+        for message in messages:
+            transform = BERTSentenceTransform(tokenizer, max_seq_length=max_len, vocab=vocab, pad=True, pair=False)
+            rows.append(transform([message]))
+        return (
+            np.stack([row[0] for row in rows]),
+            np.array([int(row[1]) for row in rows], dtype=np.int32),
+            np.stack([row[2] for row in rows]),
+        )
+
+    def encode_after():
+        return sentence_encoder.encode(messages, seq_length=max_len)
+
+    before = encode_before()
+    after = encode_after()
+    for before_array, after_array in zip(before, after):
+        assert np.array_equal(before_array, after_array), "token ids differ from BERTSentenceTransform"
+
+    def best_of(encode):
+        timings = []
+        for _ in range(args.repeat):
+            started_at = time.perf_counter()
+            encode()
+            timings.append(time.perf_counter() - started_at)
+        return min(timings)
+
+    before_seconds = best_of(encode_before)
+    after_seconds = best_of(encode_after)
+    per_1k = 1000 / args.messages
+
+    print(json.dumps({
+        "messages": args.messages,
+        "ids_identical": True,
+        "before_ms_per_1k": before_seconds * per_1k * 1000,
+        "after_ms_per_1k": after_seconds * per_1k * 1000,
+        "speedup": before_seconds / after_seconds if after_seconds else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+# 로컬에 서버를 띄우고 여러 채팅방에 많은 WebSocket 클라이언트를 연결해 채팅 경로의 성능을 측정합니다.
+# 기본값은 MockEmotionClassifier를 사용하고, --emotion-backend local로 실제 모델을 사용할 수 있습니다.
+# --protocol로 묶음 전송 형식(chat.v2.json, chat.v2.msgpack)을, --no-compression으로 permessage-deflate 없이 측정합니다.
+# 클라이언트가 INBOUND_MESSAGE_BURST를 넘게 빠르게 보내면 서버가 메시지를 줄바꿈으로 합쳐서 보내므로, 합쳐진 메시지도 하나씩 셉니다.
+# 초당 INBOUND_MESSAGES_PER_SECOND를 넘는 속도로 오래 보내면 밀린 메시지가 INBOUND_COALESCE_MAX_MESSAGES를 넘어 버려지고
+# delivered_messages가 expected_deliveries보다 작아집니다. 모두 전달되는지 확인하려면 --message-interval을 0.2 이상으로 둡니다.
+# 결과는 JSON으로 출력하고, --baseline으로 이전 결과를 넘기면 기준보다 나빠졌을 때 실패로 종료합니다.
+# 실행: python -m benchmark.websocket_load_benchmark --rooms 50 --clients-per-room 20
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+MESSAGE_PREFIX = "bench"
+
+
+def start_server(port: int, emotion_backend: str) -> subprocess.Popen:
+    env = {**os.environ, "EMOTION_CLASSIFIER_BACKEND": emotion_backend, "BROKER_BACKEND": "in_process"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(base_url: str, timeout_seconds: float):
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://{base_url}/ready").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"server {base_url} is not ready")
+
+
+# 서버 프로세스의 RSS (Linux에서만 측정)
+def read_rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# 받은 frame에서 유저 메시지 본문만 꺼냅니다.
+def decode_user_messages(protocol: Optional[str], data) -> List[str]:
+    if protocol == "chat.v2.msgpack":
+        import msgpack
+        # [user_id, username, message, message_type 코드, event_type 코드, sent_at]
+        return [item[2] for item in msgpack.unpackb(data) if item[3] == 1]
+    frames = json.loads(data)
+    if protocol != "chat.v2.json":
+        frames = [frames]
+    return [frame["message"] for frame in frames if frame["message_type"] == "USER_MESSAGE"]
+
+
+def percentile(sorted_values: List[float], ratio: float) -> Optional[float]:
+    if len(sorted_values) == 0:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def summarize_ms(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.5),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1] if values else None,
+    }
+
+
+class LoadResult:
+    def __init__(self, total_clients: int):
+        self.total_clients = total_clients
+        # 모든 클라이언트가 연결된 뒤 메시지를 보내기 시작하고,
+        # 서버 통계를 수집할 때까지 연결을 유지 (마지막 유저가 나가면 채팅방이 삭제됨)
+        self.connected_count = 0
+        self.finished_count = 0
+        self.all_connected = asyncio.Event()
+        self.all_finished = asyncio.Event()
+        self.stats_collected = asyncio.Event()
+
+        # 메시지를 보낸 시각부터 각 수신자가 받기까지 걸린 시간
+        self.latencies_ms: List[float] = []
+        # 메시지를 보낸 시각부터 채팅방의 마지막 수신자가 받기까지 걸린 시간 (message key -> ms)
+        self.fanout_ms_by_message: Dict[str, float] = {}
+        self.sent_count = 0
+        self.received_count = 0
+        self.received_frame_count = 0
+        self.connect_failures = 0
+
+    def mark_connected(self):
+        self.connected_count += 1
+        if self.connected_count == self.total_clients:
+            self.all_connected.set()
+
+    def mark_finished(self):
+        self.finished_count += 1
+        if self.finished_count == self.total_clients:
+            self.all_finished.set()
+
+
+async def run_client(
+        url: str,
+        client_name: str,
+        messages_per_client: int,
+        message_interval_seconds: float,
+        expected_message_count: int,
+        connect_semaphore: asyncio.Semaphore,
+        result: LoadResult,
+        receive_timeout_seconds: float,
+        protocol: Optional[str],
+        compression: Optional[str],
+):
+    async with connect_semaphore:
+        try:
+            websocket = await websockets.connect(
+                url,
+                max_queue=None,
+                subprotocols=[protocol] if protocol else None,
+                compression=compression,
+            )
+        except (OSError, websockets.WebSocketException):
+            result.connect_failures += 1
+            result.mark_connected()
+            result.mark_finished()
+            return
+
+    result.mark_connected()
+
+    async def receive():
+        received = 0
+        while received < expected_message_count:
+            data = await websocket.recv()
+            result.received_frame_count += 1
+            for text in decode_user_messages(protocol, data):
+                # 속도 제한에 걸린 메시지들은 줄바꿈으로 합쳐져서 옴 (service/chat/inbound_limiter.py)
+                for part in text.split("\n"):
+                    if not part.startswith(MESSAGE_PREFIX):
+                        continue
+                    # "bench <발신자> <순번> <보낸 시각(ns)>"
+                    _, sender, sequence, sent_at_ns = part.split(" ")
+                    latency_ms = (time.perf_counter_ns() - int(sent_at_ns)) / 1e6
+                    result.latencies_ms.append(latency_ms)
+                    key = f"{sender}:{sequence}"
+                    result.fanout_ms_by_message[key] = max(result.fanout_ms_by_message.get(key, 0.0), latency_ms)
+                    result.received_count += 1
+                    received += 1
+
+    async with websocket:
+        receive_task = asyncio.create_task(receive())
+        await result.all_connected.wait()
+        for sequence in range(messages_per_client):
+            message = f"{MESSAGE_PREFIX} {client_name} {sequence} {time.perf_counter_ns()}"
+            await websocket.send(json.dumps({"username": client_name, "message": message}))
+            result.sent_count += 1
+            await asyncio.sleep(message_interval_seconds)
+        try:
+            await asyncio.wait_for(receive_task, timeout=receive_timeout_seconds)
+        except asyncio.TimeoutError:
+            receive_task.cancel()
+        result.mark_finished()
+        await result.stats_collected.wait()
+
+
+async def run_load(args, server_pid: Optional[int]) -> dict:
+    base_url = args.server_url
+    async with httpx.AsyncClient(base_url=f"http://{base_url}") as client:
+        room_ids = [
+            (await client.post("/api/v1/chat/rooms/new")).json()["room_id"]
+            for _ in range(args.rooms)
+        ]
+
+        rss_before = read_rss_bytes(server_pid) if server_pid is not None else None
+
+        total_clients = args.rooms * args.clients_per_room
+        result = LoadResult(total_clients)
+        connect_semaphore = asyncio.Semaphore(args.connect_concurrency)
+        # 같은 채팅방의 모든 클라이언트가 보낸 메시지를 모두 받아야 함
+        expected_message_count = args.clients_per_room * args.messages_per_client
+
+        tasks = []
+        for room_index, room_id in enumerate(room_ids):
+            for client_index in range(args.clients_per_room):
+                client_name = f"r{room_index}c{client_index}"
+                tasks.append(run_client(
+                    url=f"ws://{base_url}/api/v1/chat/{room_id}/connect/{client_name}",
+                    client_name=client_name,
+                    messages_per_client=args.messages_per_client,
+                    message_interval_seconds=args.message_interval,
+                    expected_message_count=expected_message_count,
+                    connect_semaphore=connect_semaphore,
+                    result=result,
+                    receive_timeout_seconds=args.receive_timeout,
+                    protocol=args.protocol,
+                    compression=None if args.no_compression else "deflate",
+                ))
+
+        async def collect_server_stats():
+            await result.all_connected.wait()
+            connect_seconds = time.monotonic() - started_at
+            sending_started_at = time.monotonic()
+            # 입장 메시지가 모두 전달될 때까지 잠시 대기
+            await asyncio.sleep(1)
+            rss = read_rss_bytes(server_pid) if server_pid is not None else None
+
+            await result.all_finished.wait()
+            elapsed = time.monotonic() - sending_started_at
+            stats = [
+                (await client.get(f"/api/v1/chat/rooms/{room_id}/fanout-stats")).json()
+                for room_id in room_ids[:args.fanout_stats_rooms]
+            ]
+            result.stats_collected.set()
+            return rss, connect_seconds, elapsed, stats
+
+        started_at = time.monotonic()
+        stats_task = asyncio.create_task(collect_server_stats())
+        await asyncio.gather(*tasks)
+        rss_connected, connect_seconds, elapsed_seconds, fanout_stats = await stats_task
+
+    connected_clients = total_clients - result.connect_failures
+    memory_per_connection = None
+    if rss_before is not None and rss_connected is not None and connected_clients > 0:
+        memory_per_connection = (rss_connected - rss_before) / connected_clients
+
+    return {
+        "config": {
+            "rooms": args.rooms,
+            "clients_per_room": args.clients_per_room,
+            "messages_per_client": args.messages_per_client,
+            "message_interval_seconds": args.message_interval,
+            "emotion_backend": args.emotion_backend,
+            "protocol": args.protocol,
+            "compression": not args.no_compression,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git_revision": read_git_revision(),
+        },
+        "clients": total_clients,
+        "connect_failures": result.connect_failures,
+        "connect_seconds": connect_seconds,
+        "elapsed_seconds": elapsed_seconds,
+        "sent_messages": result.sent_count,
+        "delivered_messages": result.received_count,
+        "received_frames": result.received_frame_count,
+        "expected_deliveries": result.sent_count * args.clients_per_room,
+        "sent_per_second": result.sent_count / elapsed_seconds,
+        "delivered_per_second": result.received_count / elapsed_seconds,
+        "end_to_end_latency": summarize_ms(result.latencies_ms),
+        "fanout_latency": summarize_ms(list(result.fanout_ms_by_message.values())),
+        "server_fanout_stats_sample": fanout_stats,
+        "server_rss_before_bytes": rss_before,
+        "server_rss_connected_bytes": rss_connected,
+        "memory_per_connection_bytes": memory_per_connection,
+    }
+
+
+def read_git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 기준 결과보다 지연 시간이나 처리량이 tolerance 이상 나빠졌다면 항목을 반환합니다.
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for section in ("end_to_end_latency", "fanout_latency"):
+        current, previous = report[section]["p99_ms"], baseline[section]["p99_ms"]
+        if current is not None and previous and current > previous * (1 + tolerance):
+            regressions.append(f"{section}.p99_ms {previous:.2f} -> {current:.2f}")
+    current, previous = report["delivered_per_second"], baseline["delivered_per_second"]
+    if previous and current < previous * (1 - tolerance):
+        regressions.append(f"delivered_per_second {previous:.1f} -> {current:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--clients-per-room", type=int, default=20)
+    parser.add_argument("--messages-per-client", type=int, default=10)
+    parser.add_argument("--message-interval", type=float, default=0.1)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--receive-timeout", type=float, default=30)
+    parser.add_argument("--fanout-stats-rooms", type=int, default=5)
+    parser.add_argument("--protocol", choices=["chat.v2.json", "chat.v2.msgpack"])
+    parser.add_argument("--no-compression", action="store_true")
+    parser.add_argument("--emotion-backend", default="mock", choices=["mock", "local"])
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--server-url", help="이미 실행 중인 서버를 사용 (예: 127.0.0.1:8000). 메모리는 측정하지 않음")
+    parser.add_argument("--output", help="결과 JSON을 저장할 파일")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON 파일")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # 클라이언트 수만큼 file descriptor가 필요
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+
+    server = None
+    server_pid = None
+    if args.server_url is None:
+        args.server_url = f"127.0.0.1:{args.port}"
+        server = start_server(args.port, args.emotion_backend)
+        server_pid = server.pid
+
+    try:
+        wait_until_ready(args.server_url, timeout_seconds=300 if args.emotion_backend == "local" else 30)
+        report = asyncio.run(run_load(args, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(output)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare_with_baseline(report, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
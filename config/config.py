@@ -1,2 +1,159 @@
+import os
+
 # 현재 메모리에 유저당 메시지를 저장하고 있는데, 너무 많은 메모리를 차지하지 않도록 개수를 제한합니다.
 MAX_MESSAGE_TO_SAVE = 30
+# 채팅방 전체에서 보관하는 최근 메시지 수와 히스토리에 저장하는 메시지의 최대 글자 수
+# 유저별 메시지와 채팅방 메시지는 같은 레코드를 공유하고, 메모리 사용량의 상한은 message_history에서 계산합니다.
+ROOM_HISTORY_MAX_SIZE = 200
+HISTORY_MAX_MESSAGE_LENGTH = 500
+
+# 여러 채팅방의 감정 분석 요청을 모아서 한 번의 forward pass로 처리합니다.
+# 배치가 최대 크기에 도달하거나 대기 시간이 지나면 즉시 추론합니다.
+EMOTION_BATCH_MAX_SIZE = 32
+EMOTION_BATCH_MAX_WAIT_SECONDS = 0.05
+
+# 감정 분석 추론은 이벤트 루프를 막지 않도록 별도 executor에서 실행합니다.
+# "thread" 또는 "process"를 사용할 수 있고, process는 worker마다 모델을 따로 로드합니다.
+EMOTION_EXECUTOR_TYPE = "thread"
+EMOTION_EXECUTOR_MAX_WORKERS = 1
+# 동시에 executor에 들어갈 수 있는 추론 요청 수와 요청당 제한 시간
+EMOTION_MAX_CONCURRENT_INFERENCES = 2
+EMOTION_INFERENCE_TIMEOUT_SECONDS = 10.0
+
+# 유저 연결마다 전송 대기열을 두고 별도 writer task가 메시지를 전송합니다.
+# broadcast는 대기열에 넣기만 하므로 느린 클라이언트가 다른 유저의 전송을 막지 않습니다.
+SEND_QUEUE_MAX_SIZE = 256
+# 대기열이 가득 찬 느린 클라이언트 처리 방식: "drop_oldest"(가장 오래된 메시지 버림) 또는 "disconnect"(연결 종료)
+SEND_QUEUE_OVERFLOW_POLICY = "drop_oldest"
+# fan-out 지연시간 백분위 계산에 사용할 최근 표본 수
+FANOUT_LATENCY_SAMPLE_SIZE = 1024
+
+# 추론 시 배치를 max_len(64)까지 채우지 않고 배치 내 가장 긴 문장 길이까지만 패딩합니다.
+# 길이가 비슷한 문장끼리 묶이도록 길이순으로 정렬한 뒤 INFERENCE_BUCKET_SIZE개씩 나눠서 추론합니다.
+INFERENCE_DYNAMIC_PADDING = True
+INFERENCE_BUCKET_SIZE = 16
+
+# 같은 문장이 반복해서 들어오면 모델을 거치지 않도록 분류 결과를 캐시합니다.
+# 정규화한 문장의 해시를 키로 사용하며, 크기를 0으로 두면 캐시를 사용하지 않습니다.
+EMOTION_CACHE_MAX_SIZE = 10000
+EMOTION_CACHE_TTL_SECONDS = 600
+# 캐시가 가득 찼을 때 제거할 항목 선택 방식: "lru"(가장 오래 사용되지 않은 항목) 또는 "fifo"(가장 먼저 저장된 항목)
+EMOTION_CACHE_EVICTION_POLICY = "lru"
+
+# CPU 추론 엔진 선택
+# - "eager": 기존 fp32 eager 모드
+# - "quantized": Linear 레이어를 동적 int8 양자화한 모델
+# - "torchscript": max_len 길이로 trace 후 freeze 한 TorchScript 모델 (동적 패딩 대신 max_len 패딩 사용)
+INFERENCE_ENGINE = "eager"
+# torch intra-op / inter-op 스레드 수. 0이면 torch 기본값을 사용합니다.
+INFERENCE_NUM_THREADS = 0
+INFERENCE_NUM_INTEROP_THREADS = 0
+
+# 과부하일 때 추론 비용을 단계적으로 낮추고, 부하가 줄면 다시 원래대로 돌아옵니다. (service/emotion_analysis/load_controller.py)
+# - "full": 12층 encoder 전체
+# - "early_exit": 앞쪽 INFERENCE_EXIT_LAYER층까지만 계산하고 오프라인으로 학습한 exit head로 분류
+#                 exit head 파일이 없거나 torchscript 엔진이면 이 단계는 건너뜀
+#                 (학습/평가: python -m scripts.evaluate_inference_tiers)
+# - "shed": early_exit에 더해 유저 수가 EMOTION_SHED_MIN_CONNECTIONS명 미만인 채팅방은 분석을 미룸
+INFERENCE_ADAPTIVE_ENABLED = True
+INFERENCE_EXIT_LAYER = 4
+INFERENCE_EXIT_HEADS_PATH = './saved_exit_heads.pth'
+# 추론 한 번(executor 대기 포함)의 목표 지연시간. 최근 지연시간 평균이 이 값을 넘으면 과부하로 판단
+INFERENCE_LATENCY_SLO_SECONDS = 1.0
+# micro-batcher 대기열에 이보다 많은 요청이 쌓여 있으면 과부하로 판단
+INFERENCE_QUEUE_HIGH_WATERMARK = 64
+# 과부하가 이어질 때 다음 단계로 내려가기 전에 기다리는 시간 (낮춘 단계가 효과를 낼 시간)
+INFERENCE_TIER_ESCALATE_SECONDS = 2
+# 이 시간 동안 과부하가 아니면 한 단계씩 원래대로 돌아옴
+INFERENCE_TIER_RECOVERY_SECONDS = 10
+EMOTION_SHED_MIN_CONNECTIONS = 2
+
+# 감정 분석 방식
+# - "incremental": 유저 메시지가 들어올 때마다 한 번만 분류하고, 유저/채팅방별 감정 상태를 누적해 둡니다.
+#                  주기적인 감정 안내는 누적된 상태만 읽으므로 새 메시지가 없는 방은 추론 비용이 없습니다.
+# - "sweep": 주기마다 임의의 유저의 최근 메시지를 합쳐서 다시 분류합니다.
+EMOTION_ANALYSIS_MODE = "incremental"
+# 누적 감정 상태에서 이전 상태를 유지하는 비율 (0이면 마지막 메시지만 반영)
+EMOTION_STATE_DECAY = 0.7
+# sweep 모드에서 분석에 사용할 유저의 최근 메시지 수 (히스토리에 저장할 때 글자 수가 제한되므로 입력 크기도 제한됨)
+EMOTION_CONTEXT_MAX_MESSAGES = 10
+# 최근 메시지부터 거꾸로 토큰을 채울 chunk(모델 입력 한 줄, max_len - 2 토큰) 수
+# 1이면 모델 입력 한 줄을 정확히 채우고, 2 이상이면 chunk들을 한 배치로 추론한 뒤 logits를 토큰 수로 가중 평균합니다.
+# 분석 한 번의 비용은 메시지가 얼마나 많든 최대 chunk 수만큼의 입력으로 제한됩니다.
+EMOTION_CONTEXT_MAX_CHUNKS = 1
+# context 분류 결과는 문장 캐시와 따로 작게 캐시합니다. 새 메시지가 오면 context가 바뀌어 재사용이 드물기 때문에,
+# 같은 캐시에 넣으면 자주 반복되는 문장의 결과가 밀려나게 됩니다. 0이면 context는 캐시하지 않습니다.
+EMOTION_CONTEXT_CACHE_MAX_SIZE = 256
+
+# 여러 uvicorn worker가 같은 채팅방을 공유할 수 있도록 채팅방 정보와 메시지를 broker로 주고받습니다.
+# - "in_process": 단일 worker
+# - "unix_socket": 같은 노드의 worker들이 BROKER_SOCKET_PATH의 Unix socket hub로 연결
+BROKER_BACKEND = os.getenv("BROKER_BACKEND", "in_process")
+BROKER_SOCKET_PATH = os.getenv("BROKER_SOCKET_PATH", "/tmp/emotional-analysis-chat-broker.sock")
+
+# 감정 분류기 선택
+# - "local": 현재 프로세스에서 모델을 로드
+# - "remote": 별도로 띄운 추론 서버(python -m service.emotion_analysis.inference_server)에 요청
+#             여러 worker가 모델 하나를 공유하며, 서버가 응답하지 않으면 해당 메시지의 감정 분석을 건너뜀
+# - "mock": 모델 없이 고정된 결과 반환 (m1 등 로컬 개발용)
+EMOTION_CLASSIFIER_BACKEND = os.getenv("EMOTION_CLASSIFIER_BACKEND", "local")
+INFERENCE_SERVER_SOCKET_PATH = os.getenv("INFERENCE_SERVER_SOCKET_PATH", "/tmp/emotional-analysis-chat-inference.sock")
+INFERENCE_SERVER_TIMEOUT_SECONDS = 5.0
+# 추론 서버가 준비될 때까지 기다리는 최대 시간. 넘으면 DEGRADED 상태로 요청을 시도하고, 요청이 성공하면 READY로 바뀜
+INFERENCE_SERVER_READY_WAIT_SECONDS = 120
+
+# 채팅방별 감정 분석 주기. 채팅방마다 분석 시점을 주기 안에서 분산시켜 부하가 한 번에 몰리지 않도록 합니다.
+EMOTION_ANALYSIS_INTERVAL_SECONDS = 20
+# 채팅방별로 지정한 분석 주기가 이보다 짧으면 이 값을 사용
+EMOTION_ANALYSIS_MIN_INTERVAL_SECONDS = 1
+# 초당 실행할 수 있는 감정 분석 추론 수 (sweep 모드에서 모든 채팅방이 공유)
+EMOTION_INFERENCE_BUDGET_PER_SECOND = 20
+
+# 클라이언트가 연결할 때 선택할 수 있는 전송 형식 (service/chat/wire_protocol.py)
+# 묶음 형식은 OUTBOUND_BATCH_WINDOW_SECONDS 동안 쌓인 메시지를 최대 OUTBOUND_BATCH_MAX_MESSAGES개까지 한 frame으로 보냅니다.
+OUTBOUND_PROTOCOLS_ENABLED = ["chat.v2.json", "chat.v2.msgpack"]
+OUTBOUND_BATCH_WINDOW_SECONDS = 0.01
+OUTBOUND_BATCH_MAX_MESSAGES = 64
+
+# 한 연결에서 받을 수 있는 메시지의 최대 길이(문자 수). 파싱하기 전에 확인합니다.
+INBOUND_MAX_MESSAGE_LENGTH = 4000
+# 연결별로 초당 broadcast 할 수 있는 메시지 수와 순간적으로 허용하는 메시지 수 (token bucket)
+INBOUND_MESSAGES_PER_SECOND = 5
+INBOUND_MESSAGE_BURST = 10
+# 제한을 넘은 메시지를 버리지 않고 모아두었다가 하나로 합쳐서 보냅니다. 최대 개수를 넘으면 버림
+INBOUND_COALESCE_ENABLED = True
+INBOUND_COALESCE_MAX_MESSAGES = 20
+
+# 채팅방 메시지를 파일에 기록하고, 새로 입장한 유저에게 최근 메시지를 보여줍니다.
+# worker마다 MESSAGE_LOG_DIRECTORY 아래 worker-N 디렉터리를 사용합니다.
+MESSAGE_LOG_ENABLED = os.getenv("MESSAGE_LOG_ENABLED", "false") == "true"
+MESSAGE_LOG_DIRECTORY = os.getenv("MESSAGE_LOG_DIRECTORY", "./data/message-log")
+MESSAGE_LOG_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+MESSAGE_LOG_MAX_TOTAL_BYTES = 1024 * 1024 * 1024
+MESSAGE_LOG_RETENTION_SECONDS = 7 * 24 * 60 * 60
+# 입장할 때 재생하는 최근 메시지 수
+MESSAGE_LOG_REPLAY_SIZE = 50
+# 기록한 메시지는 이 주기마다 모아서 fsync 합니다. 비정상 종료 시 마지막 주기의 메시지는 잃을 수 있음
+MESSAGE_LOG_FSYNC_INTERVAL_SECONDS = 0.5
+# 재생에 쓰이는 레코드 비율이 threshold보다 낮은 segment는 필요한 레코드만 남겨 다시 씀
+MESSAGE_LOG_COMPACT_INTERVAL_SECONDS = 60
+MESSAGE_LOG_COMPACT_THRESHOLD = 0.3
+
+# 만든 뒤 이 시간 동안 아무도 입장하지 않은 채팅방은 제거합니다. (하나의 sweeper가 주기적으로 확인)
+INACTIVE_ROOM_TTL_SECONDS = 10
+INACTIVE_ROOM_SWEEP_INTERVAL_SECONDS = 1
+
+# 로비의 채팅방 목록 페이지 크기
+ROOM_LIST_DEFAULT_PAGE_SIZE = 100
+ROOM_LIST_MAX_PAGE_SIZE = 500
+# 인원수가 자주 바뀌어도 채팅방 목록은 최소 이 간격으로만 다시 만듭니다.
+ROOM_LIST_SNAPSHOT_MIN_INTERVAL_SECONDS = 0.5
+# 채팅방 목록 변경을 모아서 구독자에게 보내는 주기와 구독자별 대기열 크기
+ROOM_LIST_DELTA_FLUSH_SECONDS = 0.2
+ROOM_LIST_SUBSCRIBER_QUEUE_SIZE = 64
+ROOM_LIST_KEEPALIVE_SECONDS = 15
+
+# /debug/profile 에서 sampling profiler를 실행할 수 있도록 허용합니다. (운영에서는 필요할 때만 켬)
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false") == "true"
+PROFILER_SAMPLE_INTERVAL_SECONDS = 0.01
+PROFILER_MAX_DURATION_SECONDS = 60
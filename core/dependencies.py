@@ -1,11 +1,116 @@
+import asyncio
+
+from config.config import (
+    BROKER_BACKEND,
+    BROKER_SOCKET_PATH,
+    EMOTION_ANALYSIS_INTERVAL_SECONDS,
+    EMOTION_ANALYSIS_MODE,
+    EMOTION_BATCH_MAX_SIZE,
+    EMOTION_BATCH_MAX_WAIT_SECONDS,
+    EMOTION_CLASSIFIER_BACKEND,
+    EMOTION_INFERENCE_BUDGET_PER_SECOND,
+    EMOTION_STATE_DECAY,
+)
+from core.metrics import registry
+from service.chat.broker import create_broker
 from service.chat.chat_room_manager import ChatRoomManager
+from service.chat.inactive_room_sweeper import InactiveRoomSweeper
+from service.chat.room_directory import RoomDirectory
+from service.emotion_analysis.analysis_scheduler import RoomAnalysisScheduler
 from service.emotion_analysis.emotion_classifier import EmotionClassifier
+from service.emotion_analysis.load_controller import TIER_LEVELS
+from service.emotion_analysis.micro_batcher import MicroBatcher
+from service.emotion_analysis.room_emotion_analyzer import RoomEmotionAnalyzer
+from service.emotion_analysis.room_emotion_tracker import RoomEmotionTracker
 
 # DI 구조를 고민하다가 지금은 단순하게 여기에 의존성을 Singleton으로 선언해둡니다.
 
-chat_room_manager = ChatRoomManager()
+chat_room_manager = ChatRoomManager(broker=create_broker(BROKER_BACKEND, BROKER_SOCKET_PATH))
+
+
+def create_emotion_classifier(backend: str) -> EmotionClassifier:
+    if backend == "local":
+        return EmotionClassifier()
+    if backend == "remote":
+        from service.emotion_analysis.remote_emotion_classifier import RemoteEmotionClassifier
+        return RemoteEmotionClassifier()
+    if backend == "mock":
+        # m1 import 이슈로 작업할 때는 EMOTION_CLASSIFIER_BACKEND=mock 으로 실행
+        from service.emotion_analysis.mock_emotion_classifier import MockEmotionClassifier
+        return MockEmotionClassifier()
+    raise ValueError(f"Unknown emotion classifier backend: {backend}")
+
+
+emotion_classifier = create_emotion_classifier(EMOTION_CLASSIFIER_BACKEND)
+
+# 모든 채팅방의 감정 분석 요청을 모아서 배치로 추론합니다. 결과는 문장별 logits 입니다.
+emotion_batcher = MicroBatcher(
+    batch_handler=emotion_classifier.classify_logits_batch_async,
+    max_batch_size=EMOTION_BATCH_MAX_SIZE,
+    max_wait_seconds=EMOTION_BATCH_MAX_WAIT_SECONDS,
+)
+
+# sweep 모드의 채팅방 분석 요청(유저의 최근 메시지 목록)을 모아서 배치로 추론합니다.
+emotion_context_batcher = MicroBatcher(
+    batch_handler=emotion_classifier.classify_context_logits_batch_async,
+    max_batch_size=EMOTION_BATCH_MAX_SIZE,
+    max_wait_seconds=EMOTION_BATCH_MAX_WAIT_SECONDS,
+)
+
+# 대기열이 길어지면 추론 단계를 낮춤
+emotion_classifier.load_controller.add_pressure_source(emotion_batcher.queue_depth)
+emotion_classifier.load_controller.add_pressure_source(emotion_context_batcher.queue_depth)
+
+room_emotion_tracker = RoomEmotionTracker(
+    chat_room_manager=chat_room_manager,
+    emotion_classifier=emotion_classifier,
+    emotion_batcher=emotion_batcher,
+    decay=EMOTION_STATE_DECAY,
+)
+
+room_emotion_analyzer = RoomEmotionAnalyzer(
+    chat_room_manager=chat_room_manager,
+    emotion_classifier=emotion_classifier,
+    context_batcher=emotion_context_batcher,
+    mode=EMOTION_ANALYSIS_MODE,
+)
+
+# 채팅방마다 분석 시점을 분산하고, 새 메시지가 없는 채팅방은 건너뜁니다.
+room_analysis_scheduler = RoomAnalysisScheduler(
+    chat_room_manager=chat_room_manager,
+    analyze=room_emotion_analyzer.analyze,
+    should_analyze=room_emotion_analyzer.should_analyze,
+    interval_seconds=EMOTION_ANALYSIS_INTERVAL_SECONDS,
+    inference_budget_per_second=EMOTION_INFERENCE_BUDGET_PER_SECOND,
+    consumes_inference=room_emotion_analyzer.consumes_inference(),
+)
+
+inactive_room_sweeper = InactiveRoomSweeper(chat_room_manager)
+
+# 로비의 채팅방 목록과 변경 알림
+room_directory = RoomDirectory(chat_room_manager)
 
-emotion_classifier = EmotionClassifier()
-# m1 import 이슈로 작업할 때는 MockEmotionClassifier 사용
-# main에 merge 되지 않도록 주의해주세요!
-# emotion_classifier = MockEmotionClassifier()
+# /metrics 요청 시점에 읽는 gauge
+registry.gauge("chat_rooms", "Number of chat rooms", lambda: len(chat_room_manager.chat_room_by_id))
+registry.gauge("chat_local_connections", "WebSocket connections on this worker", lambda: sum(
+    chat_room.count_local_connections() for chat_room in chat_room_manager.list_chat_rooms()
+))
+registry.gauge("chat_send_queue_messages", "Messages waiting in per-connection send queues", lambda: sum(
+    connection.send_queue.qsize()
+    for chat_room in chat_room_manager.list_chat_rooms() for connection in chat_room.list_connections()
+))
+registry.gauge("asyncio_tasks", "Pending asyncio tasks", lambda: len(asyncio.all_tasks()))
+registry.gauge("emotion_batcher_queue_depth", "Messages waiting in the micro-batcher", emotion_batcher.queue_depth)
+registry.gauge("emotion_context_batcher_queue_depth", "Room analysis contexts waiting in the micro-batcher",
+               emotion_context_batcher.queue_depth)
+registry.gauge("emotion_tracker_pending", "Messages being classified for room emotion state",
+               room_emotion_tracker.count_pending)
+registry.gauge("emotion_analysis_pending", "Room analyses in flight",
+               lambda: room_analysis_scheduler.get_stats()["pending_analysis_count"])
+registry.gauge("inactive_room_sweeper_watching", "New rooms waiting to be checked for inactivity",
+               inactive_room_sweeper.count_watching)
+registry.gauge("room_list_subscribers", "Lobby clients subscribed to room list changes",
+               room_directory.count_subscribers)
+registry.gauge("emotion_inference_tier", "Current load tier (0 full, 1 early_exit, 2 shed)",
+               lambda: TIER_LEVELS[emotion_classifier.load_controller.tier])
+registry.gauge("emotion_model_ready", "1 if the emotion model is loaded", lambda: int(emotion_classifier.is_ready()))
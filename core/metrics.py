@@ -0,0 +1,165 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text format(/metrics)로 내보내는 간단한 metric 모음
+# 추론은 executor thread에서 기록되므로 값 변경은 lock으로 보호합니다. (경합이 거의 없어 비용이 작음)
+# process executor를 사용하면 추론 metric은 자식 프로세스에 기록되어 /metrics에는 나타나지 않습니다.
+
+# 초 단위 기본 bucket (0.5ms ~ 10s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(label_names: Sequence[str], label_values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_values, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+# 값을 저장하지 않고 /metrics 요청 시점에 callback으로 읽는 gauge
+class Gauge:
+    def __init__(self, name: str, description: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self._read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = self._read()
+        except Exception as e:
+            print(e)
+            return []
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._buckets = tuple(buckets)
+        # label 값 -> (bucket별 개수, 합계, 전체 개수)
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        # 누적 개수는 render에서 계산하므로 기록할 때는 bucket 하나만 증가
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = [[0] * (len(self._buckets) + 1), 0.0, 0]
+                self._series[label_values] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, *label_values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(label_values, list(series[0]), series[1], series[2])
+                        for label_values, series in self._series.items()]
+
+        for label_values, bucket_counts, total, count in snapshot:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self._buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, label_values, f'le="{upper_bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, label_names))
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, description, read))
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  label_names: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, description, buckets, label_names))
+
+    def get(self, name: str) -> Optional[object]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# 핫 패스에서 기록하는 metric
+inference_seconds = registry.histogram(
+    "emotion_inference_seconds", "predict_emotion_logits latency by phase", label_names=("phase",))
+inference_batch_size = registry.histogram(
+    "emotion_inference_batch_size", "Number of model inputs (sentences or context chunks) per inference call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+context_tokens = registry.histogram(
+    "emotion_context_tokens", "Tokens used per analysis context (chunks * (max_len - 2) at most)",
+    buckets=(8, 16, 32, 62, 124, 248, 496))
+inference_tier_total = registry.counter(
+    "emotion_inference_tier_total",
+    "Inputs classified per load tier (full, early_exit) and room analyses skipped by shedding (shed)",
+    label_names=("tier",))
+broadcast_seconds = registry.histogram(
+    "chat_broadcast_seconds", "ConnectionManager.broadcast latency (enqueue to every connection)")
+receive_message_seconds = registry.histogram(
+    "chat_receive_message_parse_seconds", "Time to parse a received WebSocket message")
+outbound_batch_size = registry.histogram(
+    "chat_outbound_batch_size", "Messages per outbound frame for batching protocols",
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+inbound_messages_total = registry.counter(
+    "chat_inbound_messages_total", "Inbound user messages by rate limiter result", label_names=("result",))
+errors_total = registry.counter(
+    "errors_total", "Exceptions caught in background tasks", label_names=("source",))
@@ -0,0 +1,59 @@
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+
+# 일정 주기로 모든 thread의 stack을 샘플링하는 profiler
+# 샘플링 thread 하나만 추가되고 측정 대상 코드는 계측하지 않으므로 운영 중에도 잠시 켜볼 수 있습니다.
+# 결과는 flamegraph 도구에서 읽을 수 있는 collapsed stack 형식("a;b;c 횟수")입니다.
+class SamplingProfiler:
+    def __init__(self, interval_seconds: float = 0.01, max_depth: int = 64):
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self.sample_count = 0
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        self._stacks = Counter()
+        self.sample_count = 0
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval_seconds):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                self._stacks[self._collapse(frame)] += 1
+            self.sample_count += 1
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def render(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common()) + "\n"
+
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+
+# 초당 rate개씩 토큰이 채워지고 최대 capacity개까지 쌓이는 token bucket
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    # 토큰이 부족할 때 다시 채워지기까지 남은 시간
+    def seconds_until_available(self, tokens: float = 1) -> float:
+        self._refill()
+        if self._tokens >= tokens:
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    # 토큰을 얻을 때까지 기다리고, 기다린 시간을 반환합니다.
+    async def acquire(self, tokens: float = 1) -> float:
+        started_at = time.monotonic()
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.seconds_until_available(tokens))
+        return time.monotonic() - started_at
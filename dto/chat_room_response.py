@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -11,3 +12,4 @@ class ChatRoomResponse:
 @dataclass
 class ListChatRoomsResponse:
     chat_rooms: list[ChatRoomResponse]
+    next_cursor: Optional[str] = None
@@ -1,22 +1,38 @@
 import asyncio
-import random
 from typing import Optional
 
 from fastapi import FastAPI, Request, Query
-from starlette.responses import HTMLResponse, RedirectResponse
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse
 from starlette.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates
 
-from api import chat_api
-from core.dependencies import emotion_classifier, chat_room_manager
-from service.chat.user_connection import UserConnection
+from api import chat_api, emotion_api
+from config.config import (
+    MESSAGE_LOG_DIRECTORY,
+    MESSAGE_LOG_ENABLED,
+    PROFILER_ENABLED,
+    PROFILER_MAX_DURATION_SECONDS,
+    PROFILER_SAMPLE_INTERVAL_SECONDS,
+)
+from core.dependencies import (
+    chat_room_manager,
+    emotion_classifier,
+    inactive_room_sweeper,
+    room_analysis_scheduler,
+    room_directory,
+)
+from core.metrics import errors_total, registry
+from core.sampling_profiler import SamplingProfiler
+from service.chat.message_log import open_worker_message_log
 
 app = FastAPI()
+profiler = SamplingProfiler(interval_seconds=PROFILER_SAMPLE_INTERVAL_SECONDS)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # web path와 구분을 위해 /api prefix를 사용합니다.
 app.include_router(chat_api.router, prefix="/api")
+app.include_router(emotion_api.router, prefix="/api")
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -48,40 +64,66 @@ async def health_check():
     return {"status": "ok"}
 
 
-async def broadcast_emotion_message():
-    while True:
-        try:
-            await asyncio.sleep(20)
+# 감정 분석 모델은 서버 시작 후 백그라운드에서 로드되므로, 로드 상태는 별도로 확인합니다.
+@app.get("/ready")
+async def readiness_check():
+    load_status = emotion_classifier.get_load_status()
+    status_code = 200 if emotion_classifier.is_ready() else 503
+    return JSONResponse(content=load_status, status_code=status_code)
 
-            for room in chat_room_manager.list_chat_rooms():
-                if room.count_connections() == 0:
-                    continue
 
-                user_connection: UserConnection = random.choice(room.list_connections())
-                messages = user_connection.list_messages()
-                if len(messages) == 0:
-                    await chat_room_manager.broadcast_system_message(
-                        room_id=room.room_id,
-                        message="메시지를 입력해보세요!"
-                    )
-                    continue
+# Prometheus text format
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
-                # 임의로 최근 메시지를 활용
-                # 안정성을 위해 글자수 제한이 필요해보이지만 지금은 위험도가 낮은 걸로 판단되어 제한하지 않음
-                target_messages = messages[-10:]
-                combined_message = "\n".join([message.message for message in target_messages])
 
-                emotion_text = emotion_classifier.classify(combined_message)
+# 지정한 시간 동안 stack을 샘플링해서 collapsed stack 형식으로 반환합니다. (PROFILER_ENABLED=true 일 때만)
+@app.get("/debug/profile")
+async def profile(seconds: float = 10):
+    if not PROFILER_ENABLED:
+        return JSONResponse(content={"message": "Profiler is disabled"}, status_code=404)
+    if profiler.is_running():
+        return JSONResponse(content={"message": "Profiler is already running"}, status_code=409)
 
-                await chat_room_manager.broadcast_system_message(
-                    room_id=room.room_id,
-                    message=f"{user_connection.username}의 {emotion_text} 느껴집니다."
-                )
+    profiler.reset()
+    profiler.start()
+    try:
+        await asyncio.sleep(min(seconds, PROFILER_MAX_DURATION_SECONDS))
+    finally:
+        profiler.stop()
+    return PlainTextResponse(profiler.render())
 
-        except Exception as e:
-            print(e)
+
+async def load_emotion_classifier():
+    try:
+        await emotion_classifier.load_async()
+    except Exception as e:
+        print(e)
+        errors_total.inc("emotion_classifier_load")
 
 
 @app.on_event("startup")
-def startup_event():
-    asyncio.create_task(broadcast_emotion_message())
+async def startup_event():
+    if MESSAGE_LOG_ENABLED:
+        message_log = await open_worker_message_log(MESSAGE_LOG_DIRECTORY)
+        if message_log is not None:
+            chat_room_manager.attach_message_log(message_log)
+        else:
+            print(f"No available message log directory in {MESSAGE_LOG_DIRECTORY}")
+    await chat_room_manager.start()
+    asyncio.create_task(load_emotion_classifier())
+    room_analysis_scheduler.start()
+    room_directory.start()
+    inactive_room_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await inactive_room_sweeper.stop()
+    await room_directory.stop()
+    await room_analysis_scheduler.stop()
+    await chat_room_manager.stop()
+    if chat_room_manager.message_log is not None:
+        await chat_room_manager.message_log.stop()
+    emotion_classifier.shutdown()
@@ -0,0 +1,95 @@
+# 두 개의 uvicorn worker를 unix_socket broker로 띄우고, 각 worker에 연결한 유저가 같은 채팅방에서
+# 서로의 메시지를 받는지 확인합니다. 감정 모델은 로드하지 않도록 MockEmotionClassifier를 사용합니다.
+# 같은 경로를 프로세스 없이 확인하는 테스트는 tests/test_multi_worker_room.py 입니다.
+# 실행: python -m scripts.check_multi_worker_room
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+
+def start_worker(port: int, socket_path: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "BROKER_BACKEND": "unix_socket",
+        "BROKER_SOCKET_PATH": socket_path,
+        "EMOTION_CLASSIFIER_BACKEND": "mock",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_healthy(port: int, timeout_seconds: float = 30):
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"worker on port {port} did not start")
+
+
+async def receive_user_message(websocket, expected: str, timeout_seconds: float = 5):
+    async def receive():
+        while True:
+            message = json.loads(await websocket.recv())
+            if message["message_type"] == "USER_MESSAGE" and message["message"] == expected:
+                return message
+
+    return await asyncio.wait_for(receive(), timeout=timeout_seconds)
+
+
+async def check(ports):
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"http://127.0.0.1:{ports[0]}/api/v1/chat/rooms/new")
+        room_id = response.json()["room_id"]
+
+        # 채팅방 생성 이벤트가 다른 worker에 전달될 때까지 잠시 대기
+        await asyncio.sleep(0.5)
+
+        first_url = f"ws://127.0.0.1:{ports[0]}/api/v1/chat/{room_id}/connect/alice"
+        second_url = f"ws://127.0.0.1:{ports[1]}/api/v1/chat/{room_id}/connect/bob"
+        async with websockets.connect(first_url) as alice, websockets.connect(second_url) as bob:
+            await bob.send(json.dumps({"username": "bob", "message": "hello from worker 2"}))
+            await receive_user_message(alice, "hello from worker 2")
+
+            await alice.send(json.dumps({"username": "alice", "message": "hello from worker 1"}))
+            await receive_user_message(bob, "hello from worker 1")
+
+            await asyncio.sleep(0.5)
+            for port in ports:
+                room = (await client.get(f"http://127.0.0.1:{port}/api/v1/chat/rooms/{room_id}")).json()
+                assert room["user_count"] == 2, f"worker on port {port} reports {room['user_count']} users"
+
+
+def main():
+    ports = (8101, 8102)
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "broker.sock")
+        workers = [start_worker(port, socket_path) for port in ports]
+        try:
+            for port in ports:
+                wait_until_healthy(port)
+            asyncio.run(check(ports))
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.wait()
+
+    print("OK: two workers share one room")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# 과부하 단계(service/emotion_analysis/load_controller.py)에서 사용하는 early exit head를 학습하고, 단계별 정확도를 측정합니다.
+# 데이터는 한 줄에 "문장<TAB>라벨" 형식의 TSV 파일이며, 라벨은 emotion_keyword_map의 번호(0~6) 입니다.
+#
+# exit head 학습: 본 모델은 고정한 채 각 encoder layer의 [CLS] hidden state로 선형 분류기를 학습해서 저장
+#   python -m scripts.evaluate_inference_tiers calibrate --dataset train.tsv --layers 2 4 6
+# 단계별 평가: full과 layer별 early exit의 정확도, full과의 라벨 일치율, 처리량
+#   python -m scripts.evaluate_inference_tiers evaluate --dataset test.tsv
+# shed 단계는 분석을 건너뛰는 단계라 정확도 측정 대상이 아닙니다.
+import argparse
+import json
+import random
+import time
+
+from config.config import INFERENCE_EXIT_HEADS_PATH
+
+
+def load_dataset(path):
+    sentences, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            # 헤더나 형식이 맞지 않는 줄은 건너뜀
+            if len(parts) < 2 or not parts[-1].strip().isdigit():
+                continue
+            sentences.append(parts[0])
+            labels.append(int(parts[-1]))
+    return sentences, labels
+
+
+def extract_cls_features(model, sentences, layers, batch_size):
+    import torch
+
+    from service.emotion_analysis.inference import _to_tensors, sentence_encoder
+
+    features = {layer: [] for layer in layers}
+    for start in range(0, len(sentences), batch_size):
+        token_ids, valid_length, segment_ids = _to_tensors(*sentence_encoder.encode(sentences[start:start + batch_size]))
+        attention_mask = model.gen_attention_mask(token_ids, valid_length)
+        with torch.no_grad():
+            outputs = model.bert(input_ids=token_ids, token_type_ids=segment_ids, attention_mask=attention_mask,
+                                 output_hidden_states=True, return_dict=True)
+        # hidden_states[0]은 embedding 출력, hidden_states[n]은 n번째 encoder layer 출력
+        for layer in layers:
+            features[layer].append(outputs.hidden_states[layer][:, 0])
+    return {layer: torch.cat(chunks) for layer, chunks in features.items()}
+
+
+def train_head(head, features, labels, epochs, batch_size, learning_rate):
+    import torch
+    from torch import nn
+
+    optimizer = torch.optim.Adam(head.parameters(), lr=learning_rate)
+    loss_function = nn.CrossEntropyLoss()
+    head.train()
+    for _ in range(epochs):
+        order = torch.randperm(len(labels))
+        for start in range(0, len(labels), batch_size):
+            index = order[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = loss_function(head(features[index]), labels[index])
+            loss.backward()
+            optimizer.step()
+    head.eval()
+
+
+def accuracy(head, features, labels):
+    import torch
+
+    with torch.no_grad():
+        return (head(features).argmax(dim=1) == labels).float().mean().item() if len(labels) else None
+
+
+def calibrate(args):
+    import torch
+
+    from service.emotion_analysis.inference import build_inference_model, device
+
+    sentences, labels = load_dataset(args.dataset)
+    model = build_inference_model("eager", exit_heads_path=None)
+
+    features = extract_cls_features(model, sentences, args.layers, args.batch_size)
+    label_tensor = torch.tensor(labels, dtype=torch.long, device=device)
+
+    # 학습에 쓰지 않은 일부 문장으로 정확도 확인
+    order = list(range(len(labels)))
+    random.Random(args.seed).shuffle(order)
+    validation_size = int(len(order) * args.validation_split)
+    validation_index = torch.tensor(order[:validation_size], dtype=torch.long, device=device)
+    train_index = torch.tensor(order[validation_size:], dtype=torch.long, device=device)
+
+    torch.manual_seed(args.seed)
+    results = []
+    for layer in args.layers:
+        head = model.add_exit_head(layer)
+        train_head(head, features[layer][train_index], label_tensor[train_index],
+                   args.epochs, args.batch_size, args.learning_rate)
+        results.append({
+            "layer": layer,
+            "train_accuracy": accuracy(head, features[layer][train_index], label_tensor[train_index]),
+            "validation_accuracy": accuracy(head, features[layer][validation_index], label_tensor[validation_index]),
+        })
+
+    torch.save(model.exit_heads.state_dict(), args.output)
+    print(json.dumps({"output": args.output, "sentences": len(labels), "heads": results}, indent=2))
+
+
+def evaluate(args):
+    import numpy as np
+
+    from service.emotion_analysis.inference import build_inference_model, early_exit_layers, predict_emotion_logits
+
+    sentences, labels = load_dataset(args.dataset)
+    model = build_inference_model(args.engine, exit_heads_path=args.exit_heads)
+    layers = args.layers or early_exit_layers(model)
+
+    def run(exit_layer):
+        predicted = []
+        latencies = []
+        started_at = time.perf_counter()
+        for start in range(0, len(sentences), args.batch_size):
+            batch_started_at = time.perf_counter()
+            logits = predict_emotion_logits(sentences[start:start + args.batch_size], model=model, exit_layer=exit_layer)
+            latencies.append(time.perf_counter() - batch_started_at)
+            predicted.extend(int(np.argmax(row)) for row in logits)
+        elapsed = time.perf_counter() - started_at
+        latencies.sort()
+        return predicted, {
+            "batch_p50_ms": latencies[len(latencies) // 2] * 1000,
+            "sentences_per_second": len(sentences) / elapsed,
+        }
+
+    full_predicted, full_latency = run(None)
+    results = [{
+        "tier": "full",
+        "layer": None,
+        "accuracy": sum(p == label for p, label in zip(full_predicted, labels)) / len(labels),
+        "agreement_with_full": 1.0,
+        **full_latency,
+    }]
+    for layer in layers:
+        predicted, latency = run(layer)
+        results.append({
+            "tier": "early_exit",
+            "layer": layer,
+            "accuracy": sum(p == label for p, label in zip(predicted, labels)) / len(labels),
+            "agreement_with_full": sum(p == f for p, f in zip(predicted, full_predicted)) / len(labels),
+            **latency,
+        })
+
+    print(json.dumps({"engine": args.engine, "sentences": len(labels), "tiers": results}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = subparsers.add_parser("calibrate")
+    calibrate_parser.add_argument("--dataset", required=True)
+    calibrate_parser.add_argument("--layers", type=int, nargs="+", default=[2, 4, 6])
+    calibrate_parser.add_argument("--output", default=INFERENCE_EXIT_HEADS_PATH)
+    calibrate_parser.add_argument("--epochs", type=int, default=20)
+    calibrate_parser.add_argument("--batch-size", type=int, default=64)
+    calibrate_parser.add_argument("--learning-rate", type=float, default=1e-3)
+    calibrate_parser.add_argument("--validation-split", type=float, default=0.2)
+    calibrate_parser.add_argument("--seed", type=int, default=0)
+
+    evaluate_parser = subparsers.add_parser("evaluate")
+    evaluate_parser.add_argument("--dataset", required=True)
+    evaluate_parser.add_argument("--exit-heads", default=INFERENCE_EXIT_HEADS_PATH)
+    evaluate_parser.add_argument("--layers", type=int, nargs="*", help="비우면 exit head가 있는 모든 layer")
+    evaluate_parser.add_argument("--engine", default="eager", choices=["eager", "quantized"])
+    evaluate_parser.add_argument("--batch-size", type=int, default=32)
+
+    args = parser.parse_args()
+    if args.command == "calibrate":
+        calibrate(args)
+    else:
+        evaluate(args)
+
+
+if __name__ == "__main__":
+    main()
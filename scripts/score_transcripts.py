@@ -0,0 +1,360 @@
+# 보관된 채팅 기록(JSONL, 한 줄에 Message 하나)의 유저 메시지에 감정 라벨을 붙입니다.
+# - 입력을 한 줄씩 읽어 batch_size개씩 묶고, process pool의 worker에서 토큰화와 추론을 수행 (모델은 worker마다 한 번만 로드)
+# - 처리 중인 batch 수를 제한하므로 입력 파일 크기와 관계없이 메모리 사용량이 일정
+# - 결과는 입력 순서대로 JSONL 또는 NumPy 배열(.npy)로 기록하고, batch마다 checkpoint를 남겨 중단된 지점부터 이어서 실행
+#
+# 실행: python -m scripts.score_transcripts --input chat.jsonl --output scored.jsonl
+#       python -m scripts.score_transcripts --input chat.jsonl --output scored --format npy --logits
+#       중단된 뒤에는 같은 명령에 --resume을 붙여 실행
+#
+# JSONL 출력은 점수를 매긴 메시지마다 {"line": 입력 줄 번호(0부터), ...Message 필드, "emotion": 라벨, "emotion_index": 번호}
+# 이며, --logits를 주면 "emotion_logits"가 추가됩니다.
+# NumPy 출력은 {output}.lines.npy(입력 줄 번호), {output}.labels.npy(라벨 번호), {output}.logits.npy(--logits) 입니다.
+# 시스템 메시지, 입장/퇴장 이벤트, 빈 메시지는 건너뜁니다.
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+import orjson
+
+from service.chat.message import Message, MessageType
+from service.emotion_analysis.emotion_labels import NUM_EMOTION_CLASSES, label_from_logits, label_index_from_logits
+
+
+# process worker에서 실행되는 함수는 pickle 가능해야 하므로 모듈 레벨에 둡니다.
+def _init_worker(num_threads: int):
+    import torch
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    # import 하면서 worker마다 모델을 한 번 로드
+    import service.emotion_analysis.inference  # noqa: F401
+
+
+def _score_batch(sentences: List[str]) -> List[List[float]]:
+    from service.emotion_analysis.inference import predict_emotion_logits
+    return predict_emotion_logits(sentences)
+
+
+class ScoreBatch:
+    __slots__ = ("line_numbers", "messages", "end_offset", "end_line", "skipped_count", "invalid_count")
+
+    def __init__(self, offset: int, line_number: int):
+        self.line_numbers: List[int] = []
+        self.messages: List[Message] = []
+        # 이 batch까지 읽은 입력 위치. 결과를 기록한 뒤 checkpoint로 저장
+        self.end_offset = offset
+        self.end_line = line_number
+        self.skipped_count = 0
+        self.invalid_count = 0
+
+
+def is_scorable(message: Message) -> bool:
+    return (
+            message.event_type is None
+            and message.message_type != MessageType.SYSTEM_MESSAGE
+            and len(message.message.strip()) > 0
+    )
+
+
+def read_batches(path: str, offset: int, line_number: int, batch_size: int) -> Iterator[ScoreBatch]:
+    with open(path, "rb") as file:
+        file.seek(offset)
+        batch = ScoreBatch(offset, line_number)
+        for raw in file:
+            try:
+                message = Message.model_validate_json(raw) if raw.strip() else None
+            except ValueError:
+                batch.invalid_count += 1
+                message = None
+            else:
+                if message is not None and is_scorable(message):
+                    batch.line_numbers.append(line_number)
+                    batch.messages.append(message)
+                else:
+                    batch.skipped_count += 1
+
+            offset += len(raw)
+            line_number += 1
+            batch.end_offset = offset
+            batch.end_line = line_number
+            if len(batch.messages) >= batch_size:
+                yield batch
+                batch = ScoreBatch(offset, line_number)
+
+        # 마지막 batch는 건너뛴 줄만 있어도 checkpoint를 옮기기 위해 반환
+        if batch.messages or batch.skipped_count or batch.invalid_count:
+            yield batch
+
+
+class JsonlScoreWriter:
+    def __init__(self, path: str, include_logits: bool, resume_position: int):
+        self._include_logits = include_logits
+        self._file = open(path, "r+b" if resume_position > 0 else "wb")
+        # 마지막 checkpoint 이후에 기록된 부분은 다시 기록
+        self._file.truncate(resume_position)
+        self._file.seek(resume_position)
+
+    def write(self, batch: ScoreBatch, logits: List[List[float]]):
+        lines = []
+        for line_number, message, row in zip(batch.line_numbers, batch.messages, logits):
+            record = {
+                "line": line_number,
+                **message.model_dump(),
+                "emotion": label_from_logits(row),
+                "emotion_index": label_index_from_logits(row),
+            }
+            if self._include_logits:
+                record["emotion_logits"] = row
+            lines.append(orjson.dumps(record, option=orjson.OPT_UTC_Z))
+        if lines:
+            self._file.write(b"\n".join(lines) + b"\n")
+
+    # 기록한 내용을 디스크에 내리고 checkpoint에 저장할 위치를 반환
+    def sync(self) -> int:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def finish(self):
+        self._file.close()
+
+    def cleanup(self):
+        # 중간 파일이 없음
+        pass
+
+
+# 실행 중에는 고정 크기 raw 파일에 이어서 기록하고, 끝나면 .npy로 변환
+# raw 파일은 완료가 checkpoint에 기록된 뒤 cleanup()에서 삭제하므로, 변환 중에 종료되어도 다시 변환할 수 있음
+class NpyScoreWriter:
+    def __init__(self, prefix: str, include_logits: bool, resume_count: int):
+        import numpy as np
+
+        self._np = np
+        self._prefix = prefix
+        self._row_count = resume_count
+        self._arrays = {"lines": (np.int64, ()), "labels": (np.int8, ())}
+        if include_logits:
+            self._arrays["logits"] = (np.float32, (NUM_EMOTION_CLASSES,))
+
+        self._files = {}
+        for name, (dtype, shape) in self._arrays.items():
+            path = self._raw_path(name)
+            file = open(path, "r+b" if resume_count > 0 and os.path.exists(path) else "wb")
+            position = resume_count * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            file.truncate(position)
+            file.seek(position)
+            self._files[name] = file
+
+    def _raw_path(self, name: str) -> str:
+        return raw_file_path(self._prefix, name)
+
+    def write(self, batch: ScoreBatch, logits: List[List[float]]):
+        np = self._np
+        if not batch.line_numbers:
+            return
+        logits_array = np.asarray(logits, dtype=np.float32)
+        values = {
+            "lines": np.asarray(batch.line_numbers, dtype=np.int64),
+            "labels": logits_array.argmax(axis=1).astype(np.int8),
+            "logits": logits_array,
+        }
+        for name, file in self._files.items():
+            file.write(values[name].tobytes())
+        self._row_count += len(batch.line_numbers)
+
+    def sync(self) -> int:
+        for file in self._files.values():
+            file.flush()
+            os.fsync(file.fileno())
+        return 0
+
+    def finish(self, chunk_rows: int = 1 << 20):
+        np = self._np
+        scored_count = self._row_count
+        for name, file in self._files.items():
+            file.close()
+            dtype, shape = self._arrays[name]
+            raw_path = self._raw_path(name)
+            output_path = f"{self._prefix}.{name}.npy"
+            if scored_count == 0:
+                # 빈 파일은 mmap 할 수 없음
+                np.save(output_path, np.zeros((0, *shape), dtype=dtype))
+            else:
+                output = np.lib.format.open_memmap(output_path, mode="w+", dtype=dtype, shape=(scored_count, *shape))
+                raw = np.memmap(raw_path, dtype=dtype, mode="r", shape=(scored_count, *shape))
+                # 배열 전체를 메모리에 올리지 않도록 나눠서 복사
+                for start in range(0, scored_count, chunk_rows):
+                    output[start:start + chunk_rows] = raw[start:start + chunk_rows]
+                output.flush()
+                del raw, output
+
+    def cleanup(self):
+        remove_raw_files(self._prefix)
+
+
+def raw_file_path(prefix: str, name: str) -> str:
+    return f"{prefix}.{name}.bin"
+
+
+# 실행 중에 이어서 기록하는 파일들
+def output_paths(output: str, output_format: str, include_logits: bool) -> List[str]:
+    if output_format == "jsonl":
+        return [output]
+    names = ["lines", "labels"] + (["logits"] if include_logits else [])
+    return [raw_file_path(output, name) for name in names]
+
+
+def remove_raw_files(prefix: str):
+    for name in ("lines", "labels", "logits"):
+        path = raw_file_path(prefix, name)
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.input_path: Optional[str] = None
+        # 이어서 실행할 때 출력 형식이 바뀌면 이전 결과와 섞이므로 함께 저장
+        self.format: Optional[str] = None
+        self.include_logits: Optional[bool] = None
+        self.input_offset = 0
+        self.line_number = 0
+        self.output_position = 0
+        self.scored_count = 0
+        self.skipped_count = 0
+        self.invalid_count = 0
+        self.completed = False
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as file:
+            self.__dict__.update(orjson.loads(file.read()))
+        return True
+
+    # 중간에 종료되어도 checkpoint 파일이 깨지지 않도록 임시 파일에 쓴 뒤 교체
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(orjson.dumps({key: value for key, value in self.__dict__.items() if key != "path"}))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+
+def collect(batch: ScoreBatch, future: Optional[Future]) -> Tuple[ScoreBatch, List[List[float]]]:
+    return batch, future.result() if future is not None else []
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="한 줄에 Message JSON 하나가 들어있는 파일")
+    parser.add_argument("--output", required=True, help="jsonl이면 출력 파일 경로, npy면 출력 파일 이름의 prefix")
+    parser.add_argument("--format", choices=["jsonl", "npy"], default="jsonl")
+    parser.add_argument("--logits", action="store_true", help="라벨과 함께 logits도 기록")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=2, help="모델을 각자 로드하는 worker 프로세스 수")
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="0이면 CPU 수 / worker 수")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="동시에 처리할 batch 수. 0이면 worker 수 * 2")
+    parser.add_argument("--checkpoint", help="기본값: {output}.checkpoint.json")
+    parser.add_argument("--resume", action="store_true", help="checkpoint에 기록된 위치부터 이어서 실행")
+    parser.add_argument("--progress-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.output}.checkpoint.json")
+    if args.resume and checkpoint.load():
+        if checkpoint.input_path != os.path.abspath(args.input):
+            sys.exit(f"checkpoint was created for {checkpoint.input_path}")
+        if checkpoint.format != args.format or checkpoint.include_logits != args.logits:
+            sys.exit(f"checkpoint was created with --format {checkpoint.format}"
+                     f"{' --logits' if checkpoint.include_logits else ''}; resume with the same options")
+        if checkpoint.completed:
+            # 완료를 기록한 직후 종료되어 남은 중간 파일 정리
+            if args.format == "npy":
+                remove_raw_files(args.output)
+            print(f"already completed: {checkpoint.scored_count} messages scored", file=sys.stderr)
+            return
+        # checkpoint 이후의 출력 파일이 없으면 이어서 기록할 수 없음 (npy는 빈 자리가 0으로 채워짐)
+        missing_paths = [path for path in output_paths(args.output, args.format, args.logits) if not os.path.exists(path)]
+        if checkpoint.scored_count > 0 and missing_paths:
+            sys.exit(f"cannot resume: {', '.join(missing_paths)} not found. Run again without --resume")
+    checkpoint.input_path = os.path.abspath(args.input)
+    checkpoint.format = args.format
+    checkpoint.include_logits = args.logits
+    resumed_from_line = checkpoint.line_number
+
+    if args.format == "jsonl":
+        writer = JsonlScoreWriter(args.output, args.logits, checkpoint.output_position)
+    else:
+        writer = NpyScoreWriter(args.output, args.logits, checkpoint.scored_count)
+
+    workers = max(1, args.workers)
+    threads_per_worker = args.threads_per_worker or max(1, cpu_count // workers)
+    max_in_flight = args.max_in_flight or workers * 2
+
+    started_at = time.perf_counter()
+    scored_at_start = checkpoint.scored_count
+    last_progress_at = started_at
+
+    def write(batch: ScoreBatch, logits: List[List[float]]):
+        nonlocal last_progress_at
+        writer.write(batch, logits)
+        checkpoint.output_position = writer.sync()
+        checkpoint.input_offset = batch.end_offset
+        checkpoint.line_number = batch.end_line
+        checkpoint.scored_count += len(batch.messages)
+        checkpoint.skipped_count += batch.skipped_count
+        checkpoint.invalid_count += batch.invalid_count
+        checkpoint.save()
+
+        now = time.perf_counter()
+        if now - last_progress_at >= args.progress_seconds:
+            last_progress_at = now
+            rate = (checkpoint.scored_count - scored_at_start) / (now - started_at)
+            print(f"line {checkpoint.line_number}: {checkpoint.scored_count} scored, {rate:.1f} messages/sec",
+                  file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(threads_per_worker,)) as executor:
+        # 결과는 입력 순서대로 기록하고, 처리 중인 batch가 max_in_flight개를 넘지 않도록 앞의 batch부터 기다림
+        in_flight: Deque[Tuple[ScoreBatch, Optional[Future]]] = deque()
+        for batch in read_batches(args.input, checkpoint.input_offset, checkpoint.line_number, args.batch_size):
+            sentences = [message.message for message in batch.messages]
+            in_flight.append((batch, executor.submit(_score_batch, sentences) if sentences else None))
+            if len(in_flight) >= max_in_flight:
+                write(*collect(*in_flight.popleft()))
+        while in_flight:
+            write(*collect(*in_flight.popleft()))
+
+    writer.finish()
+    checkpoint.completed = True
+    checkpoint.save()
+    # 완료를 기록하기 전에 중간 파일을 지우면, 그 사이에 종료됐을 때 이어서 실행할 수 없음
+    writer.cleanup()
+
+    elapsed = time.perf_counter() - started_at
+    scored_this_run = checkpoint.scored_count - scored_at_start
+    print(json.dumps({
+        "input": args.input,
+        "output": args.output,
+        "format": args.format,
+        "resumed_from_line": resumed_from_line,
+        "lines": checkpoint.line_number,
+        "scored_count": checkpoint.scored_count,
+        "skipped_count": checkpoint.skipped_count,
+        "invalid_count": checkpoint.invalid_count,
+        "workers": workers,
+        "elapsed_seconds": elapsed,
+        "messages_per_second": scored_this_run / elapsed if elapsed > 0 else None,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
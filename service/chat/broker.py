@@ -0,0 +1,256 @@
+import asyncio
+import fcntl
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import orjson
+
+# broker를 통해 주고받는 이벤트는 "type"과 보낸 worker의 "origin"을 가진 dict 입니다.
+# - room_created / room_deleted: 채팅방 생성, 삭제
+# - membership: 보낸 worker에 연결된 채팅방 인원수
+# - message: 채팅방에 broadcast 된 메시지 (직렬화된 frame)
+# - sync_request: 새로 연결된 worker가 기존 채팅방 정보를 요청
+# - worker_left: 연결이 끊어진 worker (hub가 보냄)
+BrokerEventHandler = Callable[[dict], Awaitable[None]]
+
+# 한 줄(이벤트 하나)의 최대 크기
+MAX_EVENT_SIZE = 2 ** 20
+# hub가 느린 worker의 전송 버퍼가 비워지기를 기다리는 최대 시간. 넘으면 연결을 끊고, worker는 다시 연결해서 동기화합니다.
+HUB_DRAIN_TIMEOUT_SECONDS = 5.0
+
+
+class Broker(ABC):
+    def __init__(self):
+        self.worker_id: str = uuid.uuid4().hex
+        self._handler: Optional[BrokerEventHandler] = None
+
+    @abstractmethod
+    async def start(self, handler: BrokerEventHandler):
+        self._handler = handler
+
+    @abstractmethod
+    async def stop(self):
+        pass
+
+    # 이벤트를 다른 worker에 보내도록 대기열에 넣기만 하고 바로 반환합니다.
+    @abstractmethod
+    def publish(self, event: dict):
+        pass
+
+    async def _dispatch(self, event: dict):
+        # 자신이 보낸 이벤트는 이미 로컬에서 처리했으므로 무시
+        if self._handler is None or event.get("origin") == self.worker_id:
+            return
+        try:
+            await self._handler(event)
+        except Exception as e:
+            print(e)
+
+
+# 같은 프로세스 안의 broker들을 연결합니다. broker가 하나뿐이면 publish는 아무 일도 하지 않습니다.
+class InProcessHub:
+    def __init__(self):
+        self.brokers: List["InProcessBroker"] = []
+
+
+class InProcessBroker(Broker):
+    def __init__(self, hub: Optional[InProcessHub] = None):
+        super().__init__()
+        self._hub = hub if hub is not None else InProcessHub()
+        self._hub.brokers.append(self)
+        self._inbox: asyncio.Queue[dict] = asyncio.Queue()
+        self._consumer_task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: BrokerEventHandler):
+        await super().start(handler)
+        self._consumer_task = asyncio.create_task(self._consume())
+        self.publish({"type": "sync_request"})
+
+    async def stop(self):
+        if self._consumer_task is not None:
+            self._consumer_task.cancel()
+            self._consumer_task = None
+        if self in self._hub.brokers:
+            self._hub.brokers.remove(self)
+
+    def publish(self, event: dict):
+        event = {**event, "origin": self.worker_id}
+        for broker in self._hub.brokers:
+            if broker is not self:
+                broker._inbox.put_nowait(event)
+
+    async def _consume(self):
+        while True:
+            await self._dispatch(await self._inbox.get())
+
+
+# 같은 노드의 worker들이 연결하는 Unix socket hub
+# 한 worker의 이벤트를 나머지 모든 worker에게 그대로 전달합니다.
+class UnixSocketHub:
+    def __init__(self, socket_path: str, drain_timeout_seconds: float = HUB_DRAIN_TIMEOUT_SECONDS):
+        self._socket_path = socket_path
+        self._drain_timeout_seconds = drain_timeout_seconds
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._worker_id_by_writer: Dict[asyncio.StreamWriter, Optional[str]] = {}
+
+    # 다른 worker가 이미 hub를 실행 중이면 False를 반환합니다.
+    async def start(self) -> bool:
+        # 여러 worker가 동시에 hub를 띄우지 않도록 lock 파일로 한 worker만 선택
+        lock_file = open(f"{self._socket_path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+
+        # lock을 잡았다면 남아있는 socket 파일은 이전 hub가 비정상 종료하면서 남긴 것
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+        self._lock_file = lock_file
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self._socket_path,
+                                                       limit=MAX_EVENT_SIZE)
+        return True
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._worker_id_by_writer):
+            writer.close()
+        if self._lock_file is not None:
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._worker_id_by_writer[writer] = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                if self._worker_id_by_writer[writer] is None:
+                    self._worker_id_by_writer[writer] = orjson.loads(line).get("origin")
+
+                await self._forward(line, sender=writer)
+        except (ConnectionError, ValueError) as e:
+            print(e)
+        finally:
+            worker_id = self._worker_id_by_writer.pop(writer, None)
+            writer.close()
+            if worker_id is not None:
+                await self._forward(orjson.dumps({"type": "worker_left", "origin": worker_id}) + b"\n", sender=None)
+
+    # 받는 worker의 전송 버퍼가 가득 차면 비워질 때까지 보낸 worker의 이벤트를 더 읽지 않음 (backpressure)
+    async def _forward(self, line: bytes, sender: Optional[asyncio.StreamWriter]):
+        writers = [
+            writer for writer in self._worker_id_by_writer
+            if writer is not sender and not writer.is_closing()
+        ]
+        for writer in writers:
+            writer.write(line)
+        await asyncio.gather(*[self._drain(writer) for writer in writers])
+
+    async def _drain(self, writer: asyncio.StreamWriter):
+        try:
+            await asyncio.wait_for(writer.drain(), timeout=self._drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            # 이벤트를 처리하지 못하는 worker 때문에 hub의 메모리가 계속 늘어나지 않도록 연결을 끊음
+            # close()는 남은 버퍼를 보낸 뒤에 닫으므로 바로 끊음
+            print(f"Broker hub dropped a worker that did not read events for {self._drain_timeout_seconds}s")
+            writer.transport.abort()
+        except ConnectionError as e:
+            print(e)
+            writer.close()
+
+
+# Unix socket hub를 통해 같은 노드의 다른 worker들과 이벤트를 주고받습니다.
+# hub가 없으면 처음 연결하는 worker가 자신의 프로세스에서 hub를 띄우고,
+# hub를 띄운 worker가 종료되면 남은 worker 중 하나가 다시 hub를 띄웁니다.
+class UnixSocketBroker(Broker):
+    def __init__(self, socket_path: str, reconnect_delay_seconds: float = 1.0):
+        super().__init__()
+        self._socket_path = socket_path
+        self._reconnect_delay_seconds = reconnect_delay_seconds
+        self._outbox: asyncio.Queue[bytes] = asyncio.Queue()
+        self._hub: Optional[UnixSocketHub] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: BrokerEventHandler):
+        await super().start(handler)
+        reader, writer = await self._connect()
+        self._task = asyncio.create_task(self._run(reader, writer))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._hub is not None:
+            await self._hub.stop()
+            self._hub = None
+
+    def publish(self, event: dict):
+        self._outbox.put_nowait(self._encode(event))
+
+    def _encode(self, event: dict) -> bytes:
+        # orjson은 문자열 안의 줄바꿈을 escape 하므로 줄 단위로 이벤트를 구분할 수 있음
+        return orjson.dumps({**event, "origin": self.worker_id}) + b"\n"
+
+    async def _connect(self):
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self._socket_path, limit=MAX_EVENT_SIZE)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if self._hub is None:
+                    hub = UnixSocketHub(self._socket_path)
+                    if await hub.start():
+                        self._hub = hub
+                        continue
+                # 다른 worker가 hub를 띄우는 중
+                await asyncio.sleep(self._reconnect_delay_seconds)
+
+    async def _run(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while True:
+            try:
+                await self._session(reader, writer)
+            except (ConnectionError, ValueError) as e:
+                print(e)
+
+            await asyncio.sleep(self._reconnect_delay_seconds)
+            reader, writer = await self._connect()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # 처음 보내는 이벤트로 hub가 worker를 식별하고, 다른 worker들에게 기존 채팅방 정보를 요청
+        writer.write(self._encode({"type": "sync_request"}))
+        # 재연결이라면 다른 worker들이 이 worker의 정보를 지웠으므로 현재 채팅방 정보를 다시 알림
+        await self._dispatch({"type": "sync_request"})
+        writer_task = asyncio.create_task(self._write_loop(writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                await self._dispatch(orjson.loads(line))
+        finally:
+            writer_task.cancel()
+            writer.close()
+
+    async def _write_loop(self, writer: asyncio.StreamWriter):
+        while True:
+            writer.write(await self._outbox.get())
+            await writer.drain()
+
+
+def create_broker(backend: str, socket_path: str) -> Broker:
+    if backend == "in_process":
+        return InProcessBroker()
+    if backend == "unix_socket":
+        return UnixSocketBroker(socket_path)
+    raise ValueError(f"Unknown broker backend: {backend}")
@@ -1,8 +1,12 @@
 import uuid
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
+from service.chat.broker import Broker, InProcessBroker
 from service.chat.connection_manager import ConnectionManager
-from service.chat.message import Message, MessageEventType, MessageType
+from service.chat.emotion_state import EmotionState
+from service.chat.message_history import RoomMessageHistory
+from service.chat.message_log import MessageLog
+from service.chat.message import Message, MessageEventType, MessageType, encode_message
 from service.chat.user_connection import UserConnection
 
 
@@ -16,30 +20,105 @@ class ChatRoom:
         self.room_id = room_id
         self.room_name = f"room {uuid.UUID(room_id).int % 10000}"
         self.manager = ConnectionManager()
+        # 유저 메시지 히스토리. 유저별 최근 메시지와 채팅방 전체의 최근 메시지를 보관
+        self.history = RoomMessageHistory()
+        # 메시지가 들어올 때마다 갱신되는 유저별, 채팅방 전체 감정 상태
+        self.user_emotion_states: Dict[str, EmotionState] = {}
+        self.room_emotion_state = EmotionState()
+        # 다른 worker에 연결된 유저 수 (worker id -> 인원수)
+        self.remote_connection_count_by_worker: Dict[str, int] = {}
+        # 유저 메시지가 broadcast 될 때마다 증가. 마지막 감정 분석 이후 새 메시지가 있는지 확인하는 데 사용
+        self.message_version = 0
+        self.analyzed_message_version = 0
+        # 채팅방별 감정 분석 주기. None이면 기본 주기를 사용
+        self.analysis_interval_seconds: Optional[float] = None
 
     async def connect(self, connection: UserConnection):
         await self.manager.connect(connection)
 
     async def disconnect(self, connection: UserConnection):
         self.manager.disconnect(connection)
+        self.user_emotion_states.pop(connection.user_id, None)
+        self.history.remove_user(connection.user_id)
 
-    async def broadcast(self, message: Message):
-        await self.manager.broadcast(message)
+    def update_emotion_state(self, user_id: str, logits: List[float], decay: float):
+        self.room_emotion_state.update(logits, decay)
 
+        user_emotion_state = self.user_emotion_states.get(user_id)
+        if user_emotion_state is None:
+            # 분류가 끝나기 전에 나간 유저의 상태는 만들지 않음
+            if self.get_connection(user_id) is None:
+                return
+            user_emotion_state = EmotionState()
+            self.user_emotion_states[user_id] = user_emotion_state
+
+        user_emotion_state.update(logits, decay)
+
+    def get_user_emotion_state(self, user_id: str) -> Optional[EmotionState]:
+        return self.user_emotion_states.get(user_id)
+
+    async def broadcast(self, message: Message, frame: Optional[str] = None):
+        if message.message_type == MessageType.USER_MESSAGE:
+            self.message_version += 1
+            if message.user_id is not None:
+                # 유저별 최근 메시지는 이 worker에 연결된 유저의 감정 분석에만 사용
+                self.history.append(message, track_user=self.get_connection(message.user_id) is not None)
+        await self.manager.broadcast(message, frame)
+
+    def has_new_messages(self) -> bool:
+        return self.message_version != self.analyzed_message_version
+
+    # 모든 worker에 연결된 유저 수
     def count_connections(self):
+        return self.manager.count_connections() + sum(self.remote_connection_count_by_worker.values())
+
+    # 현재 worker에 연결된 유저 수
+    def count_local_connections(self):
         return self.manager.count_connections()
 
-    def list_connections(self):
+    def list_connections(self) -> List[UserConnection]:
         return self.manager.get_connections()
 
+    def get_connection(self, user_id: str) -> Optional[UserConnection]:
+        return self.manager.get_connection(user_id)
+
+    def get_fanout_stats(self) -> dict:
+        return self.manager.get_fanout_stats()
+
+    def get_inbound_stats(self) -> dict:
+        return self.manager.get_inbound_stats()
+
+    def get_history_stats(self) -> dict:
+        return self.history.get_stats()
+
 
 class ChatRoomManager:
-    def __init__(self):
+    def __init__(self, broker: Optional[Broker] = None):
         self.chat_room_by_id: Dict[str, ChatRoom] = {}
+        # 채팅방 생성/삭제, 입장 인원, 메시지를 다른 worker와 주고받는 broker
+        self.broker: Broker = broker if broker is not None else InProcessBroker()
+        # 채팅방이 생성("created"), 삭제("deleted")되거나 인원수가 바뀔 때("count_changed") 호출되는 콜백
+        self.room_listeners: List[Callable[[str, str], None]] = []
+        # 메시지를 파일에 기록하는 로그 (MESSAGE_LOG_ENABLED 일 때만)
+        self.message_log: Optional[MessageLog] = None
+
+    async def start(self):
+        await self.broker.start(self._handle_broker_event)
+
+    async def stop(self):
+        await self.broker.stop()
+
+    def attach_message_log(self, message_log: MessageLog):
+        self.message_log = message_log
+        self.room_listeners.append(self._forget_deleted_room)
+
+    def _forget_deleted_room(self, event: str, room_id: str):
+        if event == "deleted" and self.message_log is not None:
+            self.message_log.forget_room(room_id)
 
     def create_chat_room(self, room_id: str):
-        chat_room = ChatRoom(room_id)
-        self.chat_room_by_id[room_id] = chat_room
+        chat_room = self._add_chat_room(room_id)
+        self.broker.publish({"type": "room_created", "room_id": room_id})
         return chat_room
 
     def get_chat_room(self, room_id: str) -> ChatRoom | None:
@@ -49,12 +128,43 @@ class ChatRoomManager:
         return list(self.chat_room_by_id.values())
 
     def delete_chat_room(self, room_id: str):
+        self._remove_chat_room(room_id)
+        self.broker.publish({"type": "room_deleted", "room_id": room_id})
+
+    def _add_chat_room(self, room_id: str) -> ChatRoom:
+        chat_room = ChatRoom(room_id)
+        self.chat_room_by_id[room_id] = chat_room
+        self._notify_room_listeners("created", room_id)
+        return chat_room
+
+    def _remove_chat_room(self, room_id: str):
         del self.chat_room_by_id[room_id]
+        self._notify_room_listeners("deleted", room_id)
+
+    def _notify_room_listeners(self, event: str, room_id: str):
+        for listener in self.room_listeners:
+            listener(event, room_id)
+
+    # 여러 worker가 같은 채팅방을 가지고 있을 때 주기적인 감정 분석은 한 worker에서만 수행합니다.
+    # 현재 worker에 유저가 있고, 유저가 있는 worker 중 id가 가장 작은 worker가 담당합니다.
+    def is_analysis_owner(self, chat_room: ChatRoom) -> bool:
+        if chat_room.count_local_connections() == 0:
+            return False
+        return all(
+            self.broker.worker_id < worker_id
+            for worker_id, count in chat_room.remote_connection_count_by_worker.items() if count > 0
+        )
 
     async def connect(self, room_id: str, connection: UserConnection):
         chat_room = self.get_chat_room(room_id)
         if chat_room:
             await chat_room.connect(connection)
+            self._publish_membership(chat_room)
+            self._notify_room_listeners("count_changed", room_id)
+            # 입장 전의 최근 메시지를 보여줌
+            if self.message_log is not None:
+                for frame in self.message_log.read_last(room_id):
+                    connection.enqueue_frame(frame)
             await self.broadcast_system_message(
                 room_id=room_id,
                 message=f'{connection.username}가 방에 입장했습니다.',
@@ -67,6 +177,8 @@ class ChatRoomManager:
         chat_room = self.get_chat_room(room_id)
         if chat_room:
             await chat_room.disconnect(connection)
+            self._publish_membership(chat_room)
+            self._notify_room_listeners("count_changed", room_id)
             await self.broadcast_system_message(
                 room_id=room_id,
                 message=f"{connection.username}가 방에서 나갔습니다.",
@@ -81,23 +193,28 @@ class ChatRoomManager:
     async def broadcast(self, room_id: str, message: Message):
         chat_room = self.get_chat_room(room_id)
         if chat_room:
-            await chat_room.broadcast(message)
+            # 현재 worker의 유저에게 바로 보내고, 다른 worker에는 같은 frame을 전달
+            frame = encode_message(message)
+            await self._deliver(chat_room, message, frame)
+            self.broker.publish({"type": "message", "room_id": room_id, "frame": frame})
         else:
             raise NotFoundChatRoomException(room_id)
 
+    async def _deliver(self, chat_room: ChatRoom, message: Message, frame: str):
+        await chat_room.broadcast(message, frame)
+        if self.message_log is not None and message.message_type == MessageType.USER_MESSAGE:
+            self.message_log.append(chat_room.room_id, frame)
+
     async def broadcast_system_message(self, room_id: str, message: str, event_type: Optional[MessageEventType] = None):
-        chat_room = self.get_chat_room(room_id)
-        if chat_room:
-            await chat_room.broadcast(
-                Message(
-                    username="System",
-                    message=message,
-                    message_type=MessageType.SYSTEM_MESSAGE,
-                    event_type=event_type,
-                )
-            )
-        else:
-            raise NotFoundChatRoomException(room_id)
+        await self.broadcast(
+            room_id=room_id,
+            message=Message(
+                username="System",
+                message=message,
+                message_type=MessageType.SYSTEM_MESSAGE,
+                event_type=event_type,
+            ),
+        )
 
     def count_user_in_room(self, room_id: str):
         chat_room = self.get_chat_room(room_id)
@@ -112,3 +229,52 @@ class ChatRoomManager:
             return chat_room.manager.get_connections()
         else:
             raise NotFoundChatRoomException(room_id)
+
+    def _publish_membership(self, chat_room: ChatRoom):
+        self.broker.publish({
+            "type": "membership",
+            "room_id": chat_room.room_id,
+            "count": chat_room.count_local_connections(),
+        })
+
+    # 다른 worker에서 온 이벤트를 현재 worker의 채팅방 상태에 반영합니다.
+    async def _handle_broker_event(self, event: dict):
+        event_type = event["type"]
+        room_id = event.get("room_id")
+        chat_room = self.get_chat_room(room_id) if room_id is not None else None
+
+        if event_type == "room_created":
+            if chat_room is None:
+                self._add_chat_room(room_id)
+
+        elif event_type == "room_deleted":
+            if chat_room is not None and chat_room.count_local_connections() == 0:
+                self._remove_chat_room(room_id)
+
+        elif event_type == "membership":
+            if chat_room is None:
+                chat_room = self._add_chat_room(room_id)
+            if event["count"] > 0:
+                chat_room.remote_connection_count_by_worker[event["origin"]] = event["count"]
+            else:
+                chat_room.remote_connection_count_by_worker.pop(event["origin"], None)
+            self._notify_room_listeners("count_changed", room_id)
+
+        elif event_type == "message":
+            # 나중에 이 worker로 입장하는 유저에게도 최근 메시지를 보여줄 수 있도록,
+            # 현재 worker에 유저가 없어도 채팅방 히스토리와 메시지 로그에는 기록
+            if chat_room is not None:
+                frame = event["frame"]
+                await self._deliver(chat_room, Message.model_validate_json(frame), frame)
+
+        elif event_type == "worker_left":
+            for chat_room in self.list_chat_rooms():
+                if chat_room.remote_connection_count_by_worker.pop(event["origin"], None) is not None:
+                    self._notify_room_listeners("count_changed", chat_room.room_id)
+
+        elif event_type == "sync_request":
+            # 새로 연결된 worker에게 현재 worker의 채팅방과 인원수를 알려줌
+            for chat_room in self.list_chat_rooms():
+                self.broker.publish({"type": "room_created", "room_id": chat_room.room_id})
+                if chat_room.count_local_connections() > 0:
+                    self._publish_membership(chat_room)
@@ -1,24 +1,104 @@
-from service.chat.message import Message
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from config.config import FANOUT_LATENCY_SAMPLE_SIZE
+from core.metrics import broadcast_seconds
+from service.chat.message import Message, encode_message
 from service.chat.user_connection import UserConnection
+from service.chat.wire_protocol import OutboundMessage
+
+
+def _percentile(sorted_values: List[float], ratio: float) -> float:
+    if len(sorted_values) == 0:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * ratio))
+    return sorted_values[index]
+
+
+class FanoutStats:
+    def __init__(self, sample_size: int = FANOUT_LATENCY_SAMPLE_SIZE):
+        self.broadcast_count: int = 0
+        self.total_enqueue_seconds: float = 0.0
+        self.max_enqueue_seconds: float = 0.0
+        self.delivered_count: int = 0
+        self.max_delivery_seconds: float = 0.0
+        self.recent_delivery_seconds: Deque[float] = deque(maxlen=sample_size)
+
+    def record_broadcast(self, enqueue_seconds: float):
+        self.broadcast_count += 1
+        self.total_enqueue_seconds += enqueue_seconds
+        self.max_enqueue_seconds = max(self.max_enqueue_seconds, enqueue_seconds)
+
+    def record_delivery(self, delivery_seconds: float):
+        self.delivered_count += 1
+        self.max_delivery_seconds = max(self.max_delivery_seconds, delivery_seconds)
+        self.recent_delivery_seconds.append(delivery_seconds)
+
+    def to_dict(self) -> dict:
+        recent = sorted(self.recent_delivery_seconds)
+        return {
+            "broadcast_count": self.broadcast_count,
+            "average_enqueue_seconds": self.total_enqueue_seconds / self.broadcast_count if self.broadcast_count else 0.0,
+            "max_enqueue_seconds": self.max_enqueue_seconds,
+            "delivered_count": self.delivered_count,
+            "delivery_p50_seconds": _percentile(recent, 0.5),
+            "delivery_p99_seconds": _percentile(recent, 0.99),
+            "max_delivery_seconds": self.max_delivery_seconds,
+        }
 
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[UserConnection] = []
+        # user_id -> 연결. 입장, 퇴장, 조회를 O(1)로 처리
+        self.active_connections: Dict[str, UserConnection] = {}
+        self.fanout_stats = FanoutStats()
 
     async def connect(self, connection: UserConnection):
+        connection.on_delivered = self.fanout_stats.record_delivery
         await connection.accept()
-        self.active_connections.append(connection)
+        self.active_connections[connection.user_id] = connection
 
     def disconnect(self, connection: UserConnection):
-        self.active_connections.remove(connection)
+        self.active_connections.pop(connection.user_id, None)
+        connection.stop_writer()
+
+    # 각 연결의 전송 대기열에 넣기만 하고, 실제 전송은 연결별 writer task가 동시에 처리합니다.
+    async def broadcast(self, message: Message, frame: Optional[str] = None):
+        started_at = time.monotonic()
+        if frame is None:
+            frame = encode_message(message)
+        # 모든 연결이 같은 객체를 공유하므로 형식별 직렬화도 broadcast마다 한 번만 수행됨
+        outbound = OutboundMessage(frame, message)
+        for connection in self.active_connections.values():
+            connection.enqueue_outbound(outbound)
+        elapsed = time.monotonic() - started_at
+        self.fanout_stats.record_broadcast(elapsed)
+        broadcast_seconds.observe(elapsed)
 
-    async def broadcast(self, message: Message):
-        for connection in self.active_connections:
-            await connection.send_message(message)
+    def get_connections(self) -> List[UserConnection]:
+        return list(self.active_connections.values())
 
-    def get_connections(self):
-        return self.active_connections
+    def get_connection(self, user_id: str) -> Optional[UserConnection]:
+        return self.active_connections.get(user_id)
 
     def count_connections(self):
         return len(self.active_connections)
+
+    # 연결별 inbound 속도 제한 결과의 합계
+    def get_inbound_stats(self) -> dict:
+        stats = {"accepted_count": 0, "coalesced_count": 0, "dropped_count": 0, "oversized_count": 0,
+                 "pending_count": 0}
+        for connection in self.active_connections.values():
+            if connection.inbound_limiter is not None:
+                for key, value in connection.inbound_limiter.get_stats().items():
+                    stats[key] += value
+        return stats
+
+    def get_fanout_stats(self) -> dict:
+        stats = self.fanout_stats.to_dict()
+        stats["connection_count"] = self.count_connections()
+        connections = self.active_connections.values()
+        stats["queued_message_count"] = sum(connection.send_queue.qsize() for connection in connections)
+        stats["dropped_message_count"] = sum(connection.dropped_message_count for connection in connections)
+        return stats
@@ -0,0 +1,23 @@
+import time
+from typing import List, Optional
+
+
+# 메시지별 분류 결과(logits)를 지수 감쇠 평균으로 누적한 감정 상태
+class EmotionState:
+    __slots__ = ("logits", "message_count", "updated_at")
+
+    def __init__(self):
+        self.logits: Optional[List[float]] = None
+        self.message_count: int = 0
+        self.updated_at: Optional[float] = None
+
+    def update(self, logits: List[float], decay: float):
+        if self.logits is None:
+            self.logits = list(logits)
+        else:
+            self.logits = [decay * old + (1 - decay) * new for old, new in zip(self.logits, logits)]
+        self.message_count += 1
+        self.updated_at = time.time()
+
+    def is_empty(self) -> bool:
+        return self.logits is None
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from config.config import INACTIVE_ROOM_SWEEP_INTERVAL_SECONDS, INACTIVE_ROOM_TTL_SECONDS
+from core.metrics import errors_total
+from service.chat.chat_room_manager import ChatRoomManager
+
+
+# 만든 뒤 일정 시간 동안 아무도 입장하지 않은 채팅방을 제거합니다.
+# 채팅방마다 task를 만들지 않고 하나의 task가 주기적으로 만료된 채팅방만 확인합니다.
+# 만료 시간(ttl)이 모두 같으므로 등록 순서가 곧 만료 순서이고, 만료되지 않은 채팅방은 확인하지 않습니다.
+class InactiveRoomSweeper:
+    def __init__(
+            self,
+            chat_room_manager: ChatRoomManager,
+            ttl_seconds: float = INACTIVE_ROOM_TTL_SECONDS,
+            interval_seconds: float = INACTIVE_ROOM_SWEEP_INTERVAL_SECONDS,
+    ):
+        self._chat_room_manager = chat_room_manager
+        self._ttl_seconds = ttl_seconds
+        self._interval_seconds = interval_seconds
+        # (만료 시각, room_id)
+        self._deadlines: Deque[Tuple[float, str]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.removed_room_count = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def watch(self, room_id: str):
+        self._deadlines.append((time.monotonic() + self._ttl_seconds, room_id))
+
+    def count_watching(self) -> int:
+        return len(self._deadlines)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(e)
+                errors_total.inc("inactive_room_sweeper")
+
+    def sweep(self, now: Optional[float] = None):
+        if now is None:
+            now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, room_id = self._deadlines.popleft()
+            chat_room = self._chat_room_manager.get_chat_room(room_id)
+            # 이미 삭제되었거나 누군가 입장한 채팅방은 그대로 둠
+            if chat_room is not None and chat_room.count_connections() == 0:
+                self._chat_room_manager.delete_chat_room(room_id)
+                self.removed_room_count += 1
@@ -0,0 +1,133 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from config.config import (
+    INBOUND_COALESCE_ENABLED,
+    INBOUND_COALESCE_MAX_MESSAGES,
+    INBOUND_MAX_MESSAGE_LENGTH,
+    INBOUND_MESSAGE_BURST,
+    INBOUND_MESSAGES_PER_SECOND,
+)
+from core.metrics import inbound_messages_total
+from core.token_bucket import TokenBucket
+from service.chat.message import Message
+
+
+# 한 연결에서 들어오는 메시지의 속도를 제한합니다.
+# 토큰이 없을 때 들어온 메시지는 버리거나(coalesce=False), 모아두었다가 토큰이 생기면 하나의 메시지로 합쳐서 보냅니다.
+# 그래서 한 유저가 메시지를 쏟아내도 채팅방 전체에 broadcast 되는 횟수는 초당 rate개를 넘지 않습니다.
+# 합친 메시지가 max_message_length를 넘게 되면 새 메시지로 모으고, 토큰을 하나씩 사용해 차례로 보냅니다.
+class InboundRateLimiter:
+    def __init__(
+            self,
+            publish: Callable[[Message], Awaitable[None]],
+            rate: float = INBOUND_MESSAGES_PER_SECOND,
+            burst: float = INBOUND_MESSAGE_BURST,
+            coalesce: bool = INBOUND_COALESCE_ENABLED,
+            coalesce_max_messages: int = INBOUND_COALESCE_MAX_MESSAGES,
+            max_message_length: int = INBOUND_MAX_MESSAGE_LENGTH,
+    ):
+        self._publish = publish
+        self._bucket = TokenBucket(rate=rate, capacity=burst)
+        self._coalesce = coalesce
+        self._coalesce_max_messages = coalesce_max_messages
+        self._max_message_length = max_message_length
+        # 하나로 합쳐서 보낼 메시지 묶음들과, 마지막 묶음을 합쳤을 때의 길이
+        self._pending: List[List[Message]] = []
+        self._pending_count = 0
+        self._pending_length = 0
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.accepted_count = 0
+        self.coalesced_count = 0
+        self.dropped_count = 0
+        self.oversized_count = 0
+
+    async def submit(self, message: Message):
+        if self._pending:
+            # 앞서 밀린 메시지가 있다면 순서를 지키기 위해 뒤에 붙임
+            self._hold(message)
+            return
+
+        if self._bucket.try_acquire():
+            self._count("accepted")
+            await self._publish(message)
+            return
+
+        if self._coalesce:
+            self._hold(message)
+        else:
+            self._count("dropped")
+
+    def record_oversized(self):
+        self.oversized_count += 1
+        inbound_messages_total.inc("oversized")
+
+    def _hold(self, message: Message):
+        if self._pending_count >= self._coalesce_max_messages:
+            self._count("dropped")
+            return
+
+        # 줄바꿈으로 이어 붙였을 때 최대 길이를 넘으면 새 묶음을 시작
+        merged_length = self._pending_length + 1 + len(message.message)
+        if not self._pending or merged_length > self._max_message_length:
+            self._pending.append([message])
+            self._pending_length = len(message.message)
+        else:
+            self._pending[-1].append(message)
+            self._pending_length = merged_length
+        self._pending_count += 1
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            while self._pending:
+                await self._bucket.acquire()
+                messages = self._pending.pop(0)
+                self._pending_count -= len(messages)
+                if len(messages) > 1:
+                    self._count("coalesced", len(messages))
+                else:
+                    self._count("accepted")
+                try:
+                    await self._publish(merge_messages(messages))
+                except Exception as e:
+                    print(e)
+        finally:
+            self._flush_task = None
+
+    def _count(self, result: str, amount: int = 1):
+        if result == "accepted":
+            self.accepted_count += amount
+        elif result == "coalesced":
+            self.coalesced_count += amount
+        else:
+            self.dropped_count += amount
+        inbound_messages_total.inc(result, amount=amount)
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = []
+        self._pending_count = 0
+        self._pending_length = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "accepted_count": self.accepted_count,
+            "coalesced_count": self.coalesced_count,
+            "dropped_count": self.dropped_count,
+            "oversized_count": self.oversized_count,
+            "pending_count": self._pending_count,
+        }
+
+
+# 같은 유저가 보낸 메시지들을 줄바꿈으로 이어 하나의 메시지로 만듭니다.
+def merge_messages(messages: List[Message]) -> Message:
+    if len(messages) == 1:
+        return messages[0]
+    last = messages[-1]
+    return last.model_copy(update={"message": "\n".join(message.message for message in messages)})
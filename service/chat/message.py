@@ -2,6 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
+import orjson
 from pydantic import BaseModel
 
 
@@ -22,3 +23,9 @@ class Message(BaseModel):
     message_type: Optional[MessageType] = None
     event_type: Optional[MessageEventType] = None
     sent_at: Optional[datetime] = datetime.now()
+
+
+# 같은 메시지를 받는 모든 연결이 공유할 수 있도록 한 번만 직렬화합니다.
+# pydantic의 message.json()과 동일한 형식의 JSON 문자열을 만듭니다.
+def encode_message(message: Message) -> str:
+    return orjson.dumps(message.model_dump(), option=orjson.OPT_UTC_Z).decode()
@@ -0,0 +1,183 @@
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from config.config import HISTORY_MAX_MESSAGE_LENGTH, MAX_MESSAGE_TO_SAVE, ROOM_HISTORY_MAX_SIZE
+from service.chat.message import Message
+
+
+# 히스토리에 저장하는 유저 메시지
+# pydantic Message 대신 필요한 값만 __slots__로 저장하고, user_id와 username은 intern 해서 유저 단위로 공유합니다.
+class HistoryRecord:
+    __slots__ = ("user_id", "username", "message", "sent_at", "ref_count", "size_bytes")
+
+    def __init__(self, user_id: str, username: str, message: str, sent_at: float):
+        self.user_id = user_id
+        self.username = username
+        self.message = message
+        self.sent_at = sent_at
+        # 이 레코드를 가지고 있는 ring buffer 수. 0이 되면 메모리 사용량에서 제외
+        self.ref_count = 0
+        # user_id와 username은 유저 단위로 공유되므로 레코드 크기에 포함하지 않음
+        self.size_bytes = sys.getsizeof(self) + sys.getsizeof(message) + sys.getsizeof(sent_at)
+
+
+# ring buffer의 최근 메시지를 복사하지 않고 읽는 view
+# view를 만든 뒤 ring buffer에 메시지가 추가되면 내용이 바뀌므로 await 없이 바로 사용해야 합니다.
+class HistoryView(Sequence):
+    __slots__ = ("_items", "_start", "_length")
+
+    def __init__(self, items: List[Optional[HistoryRecord]], start: int, length: int):
+        self._items = items
+        self._start = start
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return self._items[(self._start + index) % len(self._items)]
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        capacity = len(self._items)
+        for offset in range(self._length):
+            yield self._items[(self._start + offset) % capacity]
+
+
+# 크기가 고정된 배열에 순서대로 덮어쓰는 ring buffer
+class RingBuffer:
+    __slots__ = ("_items", "_appended_count")
+
+    def __init__(self, capacity: int):
+        self._items: List[Optional[HistoryRecord]] = [None] * capacity
+        self._appended_count = 0
+
+    # 가득 찼다면 덮어쓴 가장 오래된 레코드를 반환합니다.
+    def append(self, record: HistoryRecord) -> Optional[HistoryRecord]:
+        index = self._appended_count % len(self._items)
+        evicted = self._items[index]
+        self._items[index] = record
+        self._appended_count += 1
+        return evicted
+
+    def last(self, count: int) -> HistoryView:
+        length = min(count, len(self))
+        return HistoryView(self._items, self._appended_count - length, length)
+
+    def clear(self) -> List[HistoryRecord]:
+        records = [record for record in self._items if record is not None]
+        self._items = [None] * len(self._items)
+        self._appended_count = 0
+        return records
+
+    def __len__(self) -> int:
+        return min(self._appended_count, len(self._items))
+
+
+# 채팅방의 유저 메시지 히스토리
+# 채팅방 전체의 최근 메시지와 유저별 최근 메시지를 각각 ring buffer로 보관하고, 레코드는 두 buffer가 공유합니다.
+# 유저별 buffer는 현재 worker에 연결된 유저만 가지므로, 채팅방의 메모리 사용량은 max_bytes(현재 worker의 유저 수)를 넘지 않습니다.
+class RoomMessageHistory:
+    def __init__(
+            self,
+            max_room_messages: int = ROOM_HISTORY_MAX_SIZE,
+            max_user_messages: int = MAX_MESSAGE_TO_SAVE,
+            max_message_length: int = HISTORY_MAX_MESSAGE_LENGTH,
+    ):
+        self._max_user_messages = max_user_messages
+        self._max_message_length = max_message_length
+        self._room_messages = RingBuffer(max_room_messages)
+        self._user_messages: Dict[str, RingBuffer] = {}
+        self.record_count = 0
+        self.memory_bytes = 0
+
+    # track_user가 False이면 채팅방 전체 히스토리에만 저장합니다.
+    # 다른 worker에 연결된 유저는 이 worker에서 나갈 때 remove_user가 호출되지 않으므로 유저별 buffer를 만들지 않습니다.
+    def append(self, message: Message, track_user: bool = True) -> HistoryRecord:
+        user_id = sys.intern(message.user_id)
+        user_messages = self._user_messages.get(user_id)
+        if user_messages is None and track_user:
+            user_messages = RingBuffer(self._max_user_messages)
+            self._user_messages[user_id] = user_messages
+
+        record = HistoryRecord(
+            user_id=user_id,
+            username=sys.intern(message.username),
+            message=message.message[:self._max_message_length],
+            sent_at=message.sent_at.timestamp() if message.sent_at is not None else 0.0,
+        )
+        record.ref_count = 2 if user_messages is not None else 1
+        self.record_count += 1
+        self.memory_bytes += record.size_bytes
+
+        self._release(self._room_messages.append(record))
+        if user_messages is not None:
+            self._release(user_messages.append(record))
+        return record
+
+    def last_for_room(self, count: int) -> HistoryView:
+        return self._room_messages.last(count)
+
+    def last_for_user(self, user_id: str, count: int = MAX_MESSAGE_TO_SAVE) -> HistoryView:
+        user_messages = self._user_messages.get(user_id)
+        if user_messages is None:
+            return HistoryView([], 0, 0)
+        return user_messages.last(count)
+
+    def count_user_messages(self, user_id: str) -> int:
+        user_messages = self._user_messages.get(user_id)
+        return len(user_messages) if user_messages is not None else 0
+
+    # 나간 유저의 메시지는 채팅방 전체 히스토리에만 남김
+    def remove_user(self, user_id: str):
+        user_messages = self._user_messages.pop(user_id, None)
+        if user_messages is not None:
+            for record in user_messages.clear():
+                self._release(record)
+
+    def _release(self, record: Optional[HistoryRecord]):
+        if record is None:
+            return
+        record.ref_count -= 1
+        if record.ref_count == 0:
+            self.record_count -= 1
+            self.memory_bytes -= record.size_bytes
+
+    # 채팅방 전체 buffer와 유저별 buffer가 모두 서로 다른 최대 길이의 메시지로 가득 찬 경우의 메모리 사용량
+    # 배열의 포인터와 레코드를 포함하고, 유저 단위로 공유되는 user_id, username은 제외합니다.
+    def max_bytes(self, user_count: int) -> int:
+        return estimate_max_history_bytes(
+            user_count=user_count,
+            room_count=1,
+            max_room_messages=len(self._room_messages._items),
+            max_user_messages=self._max_user_messages,
+            max_message_length=self._max_message_length,
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "room_message_count": len(self._room_messages),
+            "user_count": len(self._user_messages),
+            "record_count": self.record_count,
+            "memory_bytes": self.memory_bytes,
+            "max_bytes": self.max_bytes(len(self._user_messages)),
+        }
+
+
+def estimate_max_history_bytes(
+        user_count: int,
+        room_count: int,
+        max_room_messages: int = ROOM_HISTORY_MAX_SIZE,
+        max_user_messages: int = MAX_MESSAGE_TO_SAVE,
+        max_message_length: int = HISTORY_MAX_MESSAGE_LENGTH,
+) -> int:
+    pointer_size = 8
+    # 한 글자에 4 byte가 필요한 문자열이 가장 큼
+    record = HistoryRecord("", "", "\U0001F600" * max_message_length, 0.0)
+    slot_count = room_count * max_room_messages + user_count * max_user_messages
+    return slot_count * (pointer_size + record.size_bytes)
@@ -0,0 +1,367 @@
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from config.config import (
+    MESSAGE_LOG_COMPACT_INTERVAL_SECONDS,
+    MESSAGE_LOG_COMPACT_THRESHOLD,
+    MESSAGE_LOG_FSYNC_INTERVAL_SECONDS,
+    MESSAGE_LOG_MAX_TOTAL_BYTES,
+    MESSAGE_LOG_REPLAY_SIZE,
+    MESSAGE_LOG_RETENTION_SECONDS,
+    MESSAGE_LOG_SEGMENT_MAX_BYTES,
+)
+
+# 레코드 = header(payload 길이, payload crc32, room uuid 16 byte) + payload(직렬화된 메시지 frame)
+RECORD_HEADER = struct.Struct("<II16s")
+SEGMENT_SUFFIX = ".log"
+
+# (segment id, segment 안의 offset)
+RecordPosition = Tuple[int, int]
+
+
+class LogSegment:
+    def __init__(self, directory: str, segment_id: int):
+        self.segment_id = segment_id
+        self.path = os.path.join(directory, f"{segment_id:020d}{SEGMENT_SUFFIX}")
+        self.size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.record_count = 0
+        self.modified_at = os.path.getmtime(self.path) if os.path.exists(self.path) else time.time()
+
+
+# segment 파일을 처음부터 읽으면서 정상적으로 기록된 레코드의 (offset, room_id, payload 길이)를 반환합니다.
+# 비정상 종료로 마지막 레코드가 잘렸다면 그 앞까지만 반환합니다.
+def scan_segment(path: str) -> Tuple[List[Tuple[int, str, int]], int]:
+    records = []
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return records, 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(mapped):
+                length, checksum, room_bytes = RECORD_HEADER.unpack_from(mapped, offset)
+                payload_start = offset + RECORD_HEADER.size
+                if payload_start + length > len(mapped):
+                    break
+                if zlib.crc32(mapped[payload_start:payload_start + length]) != checksum:
+                    break
+                records.append((offset, str(uuid.UUID(bytes=room_bytes)), length))
+                offset = payload_start + length
+    return records, offset
+
+
+# 채팅방 메시지를 segment 파일에 순서대로 추가하는 로그
+# - 쓰기는 버퍼에 추가만 하고, fsync는 일정 주기로 모아서 별도 thread에서 수행
+# - 채팅방별 최근 N개 레코드의 위치만 메모리에 두고, 재생할 때는 segment를 mmap으로 읽음
+# - 오래되었거나 전체 크기를 넘은 segment는 삭제하고, 재생에 필요 없는 레코드가 많은 segment는 다시 씀
+# 여러 worker가 같은 디렉터리를 쓰지 않도록 디렉터리에 lock을 잡습니다.
+class MessageLog:
+    def __init__(
+            self,
+            directory: str,
+            segment_max_bytes: int = MESSAGE_LOG_SEGMENT_MAX_BYTES,
+            max_total_bytes: int = MESSAGE_LOG_MAX_TOTAL_BYTES,
+            retention_seconds: float = MESSAGE_LOG_RETENTION_SECONDS,
+            replay_size: int = MESSAGE_LOG_REPLAY_SIZE,
+            fsync_interval_seconds: float = MESSAGE_LOG_FSYNC_INTERVAL_SECONDS,
+            compact_interval_seconds: float = MESSAGE_LOG_COMPACT_INTERVAL_SECONDS,
+            compact_threshold: float = MESSAGE_LOG_COMPACT_THRESHOLD,
+    ):
+        self.directory = directory
+        self._segment_max_bytes = segment_max_bytes
+        self._max_total_bytes = max_total_bytes
+        self._retention_seconds = retention_seconds
+        self._replay_size = replay_size
+        self._fsync_interval_seconds = fsync_interval_seconds
+        self._compact_interval_seconds = compact_interval_seconds
+        self._compact_threshold = compact_threshold
+
+        self._lock_file = None
+        self._segments: Dict[int, LogSegment] = {}
+        self._active: Optional[LogSegment] = None
+        self._active_file = None
+        self._dirty = False
+        # room_id -> 최근 레코드 위치
+        self._positions_by_room: Dict[str, Deque[RecordPosition]] = {}
+        # segment id -> (mmap 한 크기, mmap)
+        self._mapped: Dict[int, Tuple[int, mmap.mmap]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+        self.appended_count = 0
+        self.fsync_count = 0
+        self.compacted_segment_count = 0
+        self.deleted_segment_count = 0
+
+    # 다른 프로세스가 이미 사용 중인 디렉터리라면 False를 반환합니다.
+    def open(self) -> bool:
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, "LOCK"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+
+        # 남아있는 segment를 읽어서 채팅방별 최근 레코드 위치를 다시 만듦
+        segment_ids = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        for segment_id in segment_ids:
+            segment = LogSegment(self.directory, segment_id)
+            records, valid_size = scan_segment(segment.path)
+            if valid_size < segment.size:
+                # 잘린 레코드는 버림
+                os.truncate(segment.path, valid_size)
+                segment.size = valid_size
+            segment.record_count = len(records)
+            for offset, room_id, _ in records:
+                self._remember(room_id, (segment_id, offset))
+            self._segments[segment_id] = segment
+
+        self._roll_segment(segment_ids[-1] if segment_ids else 0)
+        return True
+
+    async def start(self) -> bool:
+        if not self.open():
+            return False
+        self._tasks = [
+            asyncio.create_task(self._fsync_loop()),
+            asyncio.create_task(self._maintenance_loop()),
+        ]
+        return True
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.close()
+
+    def close(self):
+        if self._active_file is not None:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._active_file.close()
+            self._active_file = None
+        for _, mapped in self._mapped.values():
+            mapped.close()
+        self._mapped = {}
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _roll_segment(self, segment_id: int):
+        if self._active_file is not None:
+            self._active_file.flush()
+            # 닫기 전에 남은 내용을 디스크에 기록
+            os.fsync(self._active_file.fileno())
+            self._active_file.close()
+
+        segment = self._segments.get(segment_id)
+        if segment is None or segment.size >= self._segment_max_bytes:
+            segment_id = segment_id + 1 if segment is not None else segment_id
+            segment = LogSegment(self.directory, segment_id)
+            self._segments[segment_id] = segment
+        self._active = segment
+        self._active_file = open(segment.path, "ab")
+
+    def append(self, room_id: str, frame: str):
+        payload = frame.encode()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), uuid.UUID(room_id).bytes) + payload
+
+        segment = self._active
+        offset = segment.size
+        self._active_file.write(record)
+        segment.size += len(record)
+        segment.record_count += 1
+        segment.modified_at = time.time()
+        self._dirty = True
+        self.appended_count += 1
+        self._remember(room_id, (segment.segment_id, offset))
+
+        if segment.size >= self._segment_max_bytes:
+            self._roll_segment(segment.segment_id)
+
+    def _remember(self, room_id: str, position: RecordPosition):
+        positions = self._positions_by_room.get(room_id)
+        if positions is None:
+            positions = deque(maxlen=self._replay_size)
+            self._positions_by_room[room_id] = positions
+        positions.append(position)
+
+    # 삭제된 채팅방의 레코드는 재생하지 않으므로 다음 compaction에서 정리됨
+    def forget_room(self, room_id: str):
+        self._positions_by_room.pop(room_id, None)
+
+    # 채팅방의 최근 메시지 frame을 오래된 순서로 반환합니다. 파일 전체를 읽지 않고 필요한 레코드만 읽습니다.
+    def read_last(self, room_id: str, count: int = MESSAGE_LOG_REPLAY_SIZE) -> List[str]:
+        positions = self._positions_by_room.get(room_id)
+        if not positions:
+            return []
+
+        frames = []
+        for segment_id, offset in list(positions)[-count:]:
+            mapped = self._map(segment_id, offset)
+            if mapped is None:
+                continue
+            length, _, _ = RECORD_HEADER.unpack_from(mapped, offset)
+            payload_start = offset + RECORD_HEADER.size
+            frames.append(mapped[payload_start:payload_start + length].decode())
+        return frames
+
+    def _map(self, segment_id: int, offset: int) -> Optional[mmap.mmap]:
+        segment = self._segments.get(segment_id)
+        # 이미 삭제된 segment
+        if segment is None or offset >= segment.size:
+            return None
+
+        cached = self._mapped.get(segment_id)
+        if cached is not None and offset < cached[0]:
+            return cached[1]
+
+        # 활성 segment는 버퍼에 남은 내용을 파일에 쓴 뒤 현재 크기로 다시 mmap
+        if segment is self._active:
+            self._active_file.flush()
+        if cached is not None:
+            cached[1].close()
+        with open(segment.path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped[segment_id] = (len(mapped), mapped)
+        return mapped
+
+    def _unmap(self, segment_id: int):
+        cached = self._mapped.pop(segment_id, None)
+        if cached is not None:
+            cached[1].close()
+
+    async def _fsync_loop(self):
+        while True:
+            await asyncio.sleep(self._fsync_interval_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                print(e)
+
+    # 마지막 fsync 이후 추가된 레코드를 한 번에 디스크에 기록합니다.
+    async def sync(self):
+        if not self._dirty or self._active_file is None:
+            return
+        self._dirty = False
+        self._active_file.flush()
+        await asyncio.to_thread(os.fsync, self._active_file.fileno())
+        self.fsync_count += 1
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self._compact_interval_seconds)
+            try:
+                self.apply_retention()
+                await self.compact()
+            except Exception as e:
+                print(e)
+
+    # 보관 기간이 지났거나 전체 크기를 넘은 segment를 오래된 순서로 삭제합니다.
+    def apply_retention(self, now: Optional[float] = None):
+        if now is None:
+            now = time.time()
+        total_bytes = sum(segment.size for segment in self._segments.values())
+        for segment_id in sorted(self._segments):
+            segment = self._segments[segment_id]
+            if segment is self._active:
+                break
+            expired = now - segment.modified_at > self._retention_seconds
+            if not expired and total_bytes <= self._max_total_bytes:
+                break
+            total_bytes -= segment.size
+            self._delete_segment(segment)
+
+    def _delete_segment(self, segment: LogSegment):
+        self._unmap(segment.segment_id)
+        del self._segments[segment.segment_id]
+        if os.path.exists(segment.path):
+            os.unlink(segment.path)
+        self.deleted_segment_count += 1
+
+    # 재생에 쓰이는 레코드 비율이 낮은 segment를 필요한 레코드만 남겨 다시 씁니다.
+    async def compact(self):
+        live_offsets_by_segment: Dict[int, Set[int]] = {}
+        for positions in self._positions_by_room.values():
+            for segment_id, offset in positions:
+                live_offsets_by_segment.setdefault(segment_id, set()).add(offset)
+
+        for segment_id in sorted(self._segments):
+            segment = self._segments.get(segment_id)
+            if segment is None or segment is self._active or segment.record_count == 0:
+                continue
+            live_offsets = live_offsets_by_segment.get(segment_id, set())
+            if len(live_offsets) / segment.record_count >= self._compact_threshold:
+                continue
+
+            if len(live_offsets) == 0:
+                self._delete_segment(segment)
+                continue
+
+            # 파일 쓰기는 thread에서 하고, 교체와 위치 갱신은 이벤트 루프에서 한 번에 처리
+            temporary_path = segment.path + ".compact"
+            new_offset_by_offset, new_size = await asyncio.to_thread(
+                _rewrite_segment, segment.path, temporary_path, sorted(live_offsets),
+            )
+            if self._segments.get(segment_id) is not segment:
+                os.unlink(temporary_path)
+                continue
+
+            self._unmap(segment_id)
+            os.replace(temporary_path, segment.path)
+            segment.size = new_size
+            segment.record_count = len(new_offset_by_offset)
+            for positions in self._positions_by_room.values():
+                for index, (position_segment_id, offset) in enumerate(positions):
+                    if position_segment_id == segment_id:
+                        positions[index] = (segment_id, new_offset_by_offset[offset])
+            self.compacted_segment_count += 1
+
+    def get_stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segment_count": len(self._segments),
+            "total_bytes": sum(segment.size for segment in self._segments.values()),
+            "room_count": len(self._positions_by_room),
+            "appended_count": self.appended_count,
+            "fsync_count": self.fsync_count,
+            "compacted_segment_count": self.compacted_segment_count,
+            "deleted_segment_count": self.deleted_segment_count,
+        }
+
+
+def _rewrite_segment(path: str, temporary_path: str, offsets: List[int]) -> Tuple[Dict[int, int], int]:
+    new_offset_by_offset = {}
+    new_offset = 0
+    with open(path, "rb") as source, open(temporary_path, "wb") as target:
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in offsets:
+                length, _, _ = RECORD_HEADER.unpack_from(mapped, offset)
+                record_end = offset + RECORD_HEADER.size + length
+                target.write(mapped[offset:record_end])
+                new_offset_by_offset[offset] = new_offset
+                new_offset += record_end - offset
+        target.flush()
+        os.fsync(target.fileno())
+    return new_offset_by_offset, new_offset
+
+
+# 여러 worker가 같은 설정으로 실행되어도 서로 다른 디렉터리를 쓰도록
+# base_directory 아래에서 lock을 잡을 수 있는 첫 번째 worker-N 디렉터리를 사용합니다.
+async def open_worker_message_log(base_directory: str, max_workers: int = 64) -> Optional[MessageLog]:
+    for index in range(max_workers):
+        message_log = MessageLog(os.path.join(base_directory, f"worker-{index}"))
+        if await message_log.start():
+            return message_log
+    return None
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import itertools
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import orjson
+
+from config.config import (
+    ROOM_LIST_DELTA_FLUSH_SECONDS,
+    ROOM_LIST_SNAPSHOT_MIN_INTERVAL_SECONDS,
+    ROOM_LIST_SUBSCRIBER_QUEUE_SIZE,
+)
+from service.chat.chat_room_manager import ChatRoomManager
+
+
+class RoomListSnapshot:
+    def __init__(self, version: int, rooms: List[dict], sequences: List[int]):
+        self.version = version
+        # 채팅방 생성 순서(sequence)로 정렬된 채팅방 목록
+        self.rooms = rooms
+        self.sequences = sequences
+        # (cursor, limit) -> 직렬화된 응답
+        self.encoded_pages: Dict[Tuple[int, int], bytes] = {}
+
+
+# 로비의 채팅방 목록을 제공합니다.
+# - 목록은 채팅방이나 인원수가 바뀌었을 때만 다시 만들고, 페이지별 응답은 직렬화해서 재사용
+# - 채팅방 생성/삭제, 인원수 변경은 모아서 구독자(SSE)에게 한 번에 전달
+class RoomDirectory:
+    def __init__(
+            self,
+            chat_room_manager: ChatRoomManager,
+            snapshot_min_interval_seconds: float = ROOM_LIST_SNAPSHOT_MIN_INTERVAL_SECONDS,
+            delta_flush_seconds: float = ROOM_LIST_DELTA_FLUSH_SECONDS,
+            subscriber_queue_size: int = ROOM_LIST_SUBSCRIBER_QUEUE_SIZE,
+    ):
+        self._chat_room_manager = chat_room_manager
+        self._snapshot_min_interval_seconds = snapshot_min_interval_seconds
+        self._delta_flush_seconds = delta_flush_seconds
+        self._subscriber_queue_size = subscriber_queue_size
+
+        # 채팅방이 현재 worker에 추가된 순서. 페이지 cursor로 사용
+        self._sequence = itertools.count(1)
+        self._sequence_by_room_id: Dict[str, int] = {}
+        for chat_room in chat_room_manager.list_chat_rooms():
+            self._sequence_by_room_id[chat_room.room_id] = next(self._sequence)
+
+        self.version = 0
+        self._snapshot: Optional[RoomListSnapshot] = None
+        self._snapshot_built_at = 0.0
+        self.snapshot_build_count = 0
+
+        # room_id -> 마지막 변경 종류. 같은 채팅방의 변경은 flush 전까지 하나로 합침
+        self._pending_changes: Dict[str, str] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+        chat_room_manager.room_listeners.append(self._on_room_event)
+
+    def start(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+    def _on_room_event(self, event: str, room_id: str):
+        if event == "created":
+            self._sequence_by_room_id[room_id] = next(self._sequence)
+        elif event == "deleted":
+            self._sequence_by_room_id.pop(room_id, None)
+
+        self.version += 1
+        if self._subscribers:
+            # 생성 직후 삭제되었다면 구독자는 삭제만 알면 됨
+            self._pending_changes[room_id] = "deleted" if event == "deleted" else "updated"
+
+    # 페이지 응답(JSON)과 ETag를 반환합니다. cursor는 이전 페이지의 next_cursor 입니다.
+    def get_page(self, cursor: int, limit: int) -> Tuple[bytes, str]:
+        snapshot = self._get_snapshot()
+        etag = f'W/"{snapshot.version}-{cursor}-{limit}"'
+
+        encoded = snapshot.encoded_pages.get((cursor, limit))
+        if encoded is None:
+            start = bisect.bisect_right(snapshot.sequences, cursor)
+            rooms = snapshot.rooms[start:start + limit]
+            next_cursor = snapshot.sequences[start + limit - 1] if start + limit < len(snapshot.rooms) else None
+            encoded = orjson.dumps({
+                "chat_rooms": rooms,
+                "next_cursor": str(next_cursor) if next_cursor is not None else None,
+                # 구독 중 받은 변경이 이 목록에 이미 반영되었는지 비교하는 값
+                "version": snapshot.version,
+            })
+            snapshot.encoded_pages[(cursor, limit)] = encoded
+        return encoded, etag
+
+    def _get_snapshot(self) -> RoomListSnapshot:
+        now = time.monotonic()
+        snapshot = self._snapshot
+        # 변경이 잦아도 최소 간격 안에서는 이전 목록을 그대로 사용
+        if snapshot is not None and (
+                snapshot.version == self.version or now - self._snapshot_built_at < self._snapshot_min_interval_seconds
+        ):
+            return snapshot
+
+        entries = []
+        for room_id, sequence in self._sequence_by_room_id.items():
+            chat_room = self._chat_room_manager.get_chat_room(room_id)
+            if chat_room is not None:
+                entries.append((sequence, self._to_dict(chat_room)))
+        # dict는 추가된 순서를 유지하므로 이미 sequence 순서
+        snapshot = RoomListSnapshot(
+            version=self.version,
+            rooms=[room for _, room in entries],
+            sequences=[sequence for sequence, _ in entries],
+        )
+        self._snapshot = snapshot
+        self._snapshot_built_at = now
+        self.snapshot_build_count += 1
+        return snapshot
+
+    @staticmethod
+    def _to_dict(chat_room) -> dict:
+        return {
+            "room_id": chat_room.room_id,
+            "room_name": chat_room.room_name,
+            "user_count": chat_room.count_connections(),
+        }
+
+    # 변경 사항을 받을 대기열을 등록합니다. 대기열에는 SSE로 보낼 문자열이 들어갑니다.
+    # 대기열이 가득 찬 느린 구독자에게는 None을 넣어 연결을 끊고, 클라이언트가 목록을 다시 받도록 합니다.
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._subscriber_queue_size)
+        self._subscribers.add(queue)
+        # 구독자가 이어서 받는 목록에는 구독 전의 변경이 모두 반영되어야 하므로, 최소 간격과 관계없이 다음 요청에서 다시 만듦
+        self._snapshot_built_at = 0.0
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def count_subscribers(self) -> int:
+        return len(self._subscribers)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._delta_flush_seconds)
+            try:
+                self._flush()
+            except Exception as e:
+                print(e)
+
+    def _flush(self):
+        if not self._pending_changes:
+            return
+        changes, self._pending_changes = self._pending_changes, {}
+
+        deltas = []
+        for room_id, change in changes.items():
+            chat_room = self._chat_room_manager.get_chat_room(room_id)
+            if change == "deleted" or chat_room is None:
+                deltas.append({"type": "deleted", "room_id": room_id})
+            else:
+                deltas.append({"type": "updated", **self._to_dict(chat_room)})
+
+        # 모든 구독자가 같은 문자열을 공유. id는 이 변경까지 반영한 목록 version
+        frame = f"event: rooms\nid: {self.version}\ndata: {orjson.dumps(deltas).decode()}\n\n"
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def get_stats(self) -> dict:
+        return {
+            "room_count": len(self._sequence_by_room_id),
+            "version": self.version,
+            "snapshot_version": self._snapshot.version if self._snapshot is not None else None,
+            "snapshot_build_count": self.snapshot_build_count,
+            "subscriber_count": len(self._subscribers),
+        }
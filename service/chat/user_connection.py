@@ -1,40 +1,159 @@
-from collections import deque
-from typing import List, Deque
+import asyncio
+import time
+from typing import Callable, Optional, Tuple
 
 from starlette.websockets import WebSocket
 
-from config.config import MAX_MESSAGE_TO_SAVE
-from service.chat.message import Message, MessageType
+from config.config import (
+    INBOUND_MAX_MESSAGE_LENGTH,
+    OUTBOUND_BATCH_MAX_MESSAGES,
+    OUTBOUND_BATCH_WINDOW_SECONDS,
+    SEND_QUEUE_MAX_SIZE,
+    SEND_QUEUE_OVERFLOW_POLICY,
+)
+from core.metrics import outbound_batch_size, receive_message_seconds
+from service.chat.inbound_limiter import InboundRateLimiter
+from service.chat.message import Message, encode_message
+from service.chat.wire_protocol import PROTOCOL_MSGPACK_BATCH, OutboundMessage, encode_batch, is_batch_protocol
+
+
+class MessageTooLargeException(Exception):
+    def __init__(self, length: int):
+        self.message = f"Message length {length} exceeds {INBOUND_MAX_MESSAGE_LENGTH}"
 
 
 class UserConnection:
-    def __init__(self, user_id: str, username: str, websocket: WebSocket):
+    def __init__(
+            self,
+            user_id: str,
+            username: str,
+            websocket: WebSocket,
+            max_queue_size: int = SEND_QUEUE_MAX_SIZE,
+            overflow_policy: str = SEND_QUEUE_OVERFLOW_POLICY,
+            protocol: Optional[str] = None,
+            subprotocol: Optional[str] = None,
+    ):
         self.user_id: str = user_id
         self.username: str = username
         self.websocket: WebSocket = websocket
-        self.messages: Deque[Message] = deque()
+        # 협상한 전송 형식 (wire_protocol). None이나 chat.v1.json이면 메시지마다 JSON text frame
+        self.protocol: Optional[str] = protocol
+        # 클라이언트가 Sec-WebSocket-Protocol로 요청했다면 응답 헤더에 돌려줄 값
+        self.subprotocol: Optional[str] = subprotocol
+
+        self.overflow_policy: str = overflow_policy
+        self.send_queue: asyncio.Queue[Tuple[OutboundMessage, float]] = asyncio.Queue(maxsize=max_queue_size)
+        self.dropped_message_count: int = 0
+        self.evicted: bool = False
+        # 메시지가 대기열에 들어간 뒤 실제로 전송되기까지 걸린 시간을 전달받는 콜백
+        self.on_delivered: Optional[Callable[[float], None]] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # 이 연결에서 들어오는 메시지의 속도 제한 (receive loop에서 설정)
+        self.inbound_limiter: Optional[InboundRateLimiter] = None
 
     async def accept(self):
-        return await self.websocket.accept()
+        result = await self.websocket.accept(subprotocol=self.subprotocol)
+        self._writer_task = asyncio.create_task(self._write_loop())
+        return result
 
     async def close(self):
+        self.stop_writer()
         return await self.websocket.close()
 
+    def stop_writer(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+
     async def send_message(self, message: Message):
-        await self.websocket.send_text(message.json())
-        if message.message_type == MessageType.USER_MESSAGE and message.user_id == self.user_id:
-            self.save_user_message(message)
+        await self.websocket.send_text(encode_message(message))
+
+    # 전송을 기다리지 않고 대기열에 넣기만 합니다. 연결이 종료되어 넣지 못했다면 False를 반환합니다.
+    # broadcast에서는 미리 직렬화한 frame을 모든 연결이 공유합니다.
+    def enqueue_message(self, message: Message, frame: Optional[str] = None) -> bool:
+        if frame is None:
+            frame = encode_message(message)
+        return self.enqueue_outbound(OutboundMessage(frame, message))
+
+    # 이미 직렬화된 frame을 대기열에 넣습니다. (메시지 로그 재생 등)
+    def enqueue_frame(self, frame: str) -> bool:
+        return self.enqueue_outbound(OutboundMessage(frame))
+
+    def enqueue_outbound(self, outbound: OutboundMessage) -> bool:
+        if self.evicted:
+            return False
+
+        item = (outbound, time.monotonic())
+        try:
+            self.send_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped_message_count += 1
+            if self.overflow_policy == "disconnect":
+                self.evict()
+                return False
+
+            self.send_queue.get_nowait()
+            self.send_queue.put_nowait(item)
+
+        return True
+
+    # 대기열을 비우지 못하는 느린 클라이언트의 연결을 끊습니다.
+    # 연결이 닫히면 receive loop가 예외로 끝나고, connect_chat_room의 finally에서 방에서 정리됩니다.
+    def evict(self):
+        self.evicted = True
+        self.stop_writer()
+        asyncio.create_task(self._close_quietly())
+
+    async def _close_quietly(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    async def _write_loop(self):
+        if is_batch_protocol(self.protocol):
+            await self._write_batch_loop()
+            return
+
+        while True:
+            outbound, enqueued_at = await self.send_queue.get()
+            try:
+                await self.websocket.send_text(outbound.frame)
+            except Exception:
+                # 이미 끊어진 연결은 receive loop에서 정리됨
+                return
+
+            if self.on_delivered is not None:
+                self.on_delivered(time.monotonic() - enqueued_at)
 
-    def save_user_message(self, message: Message):
-        self.messages.append(message)
+    # 짧은 시간 동안 쌓인 메시지를 하나의 frame으로 묶어서 보냅니다.
+    async def _write_batch_loop(self):
+        while True:
+            items = [await self.send_queue.get()]
+            if OUTBOUND_BATCH_WINDOW_SECONDS > 0:
+                await asyncio.sleep(OUTBOUND_BATCH_WINDOW_SECONDS)
+            while len(items) < OUTBOUND_BATCH_MAX_MESSAGES and not self.send_queue.empty():
+                items.append(self.send_queue.get_nowait())
 
-        # 메모리 사용량을 줄이기 위해 지정된 메시지 수만 메모리에 저장
-        if len(self.messages) > MAX_MESSAGE_TO_SAVE:
-            self.messages.popleft()
+            payload = encode_batch(self.protocol, [outbound for outbound, _ in items])
+            try:
+                if self.protocol == PROTOCOL_MSGPACK_BATCH:
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+            except Exception:
+                return
 
-    def list_messages(self) -> List[Message]:
-        return list(self.messages)
+            outbound_batch_size.observe(len(items))
+            if self.on_delivered is not None:
+                delivered_at = time.monotonic()
+                for _, enqueued_at in items:
+                    self.on_delivered(delivered_at - enqueued_at)
 
     async def receive_message(self) -> Message:
         message = await self.websocket.receive_text()
-        return Message.parse_raw(message)
+        # 큰 메시지는 파싱하지 않고 버림
+        if len(message) > INBOUND_MAX_MESSAGE_LENGTH:
+            raise MessageTooLargeException(len(message))
+        with receive_message_seconds.time():
+            return Message.parse_raw(message)
@@ -0,0 +1,82 @@
+from typing import List, Optional, Sequence, Union
+
+from config.config import OUTBOUND_PROTOCOLS_ENABLED
+from service.chat.message import Message, MessageEventType, MessageType
+
+# WebSocket 연결 시 Sec-WebSocket-Protocol(또는 ?protocol=)로 선택하는 전송 형식
+# - 선택하지 않거나 chat.v1.json: 기존처럼 메시지마다 JSON text frame 하나
+#   chat.v1.json은 항상 지원하므로, subprotocol을 보내야 하는 클라이언트는 대체 형식으로 함께 요청할 수 있음
+# - chat.v2.json: 짧은 시간 안에 나온 메시지를 JSON 배열 text frame 하나로 묶음
+# - chat.v2.msgpack: 묶은 메시지를 msgpack binary frame으로 보냄
+#   메시지는 [user_id, username, message, message_type 코드, event_type 코드, sent_at(epoch ms)] 배열
+# 클라이언트가 보내는 메시지는 모든 형식에서 기존 JSON text 입니다.
+PROTOCOL_JSON = "chat.v1.json"
+PROTOCOL_JSON_BATCH = "chat.v2.json"
+PROTOCOL_MSGPACK_BATCH = "chat.v2.msgpack"
+
+MESSAGE_TYPE_CODES = {None: 0, MessageType.USER_MESSAGE: 1, MessageType.SYSTEM_MESSAGE: 2}
+EVENT_TYPE_CODES = {None: 0, MessageEventType.USER_JOINED: 1, MessageEventType.USER_LEFT: 2}
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def supported_protocols() -> List[str]:
+    protocols = [PROTOCOL_JSON]
+    protocols.extend(
+        protocol for protocol in OUTBOUND_PROTOCOLS_ENABLED
+        if protocol not in (PROTOCOL_JSON, PROTOCOL_MSGPACK_BATCH)
+    )
+    # msgpack이 설치되어 있을 때만 binary 형식을 제공
+    if PROTOCOL_MSGPACK_BATCH in OUTBOUND_PROTOCOLS_ENABLED and msgpack is not None:
+        protocols.append(PROTOCOL_MSGPACK_BATCH)
+    return protocols
+
+
+# 클라이언트가 요청한 순서대로 지원하는 첫 번째 형식을 선택합니다. 없으면 None (기존 JSON)
+# 묶지 않는 형식인지는 is_batch_protocol로 확인합니다.
+def negotiate_protocol(requested: Sequence[str]) -> Optional[str]:
+    supported = supported_protocols()
+    for protocol in requested:
+        if protocol in supported:
+            return protocol
+    return None
+
+
+def is_batch_protocol(protocol: Optional[str]) -> bool:
+    return protocol is not None and protocol != PROTOCOL_JSON
+
+
+# 대기열에 들어가는 메시지. 같은 broadcast를 받는 모든 연결이 공유하므로 형식별 직렬화는 한 번만 수행됩니다.
+class OutboundMessage:
+    __slots__ = ("frame", "_message", "_packed")
+
+    def __init__(self, frame: str, message: Optional[Message] = None):
+        self.frame = frame
+        self._message = message
+        self._packed = None
+
+    def packed(self) -> list:
+        if self._packed is None:
+            message = self._message
+            if message is None:
+                # 메시지 로그에서 재생한 frame은 직렬화된 JSON만 있음
+                message = Message.model_validate_json(self.frame)
+            self._packed = [
+                message.user_id,
+                message.username,
+                message.message,
+                MESSAGE_TYPE_CODES[message.message_type],
+                EVENT_TYPE_CODES[message.event_type],
+                int(message.sent_at.timestamp() * 1000) if message.sent_at is not None else None,
+            ]
+        return self._packed
+
+
+def encode_batch(protocol: str, messages: List[OutboundMessage]) -> Union[str, bytes]:
+    if protocol == PROTOCOL_MSGPACK_BATCH:
+        return msgpack.packb([message.packed() for message in messages])
+    # 이미 직렬화된 JSON frame을 다시 파싱하지 않고 이어 붙임
+    return "[" + ",".join(message.frame for message in messages) + "]"
@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set, Tuple
+
+from config.config import EMOTION_ANALYSIS_MIN_INTERVAL_SECONDS
+from core.metrics import errors_total
+from core.token_bucket import TokenBucket
+from service.chat.chat_room_manager import ChatRoom, ChatRoomManager
+
+
+# 채팅방마다 다음 감정 분석 시각을 heap으로 관리하는 scheduler
+# - 새 채팅방의 첫 분석 시각을 주기 안에서 무작위로 정해 분석 시점을 분산
+# - 마지막 분석 이후 새 메시지가 없는 채팅방은 건너뜀
+# - 채팅방별 주기(ChatRoom.analysis_interval_seconds)와 초당 추론 예산을 지원
+class RoomAnalysisScheduler:
+    def __init__(
+            self,
+            chat_room_manager: ChatRoomManager,
+            analyze: Callable[[ChatRoom], Awaitable[None]],
+            should_analyze: Callable[[ChatRoom], bool],
+            interval_seconds: float,
+            inference_budget_per_second: float,
+            consumes_inference: bool,
+            min_interval_seconds: float = EMOTION_ANALYSIS_MIN_INTERVAL_SECONDS,
+            lag_sample_size: int = 1024,
+    ):
+        self._chat_room_manager = chat_room_manager
+        self._analyze = analyze
+        self._should_analyze = should_analyze
+        self._interval_seconds = interval_seconds
+        self._min_interval_seconds = min_interval_seconds
+        self._budget = TokenBucket(rate=inference_budget_per_second, capacity=inference_budget_per_second)
+        self._consumes_inference = consumes_inference
+
+        # (다음 분석 시각, 순번, room_id)
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._scheduled_room_ids: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._pending_tasks: Set[asyncio.Task] = set()
+
+        self.dispatched_count = 0
+        self.skipped_count = 0
+        self.budget_wait_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.recent_lag_seconds: Deque[float] = deque(maxlen=lag_sample_size)
+
+        chat_room_manager.room_listeners.append(self._on_room_event)
+
+    def start(self):
+        for chat_room in self._chat_room_manager.list_chat_rooms():
+            self.schedule_room(chat_room.room_id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule_room(self, room_id: str):
+        if room_id in self._scheduled_room_ids:
+            return
+        self._scheduled_room_ids.add(room_id)
+        # 첫 분석 시각을 주기 안에서 무작위로 정해 채팅방들의 분석 시점이 한 번에 몰리지 않도록 함
+        self._push(room_id, time.monotonic() + random.uniform(0, self._interval_seconds))
+
+    def _on_room_event(self, event: str, room_id: str):
+        if event == "created":
+            self.schedule_room(room_id)
+        elif event == "deleted":
+            # heap에 남은 항목은 꺼낼 때 무시됨
+            self._scheduled_room_ids.discard(room_id)
+
+    def _push(self, room_id: str, deadline: float):
+        if len(self._heap) == 0 or deadline < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (deadline, next(self._sequence), room_id))
+
+    async def _run(self):
+        while True:
+            try:
+                await self._run_next()
+            except Exception as e:
+                print(e)
+                errors_total.inc("analysis_scheduler")
+
+    async def _run_next(self):
+        if len(self._heap) == 0:
+            await self._wait(None)
+            return
+
+        deadline, _, room_id = self._heap[0]
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            await self._wait(delay)
+            return
+
+        heapq.heappop(self._heap)
+        chat_room = self._chat_room_manager.get_chat_room(room_id)
+        if chat_room is None or room_id not in self._scheduled_room_ids:
+            self._scheduled_room_ids.discard(room_id)
+            return
+
+        now = time.monotonic()
+        lag = now - deadline
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        self.recent_lag_seconds.append(lag)
+
+        # 분석이 밀렸다면 밀린 횟수만큼 몰아서 실행하지 않고 지금부터 다시 주기를 계산
+        # 너무 짧은 주기로 이벤트 루프를 계속 점유하지 않도록 최소 주기를 보장
+        interval = max(chat_room.analysis_interval_seconds or self._interval_seconds, self._min_interval_seconds)
+        next_deadline = deadline + interval
+        self._push(room_id, next_deadline if next_deadline > now else now + interval)
+
+        # 다른 worker가 담당하거나 모델이 준비되지 않은 채팅방은 새 메시지 여부를 유지한 채로 넘어감
+        if not self._should_analyze(chat_room):
+            return
+
+        # 메시지가 한 번도 없던 채팅방은 안내 메시지만 보내므로 추론 비용 없이 실행
+        if chat_room.message_version > 0 and not chat_room.has_new_messages():
+            self.skipped_count += 1
+            return
+
+        if self._consumes_inference and chat_room.message_version > 0:
+            self.budget_wait_seconds += await self._budget.acquire()
+
+        chat_room.analyzed_message_version = chat_room.message_version
+        self.dispatched_count += 1
+        task = asyncio.create_task(self._analyze_room(chat_room))
+        self._pending_tasks.add(task)
+        task.add_done_callback(self._pending_tasks.discard)
+
+    async def _analyze_room(self, chat_room: ChatRoom):
+        try:
+            await self._analyze(chat_room)
+        except Exception as e:
+            print(e)
+            errors_total.inc("room_emotion_analysis")
+
+    async def _wait(self, timeout: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def get_stats(self) -> dict:
+        recent = sorted(self.recent_lag_seconds)
+        return {
+            "scheduled_room_count": len(self._scheduled_room_ids),
+            "dispatched_count": self.dispatched_count,
+            "skipped_count": self.skipped_count,
+            "pending_analysis_count": len(self._pending_tasks),
+            "budget_wait_seconds": self.budget_wait_seconds,
+            "lag_p50_seconds": recent[len(recent) // 2] if recent else 0.0,
+            "lag_p99_seconds": recent[min(len(recent) - 1, int(len(recent) * 0.99))] if recent else 0.0,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class ClassificationCache:
+    def __init__(self, max_size: int, ttl_seconds: float, eviction_policy: str = "lru"):
+        if eviction_policy not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy: {eviction_policy}")
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.eviction_policy = eviction_policy
+        # 키 -> (값, 만료 시각). 순서가 제거 우선순위가 됨
+        self._entries: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        # executor thread에서 동기 분류를 호출할 수도 있으므로 lock으로 보호
+        self._lock = threading.Lock()
+
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.expired_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        # 앞뒤 공백과 연속된 공백 차이는 같은 입력으로 취급
+        normalized = " ".join(text.split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, text: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        key = self.make_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.miss_count += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expired_count += 1
+                self.miss_count += 1
+                return None
+
+            if self.eviction_policy == "lru":
+                self._entries.move_to_end(key)
+            self.hit_count += 1
+            return value
+
+    def put(self, text: str, value: Any):
+        if not self.enabled:
+            return
+
+        key = self.make_key(text)
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.eviction_count += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self) -> dict:
+        lookup_count = self.hit_count + self.miss_count
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "eviction_policy": self.eviction_policy,
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "hit_ratio": self.hit_count / lookup_count if lookup_count else 0.0,
+            "eviction_count": self.eviction_count,
+            "expired_count": self.expired_count,
+        }
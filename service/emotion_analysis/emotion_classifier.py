@@ -1,8 +1,284 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from typing import Dict, List, Optional
+
+from config.config import (
+    EMOTION_CACHE_EVICTION_POLICY,
+    EMOTION_CACHE_MAX_SIZE,
+    EMOTION_CACHE_TTL_SECONDS,
+    EMOTION_CONTEXT_CACHE_MAX_SIZE,
+    EMOTION_EXECUTOR_MAX_WORKERS,
+    EMOTION_EXECUTOR_TYPE,
+    EMOTION_INFERENCE_TIMEOUT_SECONDS,
+    EMOTION_MAX_CONCURRENT_INFERENCES,
+    INFERENCE_EXIT_LAYER,
+)
+from core.metrics import inference_tier_total
+from service.emotion_analysis.classification_cache import ClassificationCache
+from service.emotion_analysis.emotion_labels import label_from_logits
+from service.emotion_analysis.load_controller import TIER_EARLY_EXIT, TIER_FULL, InferenceLoadController
+
+
+class ModelLoadState(Enum):
+    NOT_LOADED = "NOT_LOADED"
+    LOADING = "LOADING"
+    READY = "READY"
+    # 원격 추론 서버가 제한 시간 안에 준비되지 않았지만 요청은 시도하는 상태
+    DEGRADED = "DEGRADED"
+    FAILED = "FAILED"
+
+
+class ModelNotReadyException(Exception):
+    def __init__(self, state: ModelLoadState):
+        self.message = f"Emotion model is not ready: {state.value}"
+
+
+# 추론 서버에 연결하지 못해 분류 결과가 없음. 호출한 쪽은 감정 상태를 갱신하지 않고 건너뜁니다.
+class InferenceUnavailableException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+
+# process worker에서 실행되는 함수는 pickle 가능해야 하므로 모듈 레벨에 둡니다.
+# worker 프로세스에서 처음 호출될 때 inference 모듈이 import 되면서 모델이 한 번 로드됩니다.
+# 로드한 모델에서 early exit을 할 수 있는 encoder layer 번호들을 반환
+def _load_in_process() -> List[int]:
+    from service.emotion_analysis.inference import early_exit_layers
+    return early_exit_layers()
+
+
+def _classify_logits_in_process(messages: List[str], exit_layer: Optional[int] = None) -> List[List[float]]:
+    from service.emotion_analysis.inference import predict_emotion_logits
+    return predict_emotion_logits(messages, exit_layer=exit_layer)
+
+
+def _classify_context_logits_in_process(contexts: List[List[str]],
+                                        exit_layer: Optional[int] = None) -> List[List[float]]:
+    from service.emotion_analysis.inference import predict_context_logits
+    return predict_context_logits(contexts, exit_layer=exit_layer)
+
+
+# 메시지 목록을 context 캐시 키로 쓰기 위한 문자열. 캐시는 공백을 정규화하므로 공백이 아닌 \x00으로 구분합니다.
+def context_cache_text(messages: List[str]) -> str:
+    return "\x00".join(messages)
+
+
+def create_executor(executor_type: str, max_workers: int) -> Executor:
+    if executor_type == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="emotion-inference")
+    if executor_type == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown executor type: {executor_type}")
+
+
 class EmotionClassifier:
 
-    def __init__(self):
-        from service.emotion_analysis.inference import predict_emotion
-        self._classifier = predict_emotion
+    def __init__(
+            self,
+            executor_type: str = EMOTION_EXECUTOR_TYPE,
+            max_workers: int = EMOTION_EXECUTOR_MAX_WORKERS,
+            max_concurrency: int = EMOTION_MAX_CONCURRENT_INFERENCES,
+            timeout_seconds: float = EMOTION_INFERENCE_TIMEOUT_SECONDS,
+            cache: Optional[ClassificationCache] = None,
+            exit_layer: int = INFERENCE_EXIT_LAYER,
+    ):
+        self._executor_type = executor_type
+        self._max_workers = max_workers
+        self._max_concurrency = max_concurrency
+        self._timeout_seconds = timeout_seconds
+        self._executor = create_executor(executor_type, max_workers)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._cache = cache if cache is not None else ClassificationCache(
+            max_size=EMOTION_CACHE_MAX_SIZE,
+            ttl_seconds=EMOTION_CACHE_TTL_SECONDS,
+            eviction_policy=EMOTION_CACHE_EVICTION_POLICY,
+        )
+        # context 분류 결과는 문장 캐시의 항목을 밀어내지 않도록 따로 보관
+        self._context_cache = ClassificationCache(
+            max_size=EMOTION_CONTEXT_CACHE_MAX_SIZE,
+            ttl_seconds=EMOTION_CACHE_TTL_SECONDS,
+            eviction_policy=EMOTION_CACHE_EVICTION_POLICY,
+        )
+
+        # 모델 로드는 서버 시작을 막지 않도록 load_async()로 나중에 수행합니다.
+        self._batch_classifier = None
+        self._context_classifier = None
+        self._exit_layer = exit_layer
+        # 과부하일 때 early exit으로 추론하고, 분석할 채팅방을 줄이도록 알려줌
+        self.load_controller = InferenceLoadController()
+        self.load_state = ModelLoadState.NOT_LOADED
+        self.load_seconds: Optional[float] = None
+        self.load_error: Optional[str] = None
+
+    def load(self):
+        if self.load_state in (ModelLoadState.LOADING, ModelLoadState.READY):
+            return
+
+        self.load_state = ModelLoadState.LOADING
+        started_at = time.monotonic()
+        try:
+            if self._executor_type == "process":
+                # 모델은 worker 프로세스에서만 로드하고 현재 프로세스에는 올리지 않음
+                futures = [self._executor.submit(_load_in_process) for _ in range(self._max_workers)]
+                exit_layers = [future.result() for future in futures][0]
+                self._batch_classifier = _classify_logits_in_process
+                self._context_classifier = _classify_context_logits_in_process
+            else:
+                from service.emotion_analysis.inference import (
+                    early_exit_layers,
+                    predict_context_logits,
+                    predict_emotion_logits,
+                )
+                exit_layers = early_exit_layers()
+                self._batch_classifier = predict_emotion_logits
+                self._context_classifier = predict_context_logits
+            self.load_controller.early_exit_available = self._exit_layer in exit_layers
+        except Exception as e:
+            self.load_state = ModelLoadState.FAILED
+            self.load_error = str(e)
+            raise
+
+        self.load_seconds = time.monotonic() - started_at
+        self.load_state = ModelLoadState.READY
+
+    async def load_async(self):
+        # tokenizer, BertModel, 체크포인트 로드는 오래 걸리므로 이벤트 루프 밖에서 수행
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+
+    def is_ready(self) -> bool:
+        return self.load_state == ModelLoadState.READY
+
+    def get_load_status(self) -> dict:
+        return {
+            "state": self.load_state.value,
+            "load_seconds": self.load_seconds,
+            "error": self.load_error,
+        }
+
+    def label_from_logits(self, logits: List[float]) -> str:
+        return label_from_logits(logits)
 
     def classify(self, message: str) -> str:
-        return self._classifier(message)
+        return self.classify_batch([message])[0]
+
+    def classify_batch(self, messages: List[str]) -> List[str]:
+        return [self.label_from_logits(logits) for logits in self.classify_logits_batch(messages)]
+
+    async def classify_async(self, message: str) -> str:
+        return (await self.classify_batch_async([message]))[0]
+
+    async def classify_batch_async(self, messages: List[str]) -> List[str]:
+        return [self.label_from_logits(logits) for logits in await self.classify_logits_batch_async(messages)]
+
+    def classify_logits_batch(self, messages: List[str]) -> List[List[float]]:
+        results, missing_messages = self._lookup_cache(messages)
+        if len(missing_messages) == 0:
+            return results
+
+        if not self.is_ready():
+            raise ModelNotReadyException(self.load_state)
+
+        if self._executor_type == "process":
+            logits = self._executor.submit(_classify_logits_in_process, missing_messages).result()
+        else:
+            logits = self._batch_classifier(missing_messages)
+        return self._fill_results(messages, results, missing_messages, logits)
+
+    async def classify_logits_batch_async(self, messages: List[str]) -> List[List[float]]:
+        results, missing_messages = self._lookup_cache(messages)
+        if len(missing_messages) == 0:
+            return results
+
+        exit_layer = self._select_exit_layer()
+        logits = await self._run_inference(self._batch_classifier, missing_messages, exit_layer)
+        return self._fill_results(messages, results, missing_messages, logits, cache_results=exit_layer is None)
+
+    # 유저의 최근 메시지 목록(시간 순서)마다 토큰 수가 제한된 context를 만들어 분류합니다.
+    async def classify_context_logits_batch_async(self, contexts: List[List[str]]) -> List[List[float]]:
+        texts = [context_cache_text(messages) for messages in contexts]
+        context_by_text = dict(zip(texts, contexts))
+        results, missing_texts = self._lookup_cache(texts, self._context_cache)
+        if len(missing_texts) == 0:
+            return results
+
+        exit_layer = self._select_exit_layer()
+        logits = await self._run_inference(
+            self._context_classifier, [context_by_text[text] for text in missing_texts], exit_layer
+        )
+        return self._fill_results(texts, results, missing_texts, logits, cache_results=exit_layer is None,
+                                  cache=self._context_cache)
+
+    def _select_exit_layer(self) -> Optional[int]:
+        return self._exit_layer if self.load_controller.use_early_exit() else None
+
+    async def _run_inference(self, classifier, inputs: list, exit_layer: Optional[int] = None) -> List[List[float]]:
+        if not self.is_ready():
+            raise ModelNotReadyException(self.load_state)
+
+        if exit_layer is not None:
+            classifier = functools.partial(classifier, exit_layer=exit_layer)
+        inference_tier_total.inc(TIER_FULL if exit_layer is None else TIER_EARLY_EXIT, amount=len(inputs))
+        started_at = time.monotonic()
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        loop = asyncio.get_running_loop()
+
+        # 동시에 실행되는 추론 수를 제한해 executor 대기열이 무한히 쌓이지 않도록 함
+        # timeout이나 취소로 기다림을 멈춰도 executor의 작업은 계속 실행되므로, 작업이 끝날 때 슬롯을 반환
+        await self._semaphore.acquire()
+        try:
+            future = loop.run_in_executor(self._executor, classifier, inputs)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(self._release_inference_slot)
+        logits = await asyncio.wait_for(asyncio.shield(future), timeout=self._timeout_seconds)
+        self.load_controller.observe(time.monotonic() - started_at)
+        return logits
+
+    def _release_inference_slot(self, future: asyncio.Future):
+        self._semaphore.release()
+        # 기다리던 쪽이 timeout으로 떠난 뒤 발생한 예외는 여기서 확인한 것으로 처리
+        if not future.cancelled():
+            future.exception()
+
+    # 캐시에 있는 logits를 채우고, 모델로 추론해야 하는 문장은 중복 없이 모아서 반환
+    def _lookup_cache(self, messages: List[str], cache: Optional[ClassificationCache] = None):
+        if cache is None:
+            cache = self._cache
+        results: List[Optional[List[float]]] = []
+        missing_messages: Dict[str, None] = {}
+        for message in messages:
+            logits = cache.get(message)
+            results.append(logits)
+            if logits is None:
+                missing_messages[message] = None
+        return results, list(missing_messages)
+
+    # early exit 결과는 부하가 줄어든 뒤에도 재사용되지 않도록 캐시에 넣지 않음
+    def _fill_results(self, messages: List[str], results: List[Optional[List[float]]], missing_messages: List[str],
+                      computed_logits: List[List[float]], cache_results: bool = True,
+                      cache: Optional[ClassificationCache] = None) -> List[List[float]]:
+        if cache is None:
+            cache = self._cache
+        logits_by_message: Dict[str, List[float]] = dict(zip(missing_messages, computed_logits))
+        if cache_results:
+            for message, logits in logits_by_message.items():
+                cache.put(message, logits)
+        return [
+            logits if logits is not None else logits_by_message[message]
+            for message, logits in zip(messages, results)
+        ]
+
+    def get_cache_stats(self) -> dict:
+        stats = self._cache.get_stats()
+        stats["context_cache"] = self._context_cache.get_stats()
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,22 @@
+from typing import Sequence
+
+emotion_keyword_map = {
+    0: "불안이",
+    1: "당황이",
+    2: "분노가",
+    3: "슬픔이",
+    4: "중립이",
+    5: "행복이",
+    6: "혐오가"
+}
+
+NUM_EMOTION_CLASSES = len(emotion_keyword_map)
+
+
+def label_index_from_logits(logits: Sequence[float]) -> int:
+    return max(range(len(logits)), key=lambda index: logits[index])
+
+
+def label_from_logits(logits: Sequence[float]) -> str:
+    predicted_situation_label = label_index_from_logits(logits)
+    return emotion_keyword_map.get(predicted_situation_label, "알 수 없는 감정")
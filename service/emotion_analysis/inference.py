@@ -1,3 +1,7 @@
+import os
+import time
+from typing import List, Optional
+
 import numpy as np
 
 np.bool = np.bool_
@@ -8,10 +12,32 @@ from kobert_tokenizer import KoBERTTokenizer
 from transformers import BertModel
 from torch.utils.data import Dataset
 
+from config.config import (
+    EMOTION_CONTEXT_MAX_CHUNKS,
+    INFERENCE_BUCKET_SIZE,
+    INFERENCE_DYNAMIC_PADDING,
+    INFERENCE_ENGINE,
+    INFERENCE_EXIT_HEADS_PATH,
+    INFERENCE_NUM_INTEROP_THREADS,
+    INFERENCE_NUM_THREADS,
+)
+from core.metrics import context_tokens, inference_batch_size, inference_seconds
+from service.emotion_analysis.emotion_labels import emotion_keyword_map
+
 # Torch GPU 설정
 device_type = 'cuda' if torch.cuda.is_available() else 'cpu'
 device = torch.device(device_type)
 
+# CPU 노드에서 추론 스레드 수 조정
+if INFERENCE_NUM_THREADS > 0:
+    torch.set_num_threads(INFERENCE_NUM_THREADS)
+if INFERENCE_NUM_INTEROP_THREADS > 0:
+    try:
+        torch.set_num_interop_threads(INFERENCE_NUM_INTEROP_THREADS)
+    except RuntimeError as e:
+        # 이미 병렬 작업이 시작된 뒤에는 inter-op 스레드 수를 바꿀 수 없음
+        print(e)
+
 tokenizer = KoBERTTokenizer.from_pretrained('skt/kobert-base-v1')
 
 
@@ -92,6 +118,87 @@ class BERTSentenceTransform:
             np.array(segment_ids, dtype='int32')
 
 
+# 한 번만 만들어두고 여러 문장을 한 번에 인코딩하는 tokenization 단계
+# BERTSentenceTransform(pair=False)과 같은 id를 만들지만, 문장마다 객체와 배열을 새로 만들지 않습니다.
+class BatchSentenceEncoder:
+
+    def __init__(self, tokenizer, vocab, max_seq_length):
+        self._tokenizer = tokenizer
+        self._max_seq_length = max_seq_length
+        self._cls_id, self._sep_id = tokenizer.convert_tokens_to_ids([vocab.cls_token, vocab.sep_token])
+        self.pad_id = vocab[vocab.padding_token]
+        # tokenizers 기반 fast tokenizer라면 배치 단위로 한 번에 토큰화
+        self._is_fast = getattr(tokenizer, "is_fast", False)
+
+    # [CLS], [SEP]을 포함한 문장별 토큰 id 목록
+    def encode_ids(self, sentences: List[str]) -> List[List[int]]:
+        # [CLS] 및 [SEP]에 해당하는 "- 2" 고려
+        max_tokens = self._max_seq_length - 2
+
+        if self._is_fast:
+            token_id_lists = self._tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        else:
+            # 토큰 -> id 변환은 배치 전체를 모아서 한 번만 호출
+            token_lists = [self._tokenizer.tokenize(sentence)[:max_tokens] for sentence in sentences]
+            flat_ids = self._tokenizer.convert_tokens_to_ids([token for tokens in token_lists for token in tokens])
+            token_id_lists = []
+            offset = 0
+            for tokens in token_lists:
+                token_id_lists.append(flat_ids[offset:offset + len(tokens)])
+                offset += len(tokens)
+
+        return [[self._cls_id, *token_ids[:max_tokens], self._sep_id] for token_ids in token_id_lists]
+
+    # 한 문장의 토큰 id ([CLS], [SEP] 없이 자르지 않은 그대로)
+    def _tokenize_ids(self, sentence: str) -> List[int]:
+        if self._is_fast:
+            return self._tokenizer(sentence, add_special_tokens=False)["input_ids"]
+        return self._tokenizer.convert_tokens_to_ids(self._tokenizer.tokenize(sentence))
+
+    # 시간 순서의 메시지들을 최근 메시지부터 거꾸로 토큰화해서 max_chunks * (max_seq_length - 2)개의 토큰을 채웁니다.
+    # 토큰을 다 채우면 더 오래된 메시지는 토큰화하지 않고, 남은 자리보다 긴 메시지는 최근 쪽 토큰만 사용합니다.
+    # 채운 토큰은 시간 순서대로 이어 붙인 뒤 [CLS], [SEP]을 포함한 chunk로 나눕니다.
+    def encode_context(self, messages: List[str], max_chunks: int) -> List[List[int]]:
+        chunk_tokens = self._max_seq_length - 2
+        remaining = chunk_tokens * max_chunks
+
+        collected: List[List[int]] = []
+        for message in reversed(messages):
+            if remaining <= 0:
+                break
+            token_ids = self._tokenize_ids(message)
+            if len(token_ids) > remaining:
+                token_ids = token_ids[-remaining:]
+            collected.append(token_ids)
+            remaining -= len(token_ids)
+        context_ids = [token_id for token_ids in reversed(collected) for token_id in token_ids]
+
+        # 가장 최근 토큰들이 꽉 찬 chunk에 들어가도록 뒤에서부터 나누고, 남는 앞부분이 짧은 chunk가 됨
+        chunks = [
+            [self._cls_id, *context_ids[max(0, end - chunk_tokens):end], self._sep_id]
+            for end in range(len(context_ids), 0, -chunk_tokens)
+        ]
+        chunks.reverse()
+        return chunks if chunks else [[self._cls_id, self._sep_id]]
+
+    # 토큰 id 목록을 seq_length까지 패딩해서 (token ids, 유효 길이, segment ids) 배열로 반환
+    def pad(self, token_id_lists: List[List[int]], seq_length: Optional[int] = None):
+        valid_length = np.fromiter((len(token_ids) for token_ids in token_id_lists), dtype=np.int32,
+                                   count=len(token_id_lists))
+        if seq_length is None:
+            seq_length = int(valid_length.max()) if len(token_id_lists) else 0
+
+        input_token_ids = np.full((len(token_id_lists), seq_length), self.pad_id, dtype=np.int32)
+        for row, token_ids in enumerate(token_id_lists):
+            input_token_ids[row, :len(token_ids)] = token_ids
+        # 단일 문장이므로 segment id는 모두 0
+        input_segment_ids = np.zeros((len(token_id_lists), seq_length), dtype=np.int32)
+        return input_token_ids, valid_length, input_segment_ids
+
+    def encode(self, sentences: List[str], seq_length: Optional[int] = None):
+        return self.pad(self.encode_ids(sentences), seq_length)
+
+
 class BERTClassifier(nn.Module):
     def __init__(self,
                  bert,
@@ -107,10 +214,16 @@ class BERTClassifier(nn.Module):
         if dr_rate:
             self.dropout = nn.Dropout(p=dr_rate)
 
+        # encoder layer 번호 -> 해당 layer의 [CLS] hidden state로 분류하는 head
+        # 본 모델은 고정한 채 오프라인으로 학습 (scripts/evaluate_inference_tiers.py)
+        self.hidden_size = hidden_size
+        self.num_classes = num_classes
+        self.exit_heads = nn.ModuleDict()
+
     def gen_attention_mask(self, token_ids, valid_length):
-        attention_mask = torch.zeros_like(token_ids)
-        for i, v in enumerate(valid_length):
-            attention_mask[i][:v] = 1
+        # 각 위치가 문장의 유효 길이보다 앞에 있는지를 한 번에 비교해서 마스크 생성
+        positions = torch.arange(token_ids.size(1), device=token_ids.device)
+        attention_mask = positions.unsqueeze(0) < valid_length.to(token_ids.device).unsqueeze(1)
         return attention_mask.float()
 
     def forward(self, token_ids, valid_length, segment_ids):
@@ -122,6 +235,28 @@ class BERTClassifier(nn.Module):
             out = self.dropout(pooler)
         return self.classifier(out)
 
+    # 앞쪽 exit_layer개의 encoder layer만 계산하고 exit head로 분류
+    def forward_early_exit(self, token_ids, valid_length, segment_ids, exit_layer: int):
+        attention_mask = self.gen_attention_mask(token_ids, valid_length)
+        extended_attention_mask = self.bert.get_extended_attention_mask(attention_mask, token_ids.shape)
+
+        hidden_states = self.bert.embeddings(input_ids=token_ids, token_type_ids=segment_ids.long())
+        for layer in self.bert.encoder.layer[:exit_layer]:
+            hidden_states = layer(hidden_states, attention_mask=extended_attention_mask)[0]
+        return self.exit_heads[str(exit_layer)](hidden_states[:, 0])
+
+    def add_exit_head(self, exit_layer: int) -> nn.Linear:
+        head = nn.Linear(self.hidden_size, self.num_classes).to(self.classifier.weight.device)
+        self.exit_heads[str(exit_layer)] = head
+        return head
+
+    # torch.save(model.exit_heads.state_dict())로 저장한 파일을 불러옴
+    def load_exit_heads(self, path: str):
+        state_dict = torch.load(path, map_location=self.classifier.weight.device)
+        for exit_layer in sorted({int(key.split(".")[0]) for key in state_dict}):
+            self.add_exit_head(exit_layer)
+        self.exit_heads.load_state_dict(state_dict)
+
 
 class BERTDataset(Dataset):
     def __init__(self, dataset, sent_idx, label_idx, bert_tokenizer, vocab, max_len,
@@ -138,46 +273,161 @@ class BERTDataset(Dataset):
         return (len(self.labels))
 
 
-emotion_keyword_map = {
-    0: "불안이",
-    1: "당황이",
-    2: "분노가",
-    3: "슬픔이",
-    4: "중립이",
-    5: "행복이",
-    6: "혐오가"
-}
+# 하이퍼 파라미터 설정
+max_len = 64
 
-# 저장한 모델 불러오기
-loaded_model = BERTClassifier(bertmodel, dr_rate=0.5).to(device)
 checkpoint_path = './saved_model.pth'  # 모델 체크포인트 파일 경로
-state_dict = torch.load(checkpoint_path, map_location=device)
-loaded_model.load_state_dict(state_dict, strict=False)
-loaded_model.eval()
+INFERENCE_ENGINES = ("eager", "quantized", "torchscript")
 
-# 하이퍼 파라미터 설정
-max_len = 64
 
+sentence_encoder = BatchSentenceEncoder(tokenizer, vocab=vocab, max_seq_length=max_len)
 
-def predict_emotion(input_sentence: str):
-    # 입력 문장을 BERT 모델의 입력 형식으로 변환
-    transform = BERTSentenceTransform(tokenizer, max_seq_length=max_len, vocab=vocab, pad=True, pair=False)
-    input_data = transform([input_sentence])
 
-    # 토큰 ID, 유효 길이, 토큰 타입 ID를 추출
-    input_token_ids, input_valid_length, input_segment_ids = input_data
+# 저장한 모델 불러오기
+def build_inference_model(engine: str = INFERENCE_ENGINE, exit_heads_path: Optional[str] = INFERENCE_EXIT_HEADS_PATH):
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference engine: {engine}")
+
+    model = BERTClassifier(bertmodel, dr_rate=0.5).to(device)
+    state_dict = torch.load(checkpoint_path, map_location=device)
+    model.load_state_dict(state_dict, strict=False)
+    if exit_heads_path is not None and os.path.exists(exit_heads_path):
+        model.load_exit_heads(exit_heads_path)
+    model.eval()
+
+    if engine == "quantized":
+        # Linear 레이어 가중치를 int8로 양자화하고 activation은 실행 시점에 양자화
+        return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+    if engine == "torchscript":
+        # max_len 길이의 예시 입력으로 trace 하므로 추론 시에도 max_len까지 패딩해야 함
+        example_inputs = _to_tensors(*sentence_encoder.encode(["안녕하세요"], seq_length=max_len))
+        with torch.no_grad():
+            traced_model = torch.jit.trace(model, example_inputs, check_trace=False)
+        return torch.jit.freeze(traced_model)
 
-    # 텐서로 변환
-    input_token_ids = torch.tensor([input_token_ids], dtype=torch.long).to(device)
-    input_valid_length = torch.tensor(input_valid_length, dtype=torch.long).to(device)  # 스칼라 값으로 전달
-    input_segment_ids = torch.tensor([input_segment_ids], dtype=torch.long).to(device)
+    return model
+
+
+def uses_dynamic_padding(engine: str = INFERENCE_ENGINE) -> bool:
+    return INFERENCE_DYNAMIC_PADDING and engine != "torchscript"
+
+
+# exit head가 있는 encoder layer 번호들. torchscript 모델은 forward만 있으므로 early exit을 지원하지 않음
+def early_exit_layers(model=None) -> List[int]:
+    if model is None:
+        model = loaded_model
+    if not isinstance(model, BERTClassifier):
+        return []
+    return sorted(int(exit_layer) for exit_layer in model.exit_heads.keys())
+
+
+def predict_emotion(input_sentence: str):
+    return predict_emotions([input_sentence])[0]
+
+
+def _to_tensors(input_token_ids, input_valid_length, input_segment_ids):
+    return (
+        torch.from_numpy(input_token_ids).long().to(device),
+        torch.from_numpy(input_valid_length).long().to(device),
+        torch.from_numpy(input_segment_ids).long().to(device),
+    )
+
+
+def predict_emotions(input_sentences: List[str], model=None, dynamic_padding: Optional[bool] = None) -> List[str]:
+    return [
+        emotion_keyword_map.get(int(np.argmax(logits)), "알 수 없는 감정")
+        for logits in predict_emotion_logits(input_sentences, model=model, dynamic_padding=dynamic_padding)
+    ]
+
+
+# exit_layer를 지정하면 해당 layer까지만 계산하는 early exit으로 추론 (지원하지 않는 모델이면 전체 layer)
+def predict_emotion_logits(input_sentences: List[str], model=None, dynamic_padding: Optional[bool] = None,
+                           exit_layer: Optional[int] = None) -> List[List[float]]:
+    if len(input_sentences) == 0:
+        return []
+
+    started_at = time.perf_counter()
+
+    # 입력 문장들을 한 번에 토큰화 (패딩은 버킷별로 수행)
+    token_id_lists = sentence_encoder.encode_ids(input_sentences)
+    inference_seconds.observe(time.perf_counter() - started_at, "tokenize")
+
+    predicted_logits = _predict_token_id_lists(token_id_lists, model, dynamic_padding, exit_layer)
+    inference_seconds.observe(time.perf_counter() - started_at, "total")
+    return predicted_logits
+
+
+# 채팅방 유저의 최근 메시지 목록(시간 순서)마다 하나의 logits를 반환합니다.
+# 모든 context의 chunk를 한 번에 추론하고, context별로 chunk logits를 토큰 수로 가중 평균합니다.
+def predict_context_logits(contexts: List[List[str]], max_chunks: int = EMOTION_CONTEXT_MAX_CHUNKS, model=None,
+                           dynamic_padding: Optional[bool] = None,
+                           exit_layer: Optional[int] = None) -> List[List[float]]:
+    if len(contexts) == 0:
+        return []
+
+    started_at = time.perf_counter()
+
+    chunk_lists = [sentence_encoder.encode_context(messages, max_chunks) for messages in contexts]
+    inference_seconds.observe(time.perf_counter() - started_at, "tokenize")
+
+    chunk_logits = _predict_token_id_lists(
+        [chunk for chunks in chunk_lists for chunk in chunks], model, dynamic_padding, exit_layer
+    )
+
+    pooled_logits: List[List[float]] = []
+    offset = 0
+    for chunks in chunk_lists:
+        # [CLS], [SEP]을 뺀 토큰 수. 빈 context도 한 번은 반영되도록 최소 1
+        weights = np.array([max(len(chunk) - 2, 1) for chunk in chunks], dtype=np.float32)
+        context_tokens.observe(float(weights.sum()))
+        logits = np.asarray(chunk_logits[offset:offset + len(chunks)], dtype=np.float32)
+        pooled_logits.append((weights @ logits / weights.sum()).tolist())
+        offset += len(chunks)
+
+    inference_seconds.observe(time.perf_counter() - started_at, "total")
+    return pooled_logits
+
+
+def _predict_token_id_lists(token_id_lists: List[List[int]], model=None, dynamic_padding: Optional[bool] = None,
+                            exit_layer: Optional[int] = None) -> List[List[float]]:
+    if model is None:
+        model = loaded_model
+    if dynamic_padding is None:
+        dynamic_padding = uses_dynamic_padding()
+    if exit_layer is not None and exit_layer not in early_exit_layers(model):
+        exit_layer = None
+
+    inference_batch_size.observe(len(token_id_lists))
+
+    # 길이가 비슷한 문장끼리 같은 배치에 들어가도록 길이순으로 정렬
+    if dynamic_padding:
+        order = sorted(range(len(token_id_lists)), key=lambda index: len(token_id_lists[index]))
+        bucket_size = INFERENCE_BUCKET_SIZE
+    else:
+        order = list(range(len(token_id_lists)))
+        bucket_size = len(token_id_lists)
+
+    predicted_logits: List[List[float]] = [[] for _ in token_id_lists]
+    for start in range(0, len(order), bucket_size):
+        bucket = order[start:start + bucket_size]
+        seq_length = None if dynamic_padding else max_len
+
+        input_token_ids, input_valid_length, input_segment_ids = _to_tensors(
+            *sentence_encoder.pad([token_id_lists[index] for index in bucket], seq_length)
+        )
+
+        # 한 번의 forward pass로 버킷 전체를 예측
+        if exit_layer is None:
+            with torch.no_grad(), inference_seconds.time("forward"):
+                output = model(input_token_ids, input_valid_length, input_segment_ids)
+        else:
+            with torch.no_grad(), inference_seconds.time("forward_early_exit"):
+                output = model.forward_early_exit(input_token_ids, input_valid_length, input_segment_ids, exit_layer)
+        for index, logits in zip(bucket, output.float().cpu().tolist()):
+            predicted_logits[index] = logits
 
-    # 예측 수행
-    with torch.no_grad():
-        input_valid_length = torch.tensor([input_valid_length], dtype=torch.long).to(device)  # 스칼라 값으로 전달
-        output = loaded_model(input_token_ids, input_valid_length, input_segment_ids)
-        predicted_situation_label = torch.argmax(output, dim=1).item()
+    return predicted_logits
 
-    predicted_emotion = emotion_keyword_map.get(predicted_situation_label, "알 수 없는 감정")
 
-    return predicted_emotion
+loaded_model = build_inference_model(INFERENCE_ENGINE)
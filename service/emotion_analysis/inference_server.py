@@ -0,0 +1,141 @@
+# 여러 uvicorn worker가 모델을 각자 올리지 않도록 모델을 가진 별도의 추론 프로세스를 띄웁니다.
+# worker들은 Unix socket으로 요청하고, 모든 worker의 요청은 micro-batcher에서 하나의 배치로 묶입니다.
+# 실행: python -m service.emotion_analysis.inference_server
+#
+# 요청과 응답은 한 줄에 하나씩 orjson으로 직렬화한 dict 입니다.
+# - {"id": 1, "type": "classify", "messages": [...]} -> {"id": 1, "logits": [[...], ...]}
+# - {"id": 2, "type": "classify_context", "contexts": [[...], ...]} -> {"id": 2, "logits": [[...], ...]}
+#   context는 한 유저의 최근 메시지 목록(시간 순서)이며, 토큰 수를 제한해서 분류한 logits 하나를 돌려줍니다.
+# - {"id": 3, "type": "status"} -> {"id": 3, "status": {...}}
+# - 실패하면 {"id": ..., "error": "..."}
+import argparse
+import asyncio
+import os
+import signal
+
+import orjson
+
+from config.config import (
+    EMOTION_BATCH_MAX_SIZE,
+    EMOTION_BATCH_MAX_WAIT_SECONDS,
+    INFERENCE_SERVER_SOCKET_PATH,
+)
+from service.emotion_analysis.emotion_classifier import EmotionClassifier
+from service.emotion_analysis.micro_batcher import MicroBatcher
+
+# 한 줄(요청 하나)의 최대 크기
+MAX_REQUEST_SIZE = 2 ** 22
+
+
+class InferenceServer:
+    def __init__(self, socket_path: str, emotion_classifier: EmotionClassifier, emotion_batcher: MicroBatcher,
+                 context_batcher: MicroBatcher):
+        self._socket_path = socket_path
+        self._emotion_classifier = emotion_classifier
+        self._emotion_batcher = emotion_batcher
+        self._context_batcher = context_batcher
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self._socket_path,
+                                                       limit=MAX_REQUEST_SIZE)
+        # 모델을 로드하는 동안에도 status 요청에는 응답
+        asyncio.create_task(self._load_model())
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._writers):
+            writer.close()
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._emotion_classifier.shutdown()
+
+    async def _load_model(self):
+        try:
+            await self._emotion_classifier.load_async()
+        except Exception as e:
+            print(e)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # 한 연결에서 여러 요청을 동시에 처리하고, 응답은 id로 구분
+        pending_tasks = set()
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._handle_request(orjson.loads(line), writer))
+                pending_tasks.add(task)
+                task.add_done_callback(pending_tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            print(e)
+        finally:
+            for task in pending_tasks:
+                task.cancel()
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _handle_request(self, request: dict, writer: asyncio.StreamWriter):
+        response = {"id": request.get("id")}
+        try:
+            if request.get("type") == "status":
+                response["status"] = self._emotion_classifier.get_load_status()
+            elif request.get("type") == "classify_context":
+                response["logits"] = await asyncio.gather(
+                    *[self._context_batcher.submit(messages) for messages in request["contexts"]]
+                )
+            else:
+                response["logits"] = await asyncio.gather(
+                    *[self._emotion_batcher.submit(message) for message in request["messages"]]
+                )
+        except Exception as e:
+            response["error"] = getattr(e, "message", None) or repr(e)
+
+        if not writer.is_closing():
+            writer.write(orjson.dumps(response) + b"\n")
+            await writer.drain()
+
+
+async def serve(socket_path: str):
+    emotion_classifier = EmotionClassifier()
+    emotion_batcher = MicroBatcher(
+        batch_handler=emotion_classifier.classify_logits_batch_async,
+        max_batch_size=EMOTION_BATCH_MAX_SIZE,
+        max_wait_seconds=EMOTION_BATCH_MAX_WAIT_SECONDS,
+    )
+    context_batcher = MicroBatcher(
+        batch_handler=emotion_classifier.classify_context_logits_batch_async,
+        max_batch_size=EMOTION_BATCH_MAX_SIZE,
+        max_wait_seconds=EMOTION_BATCH_MAX_WAIT_SECONDS,
+    )
+    # 대기열이 길어지면 early exit으로 추론
+    emotion_classifier.load_controller.add_pressure_source(emotion_batcher.queue_depth)
+    emotion_classifier.load_controller.add_pressure_source(context_batcher.queue_depth)
+    server = InferenceServer(socket_path, emotion_classifier, emotion_batcher, context_batcher)
+    await server.start()
+    print(f"Inference server listening on {socket_path}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop_event.set)
+
+    await stop_event.wait()
+    await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket-path", default=INFERENCE_SERVER_SOCKET_PATH)
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket_path))
+
+
+if __name__ == "__main__":
+    main()
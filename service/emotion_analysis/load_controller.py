@@ -0,0 +1,140 @@
+import time
+from typing import Callable, List, Optional, Tuple
+
+from config.config import (
+    EMOTION_SHED_MIN_CONNECTIONS,
+    INFERENCE_ADAPTIVE_ENABLED,
+    INFERENCE_LATENCY_SLO_SECONDS,
+    INFERENCE_QUEUE_HIGH_WATERMARK,
+    INFERENCE_TIER_ESCALATE_SECONDS,
+    INFERENCE_TIER_RECOVERY_SECONDS,
+)
+from core.metrics import inference_tier_total
+
+TIER_FULL = "full"
+TIER_EARLY_EXIT = "early_exit"
+TIER_SHED = "shed"
+# /metrics gauge 값
+TIER_LEVELS = {TIER_FULL: 0, TIER_EARLY_EXIT: 1, TIER_SHED: 2}
+
+
+# 추론 지연시간과 대기열 길이를 보고 추론 단계(full -> early_exit -> shed)를 정합니다.
+# 과부하가 이어지면 INFERENCE_TIER_ESCALATE_SECONDS마다 한 단계씩 내려가고,
+# INFERENCE_TIER_RECOVERY_SECONDS 동안 과부하가 아니면 한 단계씩 원래대로 돌아옵니다.
+class InferenceLoadController:
+    def __init__(
+            self,
+            enabled: bool = INFERENCE_ADAPTIVE_ENABLED,
+            latency_slo_seconds: float = INFERENCE_LATENCY_SLO_SECONDS,
+            queue_high_watermark: int = INFERENCE_QUEUE_HIGH_WATERMARK,
+            escalate_seconds: float = INFERENCE_TIER_ESCALATE_SECONDS,
+            recovery_seconds: float = INFERENCE_TIER_RECOVERY_SECONDS,
+            shed_min_connections: int = EMOTION_SHED_MIN_CONNECTIONS,
+            latency_smoothing: float = 0.3,
+    ):
+        self.enabled = enabled
+        self._latency_slo_seconds = latency_slo_seconds
+        self._queue_high_watermark = queue_high_watermark
+        self._escalate_seconds = escalate_seconds
+        self._recovery_seconds = recovery_seconds
+        self._shed_min_connections = shed_min_connections
+        self._latency_smoothing = latency_smoothing
+
+        # 모델 로드 후 exit head가 있을 때만 early_exit 단계를 사용
+        self.early_exit_available = False
+        self._pressure_sources: List[Callable[[], int]] = []
+
+        self._tier_index = 0
+        self._changed_at = time.monotonic()
+        self._calm_since: Optional[float] = None
+        self._latency_average = 0.0
+        self._last_observed_at: Optional[float] = None
+        self.escalation_count = 0
+        self.recovery_count = 0
+        self.shed_count = 0
+
+    def add_pressure_source(self, read_queue_depth: Callable[[], int]):
+        self._pressure_sources.append(read_queue_depth)
+
+    def _tiers(self) -> Tuple[str, ...]:
+        if self.early_exit_available:
+            return TIER_FULL, TIER_EARLY_EXIT, TIER_SHED
+        return TIER_FULL, TIER_SHED
+
+    @property
+    def tier(self) -> str:
+        self._update()
+        tiers = self._tiers()
+        return tiers[min(self._tier_index, len(tiers) - 1)]
+
+    def use_early_exit(self) -> bool:
+        return self.early_exit_available and self.tier != TIER_FULL
+
+    def should_shed(self) -> bool:
+        return self.tier == TIER_SHED
+
+    # shed 단계에서는 유저 수가 적은 채팅방의 분석을 미룸
+    def should_shed_room(self, connection_count: int) -> bool:
+        if connection_count >= self._shed_min_connections or not self.should_shed():
+            return False
+        self.shed_count += 1
+        inference_tier_total.inc(TIER_SHED)
+        return True
+
+    # 추론 한 번이 끝날 때마다 호출
+    def observe(self, latency_seconds: float):
+        if self._last_observed_at is None:
+            self._latency_average = latency_seconds
+        else:
+            self._latency_average += self._latency_smoothing * (latency_seconds - self._latency_average)
+        self._last_observed_at = time.monotonic()
+        self._update()
+
+    def queue_depth(self) -> int:
+        return sum(read_queue_depth() for read_queue_depth in self._pressure_sources)
+
+    def is_overloaded(self) -> bool:
+        if self.queue_depth() > self._queue_high_watermark:
+            return True
+        # 한동안 추론이 없었다면 예전 지연시간은 판단 근거로 쓰지 않음
+        return (
+                self._last_observed_at is not None
+                and time.monotonic() - self._last_observed_at < self._recovery_seconds
+                and self._latency_average > self._latency_slo_seconds
+        )
+
+    def _update(self):
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if self.is_overloaded():
+            self._calm_since = None
+            if self._tier_index < len(self._tiers()) - 1 and now - self._changed_at >= self._escalate_seconds:
+                self._tier_index += 1
+                self._changed_at = now
+                self.escalation_count += 1
+            return
+
+        if self._tier_index == 0:
+            return
+        if self._calm_since is None:
+            self._calm_since = now
+        elif now - self._calm_since >= self._recovery_seconds:
+            self._tier_index -= 1
+            self._changed_at = now
+            self._calm_since = now
+            self.recovery_count += 1
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "tier": self.tier,
+            "early_exit_available": self.early_exit_available,
+            "latency_average_seconds": self._latency_average,
+            "queue_depth": self.queue_depth(),
+            "overloaded": self.is_overloaded(),
+            "escalation_count": self.escalation_count,
+            "recovery_count": self.recovery_count,
+            "shed_count": self.shed_count,
+        }
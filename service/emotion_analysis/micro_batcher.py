@@ -0,0 +1,164 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+@dataclass
+class MicroBatchStats:
+    request_count: int = 0
+    batch_count: int = 0
+    failed_batch_count: int = 0
+    max_batch_size: int = 0
+    total_queue_wait_seconds: float = 0.0
+    max_queue_wait_seconds: float = 0.0
+
+    def record_batch(self, batch_size: int, queue_waits: List[float]):
+        self.request_count += batch_size
+        self.batch_count += 1
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.total_queue_wait_seconds += sum(queue_waits)
+        self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, max(queue_waits))
+
+    @property
+    def average_batch_size(self) -> float:
+        if self.batch_count == 0:
+            return 0.0
+        return self.request_count / self.batch_count
+
+    @property
+    def average_queue_wait_seconds(self) -> float:
+        if self.request_count == 0:
+            return 0.0
+        return self.total_queue_wait_seconds / self.request_count
+
+
+class MicroBatchException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+
+class _PendingRequest:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any, future: asyncio.Future):
+        self.item = item
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+# 여러 호출자의 요청을 모아 batch_handler 한 번으로 처리하고, 각 호출자의 future에 결과를 돌려줍니다.
+# 배치는 max_batch_size개가 모이거나 첫 요청 이후 max_wait_seconds가 지나면 실행됩니다.
+class MicroBatcher:
+
+    def __init__(
+            self,
+            batch_handler: Callable[[List[Any]], Awaitable[List[Any]]],
+            max_batch_size: int,
+            max_wait_seconds: float,
+    ):
+        self._batch_handler = batch_handler
+        self._max_batch_size = max_batch_size
+        self._max_wait_seconds = max_wait_seconds
+        self._queue: asyncio.Queue[_PendingRequest] = asyncio.Queue()
+        self._worker_task: Optional[asyncio.Task] = None
+        # 모으는 중이거나 처리 중인 배치. 중지할 때 호출자에게 실패를 알리기 위해 보관
+        self._current_batch: List[_PendingRequest] = []
+        self.stats = MicroBatchStats()
+
+    def start(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+
+        # 처리하지 못한 요청의 호출자가 계속 기다리지 않도록 실패 처리
+        pending = self._current_batch
+        self._current_batch = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._fail(pending, MicroBatchException("Micro batcher stopped"))
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, item: Any) -> Any:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(item, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            await self._process_batch(batch)
+            self._current_batch = []
+
+    async def _collect_batch(self) -> List[_PendingRequest]:
+        batch = self._current_batch = [await self._queue.get()]
+        deadline = time.monotonic() + self._max_wait_seconds
+
+        while len(batch) < self._max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # 기다리는 동안 취소된 요청은 추론하지 않음
+        batch = self._current_batch = [request for request in batch if not request.future.done()]
+        return batch
+
+    async def _process_batch(self, batch: List[_PendingRequest]):
+        if len(batch) == 0:
+            return
+
+        started_at = time.monotonic()
+        self.stats.record_batch(
+            batch_size=len(batch),
+            queue_waits=[started_at - request.enqueued_at for request in batch],
+        )
+
+        try:
+            results = await self._batch_handler([request.item for request in batch])
+        except Exception as e:
+            self.stats.failed_batch_count += 1
+            self._fail(batch, e)
+            return
+
+        # 결과 수가 맞지 않으면 어떤 결과가 어느 요청의 것인지 알 수 없으므로 모두 실패 처리
+        if len(results) != len(batch):
+            self.stats.failed_batch_count += 1
+            self._fail(batch, MicroBatchException(f"Batch handler returned {len(results)} results for {len(batch)} items"))
+            return
+
+        for request, result in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(result)
+
+    @staticmethod
+    def _fail(requests: List[_PendingRequest], exception: Exception):
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(exception)
+
+    def get_stats(self) -> dict:
+        return {
+            "request_count": self.stats.request_count,
+            "batch_count": self.stats.batch_count,
+            "failed_batch_count": self.stats.failed_batch_count,
+            "average_batch_size": self.stats.average_batch_size,
+            "max_batch_size": self.stats.max_batch_size,
+            "average_queue_wait_seconds": self.stats.average_queue_wait_seconds,
+            "max_queue_wait_seconds": self.stats.max_queue_wait_seconds,
+            "queue_depth": self.queue_depth(),
+        }
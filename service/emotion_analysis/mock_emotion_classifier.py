@@ -1,10 +1,57 @@
-from service.emotion_analysis.emotion_classifier import EmotionClassifier
+from typing import List
+
+from service.emotion_analysis.emotion_classifier import EmotionClassifier, ModelLoadState
+from service.emotion_analysis.emotion_labels import NUM_EMOTION_CLASSES
+from service.emotion_analysis.load_controller import InferenceLoadController
 
 
 class MockEmotionClassifier(EmotionClassifier):
 
     def __init__(self):
+        self.load_controller = InferenceLoadController()
+
+    def load(self):
         pass
 
+    async def load_async(self):
+        pass
+
+    def is_ready(self) -> bool:
+        return True
+
+    def get_load_status(self) -> dict:
+        return {
+            "state": ModelLoadState.READY.value,
+            "load_seconds": 0.0,
+            "error": None,
+        }
+
+    def label_from_logits(self, logits: List[float]) -> str:
+        return "아무 감정이"
+
     def classify(self, message: str) -> str:
         return "아무 감정이"
+
+    def classify_batch(self, messages: List[str]) -> List[str]:
+        return [self.classify(message) for message in messages]
+
+    async def classify_async(self, message: str) -> str:
+        return self.classify(message)
+
+    async def classify_batch_async(self, messages: List[str]) -> List[str]:
+        return self.classify_batch(messages)
+
+    def classify_logits_batch(self, messages: List[str]) -> List[List[float]]:
+        return [[0.0] * NUM_EMOTION_CLASSES for _ in messages]
+
+    async def classify_logits_batch_async(self, messages: List[str]) -> List[List[float]]:
+        return self.classify_logits_batch(messages)
+
+    async def classify_context_logits_batch_async(self, contexts: List[List[str]]) -> List[List[float]]:
+        return self.classify_logits_batch(contexts)
+
+    def get_cache_stats(self) -> dict:
+        return {}
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,227 @@
+import asyncio
+import itertools
+import socket
+import time
+from typing import Dict, List, Optional
+
+import orjson
+
+from config.config import (
+    EMOTION_CACHE_EVICTION_POLICY,
+    EMOTION_CACHE_MAX_SIZE,
+    EMOTION_CACHE_TTL_SECONDS,
+    EMOTION_CONTEXT_CACHE_MAX_SIZE,
+    INFERENCE_SERVER_READY_WAIT_SECONDS,
+    INFERENCE_SERVER_SOCKET_PATH,
+    INFERENCE_SERVER_TIMEOUT_SECONDS,
+)
+from service.emotion_analysis.classification_cache import ClassificationCache
+from service.emotion_analysis.emotion_classifier import (
+    EmotionClassifier,
+    InferenceUnavailableException,
+    ModelLoadState,
+    context_cache_text,
+)
+from service.emotion_analysis.inference_server import MAX_REQUEST_SIZE
+from service.emotion_analysis.load_controller import InferenceLoadController
+
+
+class InferenceServerException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+
+# 별도 프로세스로 띄운 추론 서버(inference_server)에 분류를 요청하는 클라이언트
+# 연결은 재사용하고, 서버가 응답하지 않으면 InferenceUnavailableException을 발생시킵니다.
+class RemoteEmotionClassifier(EmotionClassifier):
+
+    def __init__(
+            self,
+            socket_path: str = INFERENCE_SERVER_SOCKET_PATH,
+            timeout_seconds: float = INFERENCE_SERVER_TIMEOUT_SECONDS,
+            ready_wait_seconds: float = INFERENCE_SERVER_READY_WAIT_SECONDS,
+            cache: Optional[ClassificationCache] = None,
+    ):
+        self._socket_path = socket_path
+        self._timeout_seconds = timeout_seconds
+        self._ready_wait_seconds = ready_wait_seconds
+        self._cache = cache if cache is not None else ClassificationCache(
+            max_size=EMOTION_CACHE_MAX_SIZE,
+            ttl_seconds=EMOTION_CACHE_TTL_SECONDS,
+            eviction_policy=EMOTION_CACHE_EVICTION_POLICY,
+        )
+        # context 분류 결과는 문장 캐시의 항목을 밀어내지 않도록 따로 보관
+        self._context_cache = ClassificationCache(
+            max_size=EMOTION_CONTEXT_CACHE_MAX_SIZE,
+            ttl_seconds=EMOTION_CACHE_TTL_SECONDS,
+            eviction_policy=EMOTION_CACHE_EVICTION_POLICY,
+        )
+
+        self.load_state = ModelLoadState.NOT_LOADED
+        self.load_seconds: Optional[float] = None
+        self.load_error: Optional[str] = None
+        self._load_started_at = 0.0
+        self.fallback_count = 0
+        # early exit은 추론 서버가 자체적으로 판단하고, 여기서는 응답 지연시간을 보고 분석할 채팅방만 줄임
+        self.load_controller = InferenceLoadController()
+
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    def load(self):
+        # 모델은 추론 서버가 로드하므로 현재 프로세스에서는 할 일이 없음
+        pass
+
+    # 추론 서버의 모델 로드가 끝날 때까지 ready_wait_seconds 동안 기다립니다.
+    # 그 안에 준비되지 않으면 DEGRADED 상태로 두고, 이후 분류 요청이 성공하면 READY로 바꿉니다.
+    async def load_async(self):
+        self.load_state = ModelLoadState.LOADING
+        started_at = time.monotonic()
+        while time.monotonic() - started_at < self._ready_wait_seconds:
+            try:
+                status = (await self._request({"type": "status"}))["status"]
+                if status["state"] == ModelLoadState.READY.value:
+                    self._mark_ready(started_at)
+                    return
+                if status["state"] == ModelLoadState.FAILED.value:
+                    self.load_state = ModelLoadState.FAILED
+                    self.load_error = status["error"]
+                    return
+            except (OSError, asyncio.TimeoutError, InferenceServerException) as e:
+                self.load_error = getattr(e, "message", None) or repr(e)
+            await asyncio.sleep(1)
+
+        print(f"Inference server is not ready after {self._ready_wait_seconds}s: {self.load_error}")
+        self._load_started_at = started_at
+        self.load_state = ModelLoadState.DEGRADED
+
+    def _mark_ready(self, started_at: float):
+        self.load_error = None
+        self.load_seconds = time.monotonic() - started_at
+        self.load_state = ModelLoadState.READY
+
+    def is_ready(self) -> bool:
+        return self.load_state in (ModelLoadState.READY, ModelLoadState.DEGRADED)
+
+    def classify_logits_batch(self, messages: List[str]) -> List[List[float]]:
+        results, missing_messages = self._lookup_cache(messages)
+        if len(missing_messages) == 0:
+            return results
+
+        # 이벤트 루프 밖에서 호출되는 동기 버전은 요청마다 새로 연결
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.settimeout(self._timeout_seconds)
+                client.connect(self._socket_path)
+                client.sendall(orjson.dumps({"id": 0, "type": "classify", "messages": missing_messages}) + b"\n")
+                response = orjson.loads(client.makefile("rb").readline())
+            if "error" in response:
+                raise InferenceServerException(response["error"])
+            return self._fill_results(messages, results, missing_messages, response["logits"])
+        except (OSError, ValueError, InferenceServerException) as e:
+            raise self._unavailable(e)
+
+    async def classify_logits_batch_async(self, messages: List[str]) -> List[List[float]]:
+        results, missing_messages = self._lookup_cache(messages)
+        if len(missing_messages) == 0:
+            return results
+
+        try:
+            response = await self._request({"type": "classify", "messages": missing_messages})
+            return self._fill_results(messages, results, missing_messages, response["logits"])
+        except (OSError, asyncio.TimeoutError, InferenceServerException) as e:
+            raise self._unavailable(e)
+
+    async def classify_context_logits_batch_async(self, contexts: List[List[str]]) -> List[List[float]]:
+        texts = [context_cache_text(messages) for messages in contexts]
+        context_by_text = dict(zip(texts, contexts))
+        results, missing_texts = self._lookup_cache(texts, self._context_cache)
+        if len(missing_texts) == 0:
+            return results
+
+        try:
+            response = await self._request({
+                "type": "classify_context",
+                "contexts": [context_by_text[text] for text in missing_texts],
+            })
+            return self._fill_results(texts, results, missing_texts, response["logits"], cache=self._context_cache)
+        except (OSError, asyncio.TimeoutError, InferenceServerException) as e:
+            raise self._unavailable(e)
+
+    # 빈 결과를 돌려주면 감정 상태가 0으로 감쇠하므로, 결과 없이 호출한 쪽에서 건너뛰도록 예외로 알림
+    def _unavailable(self, e: Exception) -> InferenceUnavailableException:
+        self.fallback_count += 1
+        return InferenceUnavailableException(getattr(e, "message", None) or repr(e))
+
+    async def _request(self, request: dict) -> dict:
+        await self._ensure_connected()
+
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        started_at = time.monotonic()
+        try:
+            self._writer.write(orjson.dumps({**request, "id": request_id}) + b"\n")
+            await self._writer.drain()
+            response = await asyncio.wait_for(future, timeout=self._timeout_seconds)
+        finally:
+            self._pending.pop(request_id, None)
+            if request["type"] != "status":
+                self.load_controller.observe(time.monotonic() - started_at)
+
+        if "error" in response:
+            raise InferenceServerException(response["error"])
+        if self.load_state == ModelLoadState.DEGRADED and request["type"] != "status":
+            self._mark_ready(self._load_started_at)
+        return response
+
+    async def _ensure_connected(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self._socket_path, limit=MAX_REQUEST_SIZE),
+                timeout=self._timeout_seconds,
+            )
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read_loop(reader, writer))
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = orjson.loads(line)
+                future = self._pending.get(response.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (ConnectionError, ValueError) as e:
+            print(e)
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            # 연결이 끊어지면 응답을 기다리던 요청은 모두 실패 처리
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionResetError("Inference server connection closed"))
+
+    def get_cache_stats(self) -> dict:
+        stats = self._cache.get_stats()
+        stats["context_cache"] = self._context_cache.get_stats()
+        stats["fallback_count"] = self.fallback_count
+        return stats
+
+    def shutdown(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
@@ -0,0 +1,94 @@
+import random
+
+from config.config import EMOTION_CONTEXT_MAX_MESSAGES
+from service.chat.chat_room_manager import ChatRoom, ChatRoomManager
+from service.chat.user_connection import UserConnection
+from service.emotion_analysis.emotion_classifier import EmotionClassifier, InferenceUnavailableException
+from service.emotion_analysis.micro_batcher import MicroBatcher
+
+
+# 채팅방의 감정을 분석해서 안내 메시지를 보냅니다.
+# incremental 모드에서는 누적된 감정 상태만 읽고, sweep 모드에서는 최근 메시지를 다시 분류합니다.
+class RoomEmotionAnalyzer:
+    def __init__(
+            self,
+            chat_room_manager: ChatRoomManager,
+            emotion_classifier: EmotionClassifier,
+            context_batcher: MicroBatcher,
+            mode: str,
+            context_max_messages: int = EMOTION_CONTEXT_MAX_MESSAGES,
+    ):
+        self._chat_room_manager = chat_room_manager
+        self._emotion_classifier = emotion_classifier
+        self._context_batcher = context_batcher
+        self._context_max_messages = context_max_messages
+        self.mode = mode
+
+    def consumes_inference(self) -> bool:
+        return self.mode == "sweep"
+
+    def should_analyze(self, room: ChatRoom) -> bool:
+        # 모델이 로드되기 전에는 채팅만 동작하고 감정 분석은 미룸
+        if not self._emotion_classifier.is_ready():
+            return False
+        # 여러 worker가 같은 채팅방을 가지고 있다면 한 worker에서만 분석
+        if not self._chat_room_manager.is_analysis_owner(room):
+            return False
+        # 추론이 밀려 있으면 유저가 적은 채팅방은 새 메시지 여부를 유지한 채 다음 주기로 미룸
+        if self.consumes_inference() and self._emotion_classifier.load_controller.should_shed_room(
+                room.count_connections()):
+            return False
+        return True
+
+    async def analyze(self, room: ChatRoom):
+        if self.mode == "incremental":
+            await self.announce_room_emotion(room)
+        else:
+            await self.analyze_room_emotion(room)
+
+    async def analyze_room_emotion(self, room: ChatRoom):
+        user_connection: UserConnection = random.choice(room.list_connections())
+        # 임의로 최근 메시지를 활용
+        messages = room.history.last_for_user(user_connection.user_id, self._context_max_messages)
+        if len(messages) == 0:
+            await self._chat_room_manager.broadcast_system_message(
+                room_id=room.room_id,
+                message="메시지를 입력해보세요!"
+            )
+            return
+
+        # 최근 메시지부터 모델 입력 크기(EMOTION_CONTEXT_MAX_CHUNKS)만큼만 토큰화해서 분류하고,
+        # 다른 채팅방의 요청과 함께 배치로 추론됨
+        try:
+            logits = await self._context_batcher.submit([record.message for record in messages])
+        except InferenceUnavailableException:
+            # 추론 서버에 연결하지 못하면 이번 주기의 안내 메시지는 보내지 않음
+            return
+        emotion_text = self._emotion_classifier.label_from_logits(logits)
+
+        await self._chat_room_manager.broadcast_system_message(
+            room_id=room.room_id,
+            message=f"{user_connection.username}의 {emotion_text} 느껴집니다."
+        )
+
+    # 메시지가 들어올 때마다 누적된 감정 상태만 읽으므로 추론 비용이 없음
+    async def announce_room_emotion(self, room: ChatRoom):
+        tracked_connections = [
+            connection for connection in room.list_connections()
+            if room.get_user_emotion_state(connection.user_id) is not None
+        ]
+        if len(tracked_connections) == 0:
+            await self._chat_room_manager.broadcast_system_message(
+                room_id=room.room_id,
+                message="메시지를 입력해보세요!"
+            )
+            return
+
+        user_connection: UserConnection = random.choice(tracked_connections)
+        emotion_state = room.get_user_emotion_state(user_connection.user_id)
+        emotion_text = self._emotion_classifier.label_from_logits(emotion_state.logits)
+
+        await self._chat_room_manager.broadcast_system_message(
+            room_id=room.room_id,
+            message=f"{user_connection.username}의 {emotion_text} 느껴집니다."
+        )
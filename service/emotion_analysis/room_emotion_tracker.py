@@ -0,0 +1,60 @@
+import asyncio
+from typing import Set
+
+from core.metrics import errors_total
+from service.chat.chat_room_manager import ChatRoomManager
+from service.chat.message import Message
+from service.emotion_analysis.emotion_classifier import EmotionClassifier, InferenceUnavailableException
+from service.emotion_analysis.micro_batcher import MicroBatcher
+
+
+# 유저 메시지가 들어올 때마다 한 번만 분류해서 채팅방의 감정 상태에 누적합니다.
+# 여러 채팅방에서 동시에 들어온 메시지는 micro-batcher에서 하나의 배치로 묶입니다.
+class RoomEmotionTracker:
+    def __init__(
+            self,
+            chat_room_manager: ChatRoomManager,
+            emotion_classifier: EmotionClassifier,
+            emotion_batcher: MicroBatcher,
+            decay: float,
+    ):
+        self._chat_room_manager = chat_room_manager
+        self._emotion_classifier = emotion_classifier
+        self._emotion_batcher = emotion_batcher
+        self._decay = decay
+        self._pending_tasks: Set[asyncio.Task] = set()
+
+    def track_message(self, room_id: str, message: Message):
+        # 모델이 로드되기 전에 들어온 메시지는 분류하지 않음
+        if not self._emotion_classifier.is_ready():
+            return
+
+        # 추론이 밀려 있으면 유저가 적은 채팅방의 메시지는 감정 상태에 반영하지 않음
+        chat_room = self._chat_room_manager.get_chat_room(room_id)
+        if chat_room is None or self._emotion_classifier.load_controller.should_shed_room(
+                chat_room.count_connections()):
+            return
+
+        task = asyncio.create_task(self._classify_and_update(room_id, message))
+        self._pending_tasks.add(task)
+        task.add_done_callback(self._pending_tasks.discard)
+
+    def count_pending(self) -> int:
+        return len(self._pending_tasks)
+
+    async def _classify_and_update(self, room_id: str, message: Message):
+        try:
+            logits = await self._emotion_batcher.submit(message.message)
+        except InferenceUnavailableException:
+            # 추론 서버 장애는 fallback_count로 집계하고, 감정 상태는 그대로 둠
+            return
+        except Exception as e:
+            print(e)
+            errors_total.inc("room_emotion_tracker")
+            return
+
+        chat_room = self._chat_room_manager.get_chat_room(room_id)
+        if chat_room is None:
+            return
+
+        chat_room.update_emotion_state(user_id=message.user_id, logits=logits, decay=self._decay)
@@ -1,12 +1,38 @@
 const apiEndpoint = `${window.location.origin}/api/v1`;
 const socketEndpoint = apiEndpoint.replace('http', 'ws');
 
-async function fetchChatRooms() {
-    const response = await fetch(`${apiEndpoint}/chat/rooms`);
+async function fetchChatRooms(cursor) {
+    const query = cursor ? `?cursor=${cursor}` : '';
+    const response = await fetch(`${apiEndpoint}/chat/rooms${query}`);
 
     return await response.json();
 }
 
+// 모든 페이지를 차례로 받아서 합칩니다.
+// 페이지마다 목록 version이 다를 수 있으므로 가장 오래된 version을 함께 반환
+async function fetchAllChatRooms() {
+    const rooms = [];
+    let version = Infinity;
+    let cursor = null;
+    do {
+        const page = await fetchChatRooms(cursor);
+        rooms.push(...page.chat_rooms);
+        version = Math.min(version, page.version);
+        cursor = page.next_cursor;
+    } while (cursor);
+
+    return {rooms, version};
+}
+
+// 채팅방 생성/삭제, 인원수 변경을 구독합니다. onChanges는 (목록 version, 변경 목록)으로 호출됩니다.
+function subscribeChatRooms(onReady, onChanges) {
+    const source = new EventSource(`${apiEndpoint}/chat/rooms/stream`);
+    source.addEventListener('ready', onReady);
+    source.addEventListener('rooms', event => onChanges(Number(event.lastEventId), JSON.parse(event.data)));
+
+    return source;
+}
+
 async function fetchChatRoom(roomId) {
     const response = await fetch(`${apiEndpoint}/chat/rooms/${roomId}`);
 
@@ -27,5 +53,7 @@ async function createChatRoom(name) {
 
 
 async function connectChatRoomSocket(roomId, username) {
-    return new WebSocket(`${socketEndpoint}/chat/${roomId}/connect/${username}`);
+    // subprotocol로 요청하면 서버가 응답하지 않을 때 브라우저가 연결을 끊으므로 query로 요청
+    // 서버가 지원하지 않으면 기존처럼 메시지마다 frame을 받음
+    return new WebSocket(`${socketEndpoint}/chat/${roomId}/connect/${username}?protocol=chat.v2.json`);
 }
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import uuid
+
+from service.chat.message_log import RECORD_HEADER, MessageLog, scan_segment
+
+ROOM_A = str(uuid.UUID(int=1))
+ROOM_B = str(uuid.UUID(int=2))
+
+
+def _segment_paths(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log"))
+
+
+def test_open_truncates_torn_tail(tmp_path):
+    directory = str(tmp_path)
+    message_log = MessageLog(directory)
+    assert message_log.open()
+    message_log.append(ROOM_A, "first")
+    message_log.append(ROOM_A, "second")
+    message_log.close()
+
+    # 비정상 종료로 마지막 레코드의 header와 payload 일부만 기록된 상태
+    path = _segment_paths(directory)[-1]
+    valid_size = os.path.getsize(path)
+    payload = b"torn"
+    with open(path, "ab") as file:
+        file.write(RECORD_HEADER.pack(len(payload) + 100, 0, uuid.UUID(ROOM_A).bytes) + payload)
+
+    message_log = MessageLog(directory)
+    assert message_log.open()
+    assert os.path.getsize(path) == valid_size
+    assert message_log.read_last(ROOM_A) == ["first", "second"]
+
+    # 잘린 부분을 버린 뒤 이어서 추가한 레코드도 정상적으로 읽힘
+    message_log.append(ROOM_A, "third")
+    message_log.close()
+    records, size = scan_segment(path)
+    assert len(records) == 3
+    assert size == os.path.getsize(path)
+
+
+def test_compact_remaps_offsets(tmp_path):
+    directory = str(tmp_path)
+    message_log = MessageLog(directory, segment_max_bytes=512, replay_size=2, compact_threshold=0.5)
+    assert message_log.open()
+    for index in range(8):
+        message_log.append(ROOM_A, f"a-{index}" * 4)
+        message_log.append(ROOM_B, f"b-{index}" * 4)
+    expected_a = message_log.read_last(ROOM_A)
+
+    # 재생에 필요한 마지막 2개를 제외하고 모두 필요 없는 레코드가 되도록 B 채팅방에만 메시지를 더 추가
+    for index in range(8, 20):
+        message_log.append(ROOM_B, f"b-{index}" * 4)
+    expected_b = message_log.read_last(ROOM_B)
+    assert expected_b != []
+
+    before_bytes = message_log.get_stats()["total_bytes"]
+    asyncio.run(message_log.compact())
+    stats = message_log.get_stats()
+    assert stats["compacted_segment_count"] > 0
+    assert stats["total_bytes"] < before_bytes
+
+    assert message_log.read_last(ROOM_A) == expected_a
+    assert message_log.read_last(ROOM_B) == expected_b
+
+    # 다시 열어도 compaction 이후의 파일에서 같은 레코드를 찾음
+    message_log.close()
+    message_log = MessageLog(directory, segment_max_bytes=512, replay_size=2)
+    assert message_log.open()
+    assert message_log.read_last(ROOM_A) == expected_a
+    assert message_log.read_last(ROOM_B) == expected_b
+    message_log.close()
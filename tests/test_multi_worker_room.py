@@ -0,0 +1,73 @@
+import asyncio
+import json
+import uuid
+
+from service.chat.broker import UnixSocketBroker
+from service.chat.chat_room_manager import ChatRoomManager
+from service.chat.message import Message, MessageType
+from service.chat.user_connection import UserConnection
+
+
+# 보낸 frame을 기록만 하는 WebSocket
+class RecordingWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        self.frames.append(json.loads(text))
+
+    async def close(self):
+        pass
+
+    def user_messages(self):
+        return [frame["message"] for frame in self.frames if frame["message_type"] == "USER_MESSAGE"]
+
+
+async def wait_until(condition, timeout_seconds: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout_seconds
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def connect_user(manager: ChatRoomManager, room_id: str, username: str) -> RecordingWebSocket:
+    websocket = RecordingWebSocket()
+    connection = UserConnection(user_id=str(uuid.uuid4()), username=username, websocket=websocket)
+    await manager.connect(room_id=room_id, connection=connection)
+    return websocket
+
+
+def test_message_reaches_user_on_other_worker(tmp_path):
+    async def run():
+        socket_path = str(tmp_path / "broker.sock")
+        # 같은 hub에 연결된 두 worker
+        first = ChatRoomManager(UnixSocketBroker(socket_path, reconnect_delay_seconds=0.05))
+        second = ChatRoomManager(UnixSocketBroker(socket_path, reconnect_delay_seconds=0.05))
+        await first.start()
+        await second.start()
+        try:
+            room_id = str(uuid.uuid4())
+            first.create_chat_room(room_id=room_id)
+            await wait_until(lambda: second.get_chat_room(room_id) is not None)
+
+            alice = await connect_user(first, room_id, "alice")
+            bob = await connect_user(second, room_id, "bob")
+            await wait_until(lambda: first.count_user_in_room(room_id) == 2 and second.count_user_in_room(room_id) == 2)
+
+            await second.broadcast(room_id=room_id, message=Message(
+                username="bob", message="hello from worker 2", message_type=MessageType.USER_MESSAGE,
+            ))
+            await wait_until(lambda: "hello from worker 2" in alice.user_messages())
+
+            await first.broadcast(room_id=room_id, message=Message(
+                username="alice", message="hello from worker 1", message_type=MessageType.USER_MESSAGE,
+            ))
+            await wait_until(lambda: "hello from worker 1" in bob.user_messages())
+        finally:
+            await second.stop()
+            await first.stop()
+
+    asyncio.run(run())